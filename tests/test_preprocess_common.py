@@ -5,7 +5,7 @@ Preprocessing: Tests for ._common submodule.
 import pytest
 
 from tmtoolkit.preprocess._common import (
-    DEFAULT_LANGUAGE_MODELS, load_stopwords, simplified_pos
+    DEFAULT_LANGUAGE_MODELS, load_stopwords, simplified_pos, _stopwords_set
 )
 
 
@@ -27,6 +27,21 @@ def test_load_stopwords():
         load_stopwords('foo')
 
 
+def test_stopwords_set():
+    for code in LANGUAGE_CODES:
+        stopwords = _stopwords_set(code)
+
+        if code in {'lt', 'ja', 'zh'}:
+            assert stopwords is None
+        else:
+            assert isinstance(stopwords, frozenset)
+            assert stopwords == set(load_stopwords(code))
+            assert _stopwords_set(code) is stopwords   # cached
+
+    with pytest.raises(ValueError):
+        _stopwords_set('foo')
+
+
 def test_simplified_pos():
     # tagset "ud"
     assert simplified_pos('') == ''
@@ -2,16 +2,19 @@
 Preprocessing: Tests for ._docfuncs submodule.
 """
 
+import os
 import math
 import random
 import string
 from copy import deepcopy
 from collections import Counter, OrderedDict
+from concurrent.futures.process import BrokenProcessPool
 
 import decorator
 import pytest
 from hypothesis import given, strategies as st, settings
 import numpy as np
+import spacy
 from spacy.tokens import Doc, Token
 from spacy.vocab import Vocab
 from scipy.sparse import isspmatrix_coo
@@ -19,11 +22,12 @@ from scipy.sparse import isspmatrix_coo
 from tmtoolkit.utils import empty_chararray, flatten_list
 from tmtoolkit._pd_dt_compat import FRAME_TYPE, USE_DT, pd_dt_colnames
 from tmtoolkit.preprocess._common import DEFAULT_LANGUAGE_MODELS, load_stopwords
+from tmtoolkit.preprocess import _docfuncs
 from tmtoolkit.preprocess._docfuncs import (
     init_for_language, tokenize, doc_tokens, doc_lengths, doc_labels, vocabulary, vocabulary_counts, doc_frequencies,
-    ngrams, sparse_dtm, kwic, kwic_table, glue_tokens, expand_compounds, clean_tokens, spacydoc_from_tokens,
-    tokendocs2spacydocs, compact_documents, filter_tokens, remove_tokens, filter_tokens_with_kwic,
-    filter_tokens_by_mask, remove_tokens_by_mask, filter_documents, remove_documents,
+    ngrams, sparse_dtm, kwic, kwic_table, glue_tokens, glue_phrases, expand_compounds, clean_tokens,
+    spacydoc_from_tokens, tokendocs2spacydocs, compact_documents, filter_tokens, remove_tokens,
+    filter_tokens_with_kwic, filter_tokens_by_mask, remove_tokens_by_mask, filter_documents, remove_documents,
     filter_documents_by_name, remove_documents_by_name, filter_for_pos, pos_tag, pos_tags, remove_common_tokens,
     remove_uncommon_tokens, transform, to_lowercase, remove_chars, tokens2ids, ids2tokens, lemmatize,
     _filtered_doc_tokens
@@ -678,6 +682,44 @@ def test_glue_tokens_example(tokens_mini, tokens_mini_arrays, tokens_mini_lists)
                 assert d_ == d
 
 
+@cleanup_after_test
+def test_glue_phrases_example(tokens_mini, tokens_mini_arrays, tokens_mini_lists):
+    for testtokens in (tokens_mini, tokens_mini_arrays, tokens_mini_lists):
+        tokens = doc_tokens(testtokens)
+
+        with pytest.raises(ValueError):
+            glue_phrases(testtokens, [])
+
+        with pytest.raises(ValueError):
+            glue_phrases(testtokens, ['New'])
+
+        res, glued = glue_phrases(testtokens, ['New York', 'in New York', ('in', 'Munich')],
+                                  return_glued_tokens=True)
+        tokens_ = doc_tokens(res)
+        assert isinstance(res, list)
+        assert len(res) == len(testtokens) == len(tokens_)
+
+        if testtokens is tokens_mini:
+            assert all([d1 is d2 for d1, d2 in zip(res, testtokens)])   # modifies in-place
+        else:
+            assert all([d1 is not d2 for d1, d2 in zip(res, testtokens)])  # does *not* modify in-place
+
+        assert glued == {'in_New_York', 'in_Munich'}   # longest match first
+
+        for i, (d_, d) in enumerate(zip(tokens_, tokens)):
+            if testtokens is not tokens_mini_lists:
+                d = d.tolist()
+                if testtokens is tokens_mini:
+                    d_ = d_.tolist()
+
+            if i == 0:
+                assert d_ == ['I', 'live', 'in_New_York', '.']
+            elif i == 1:
+                assert d_ == ['I', 'am', 'in', 'Berlin', ',', 'but', 'my', 'flat', 'is', 'in_Munich', '.']
+            else:
+                assert d_ == d
+
+
 @cleanup_after_test
 @pytest.mark.parametrize(
     'testcase, split_chars, split_on_len, split_on_casechange',
@@ -822,6 +864,21 @@ def test_clean_tokens(docs, docs_type, remove_punct, remove_stopwords, remove_em
                 assert not np.any(np.char.isnumeric(dtok_))
 
 
+@cleanup_after_test
+def test_clean_tokens_example(tokens_mini, tokens_mini_arrays, tokens_mini_lists):
+    for testtokens in (tokens_mini, tokens_mini_arrays, tokens_mini_lists):
+        res = clean_tokens(testtokens, remove_shorter_than=3)
+        assert doc_tokens(res, to_lists=True) == [
+            ['live', 'New', 'York'],
+            ['Berlin', 'flat', 'Munich'],
+            ['Student', 'reading', 'mail', 'eCommerce', 'CamelCase'],
+            []
+        ]
+
+        with pytest.raises(ValueError):   # no stopwords available for Lithuanian
+            clean_tokens(testtokens, language='lt')
+
+
 @cleanup_after_test
 @pytest.mark.parametrize('search_patterns, by_meta, match_type, ignore_case, inverse, expected_docs', [
     ('in', False, 'exact', False, False, [['in'], ['in', 'in'], [], []]),
@@ -974,6 +1031,24 @@ def test_filter_tokens_with_kwic_example(tokens_mini, tokens_mini_arrays, tokens
         restokens = doc_tokens(res, to_lists=True)
         assert restokens == expected_docs
 
+        # same result with precomputed matches
+        matches = [np.isin(np.array(dtok, dtype=str), search_patterns) for dtok in doc_tokens(testtokens)]
+        res = filter_tokens_with_kwic(testtokens, search_patterns, matches=matches, **kwargs)
+        assert doc_tokens(res, to_lists=True) == expected_docs
+
+    with pytest.raises(ValueError):
+        filter_tokens_with_kwic(tokens_mini_lists, search_patterns, matches=[], **kwargs)
+
+
+def test_filter_tokens_with_kwic_filtered_docs(tokens_mini):
+    # matches refer to the unfiltered tokens of already filtered spaCy documents
+    docs = filter_tokens(tokens_mini, 'I', inverse=True)
+    expected = filter_tokens_with_kwic(doc_tokens(docs, to_lists=True), 'in', context_size=1)
+    assert expected[0] == ['live', 'in', 'New']
+
+    res = filter_tokens_with_kwic(docs, 'in', context_size=1)
+    assert doc_tokens(res, to_lists=True) == expected
+
 
 @cleanup_after_test
 @given(docs=strategy_tokens(string.printable),
@@ -1568,8 +1643,72 @@ def test_spacydoc_from_tokens(module_tokens_en_arrays, module_tokens_en_lists,
                     assert all([t.lemma_ == t_ for t, t_ in zip(doc, tokdoc)])
 
 
+def test_n_workers(tokens_en, tokens_en_arrays, tokens_en_lists):
+    # results of processing in parallel must be the same as for sequential processing
+    with pytest.raises(ValueError):
+        doc_frequencies(tokens_en_lists, n_workers=0)
+
+    docs = tokenize(corpora_sm['en'], n_workers=2)
+    assert doc_labels(docs) == doc_labels(tokens_en)
+    assert doc_tokens(docs, to_lists=True) == doc_tokens(tokens_en, to_lists=True)
+    assert tokenize(corpora_sm['en'], as_spacy_docs=False, n_workers=2) == \
+        tokenize(corpora_sm['en'], as_spacy_docs=False)
+
+    assert pos_tags(pos_tag(docs, n_workers=2)) == pos_tags(pos_tag(tokens_en))
+    assert lemmatize(tokens_en, n_workers=2) == lemmatize(tokens_en)
+
+    for testtokens in (tokens_en, tokens_en_arrays, tokens_en_lists):
+        # parallel processing first, because sequential processing may modify spaCy documents in-place
+        res = expand_compounds(testtokens, n_workers=2)
+        assert doc_tokens(res, to_lists=True) == doc_tokens(expand_compounds(testtokens), to_lists=True)
+
+        res = clean_tokens(testtokens, n_workers=2)
+        assert len(res) == len(testtokens)
+        if testtokens is tokens_en:
+            assert doc_labels(res) == doc_labels(testtokens)
+        assert doc_tokens(res, to_lists=True) == doc_tokens(clean_tokens(testtokens), to_lists=True)
+
+        res = filter_tokens(testtokens, ['the', 'a'], n_workers=2)
+        assert doc_tokens(res, to_lists=True) == doc_tokens(filter_tokens(testtokens, ['the', 'a']), to_lists=True)
+
+        res = remove_common_tokens(testtokens, df_threshold=0.5, n_workers=2)
+        assert doc_tokens(res, to_lists=True) == \
+            doc_tokens(remove_common_tokens(testtokens, df_threshold=0.5), to_lists=True)
+
+        assert doc_frequencies(testtokens, n_workers=2) == doc_frequencies(testtokens)
+        assert doc_frequencies(testtokens, proportions=True, n_workers=2) == \
+            doc_frequencies(testtokens, proportions=True)
+
+        dtm, vocab = sparse_dtm(testtokens, n_workers=2)
+        dtm_, vocab_ = sparse_dtm(testtokens)
+        assert vocab == vocab_
+        assert dtm.shape == dtm_.shape
+        assert (dtm.tocsr() != dtm_.tocsr()).nnz == 0
+
+        assert kwic(testtokens, 'the', glue=' ', n_workers=2) == kwic(testtokens, 'the', glue=' ')
+
+    # nlp instances that are not loaded from a model package, e.g. blank models, are passed to the worker processes
+    blank_nlp = spacy.blank('en')
+    docs = tokenize(corpora_sm['en'], nlp_instance=blank_nlp, n_workers=2)
+    assert doc_tokens(docs, to_lists=True) == \
+        doc_tokens(tokenize(corpora_sm['en'], nlp_instance=blank_nlp), to_lists=True)
+
+
+def test_n_workers_broken_process_pool(tokens_en_lists):
+    # a worker process that dies abruptly breaks the process pool, which is then replaced on the next call
+    with pytest.raises(BrokenProcessPool):
+        _docfuncs._parallel_map(_exit_process, tokens_en_lists, n_workers=2, returns_docs=False)
+    assert _docfuncs._parallel_executor is None
+
+    assert doc_frequencies(tokens_en_lists, n_workers=2) == doc_frequencies(tokens_en_lists)
+
+
 #%% helper functions
 
+def _exit_process(docs):
+    os._exit(1)
+
+
 _nlp_instances_cache = {}
 
 def _init_lang(code):
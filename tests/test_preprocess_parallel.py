@@ -3,10 +3,15 @@ Preprocessing: TMPreproc tests.
 """
 
 import os
+import glob
+import signal
+import asyncio
+import multiprocessing as mp
 import logging
 import tempfile
 import functools
 from copy import copy, deepcopy
+from concurrent.futures import Future
 
 import pytest
 import numpy as np
@@ -14,7 +19,9 @@ import pandas as pd
 from scipy import sparse
 from spacy.tokens import Doc
 
-from tmtoolkit.preprocess import TMPreproc, simplified_pos
+from tmtoolkit.preprocess import TMPreproc, PreprocPipeline, PreprocWorkerPool, DistributedWorkerPool, SpilledCorpus, \
+    WorkerTaskError, simplified_pos, sparse_dtm, run_worker_node
+from tmtoolkit.preprocess._sharedmem import SHARED_MEMORY_AVAILABLE, pack_result, discard_result
 from tmtoolkit.bow.bow_stats import tfidf
 from tmtoolkit._pd_dt_compat import USE_DT, FRAME_TYPE, pd_dt_frame, pd_dt_colnames, pd_dt_frame_to_list
 
@@ -178,6 +185,36 @@ def test_tmpreproc_en_create_from_tokens(tmpreproc_en):
                for k in tmpreproc_en.tokens.keys())
 
 
+@preproc_test(make_checks=False)
+def test_tmpreproc_en_create_from_token_arrays(tmpreproc_en):
+    tmpreproc_en.pos_tag().lemmatize().add_metadata_per_token('mark', {'Disney': 1, 'Florida': 2}, default=0)
+    tokens = tmpreproc_en.get_tokens(with_metadata=True, as_datatables=False, arrays_to_lists=False)
+    assert all(isinstance(doc['token'], np.ndarray) for doc in tokens.values())
+
+    # load dicts of arrays
+    preproc2 = TMPreproc.from_tokens(tokens, language='en')
+    assert preproc2.pos_tagged
+    assert set(preproc2.get_available_metadata_keys()) == set(tmpreproc_en.get_available_metadata_keys())
+
+    tokens2 = preproc2.get_tokens(with_metadata=True, as_datatables=False, arrays_to_lists=False)
+    assert set(tokens2.keys()) == set(tokens.keys())
+    for dl, doc in tokens.items():
+        doc2 = tokens2[dl]
+        assert set(doc2.keys()) == set(doc.keys())
+        for col, coldata in doc.items():
+            assert np.array_equal(doc2[col], coldata)
+
+    # load plain token arrays
+    preproc3 = TMPreproc.from_tokens({dl: doc['token'] for dl, doc in tokens.items()}, language='en')
+    assert preproc3.tokens == tmpreproc_en.tokens
+
+    with pytest.raises(ValueError):
+        TMPreproc.from_tokens({'doc': {'lemma': ['a']}}, language='en')
+
+    preproc2.shutdown_workers()
+    preproc3.shutdown_workers()
+
+
 @preproc_test(make_checks=False)
 def test_tmpreproc_en_load_tokens(tmpreproc_en):
     # two modifications: remove word "Disney" and remove a document
@@ -325,6 +362,40 @@ def test_tmpreproc_en_add_metadata_per_doc_and_remove_metadata(tmpreproc_en):
         tmpreproc_en.remove_metadata('random_foo')
 
 
+@preproc_test()
+def test_tmpreproc_en_metadata_columns(tmpreproc_en):
+    # metadata is stored as NumPy array column per document in `user_data`
+    tmpreproc_en.add_metadata_per_token('mark', {'Disney': 1, 'Florida': 2})
+    tmpreproc_en.filter_tokens(['Disney', 'Florida', 'is'])
+
+    for doc in tmpreproc_en.spacy_docs.values():
+        assert isinstance(doc.user_data['meta_mark'], np.ndarray)
+        assert len(doc.user_data['meta_mark']) == len(doc) == len(doc.user_data['mask'])
+
+    # mixed value types (None default) must survive copying, state saving and compacting
+    _check_copies(tmpreproc_en, tmpreproc_en.copy())
+    _check_save_load_state(tmpreproc_en)
+
+    for dl, doc_tok in tmpreproc_en.get_tokens(with_metadata=True, as_datatables=False).items():
+        for t, m in zip(doc_tok['token'], doc_tok['meta_mark']):
+            assert m == {'Disney': 1, 'Florida': 2}.get(t)
+
+    tmpreproc_en.filter_tokens(1, by_meta='mark')
+    assert tmpreproc_en.vocabulary in ([], ['Disney'])
+
+    tmpreproc_en.compact_documents()
+    for dl, doc_tok in tmpreproc_en.get_tokens(with_metadata=True, as_datatables=False).items():
+        assert len(doc_tok['meta_mark']) == len(doc_tok['token'])
+        assert all(m == 1 for m in doc_tok['meta_mark'])
+
+    # documents added later get a metadata column, too
+    tmpreproc_en.add_documents({'new_doc': 'Disney World'})
+    new_doc = tmpreproc_en.spacy_docs['new_doc']
+    assert isinstance(new_doc.user_data['meta_mark'], np.ndarray)
+    assert len(new_doc.user_data['meta_mark']) == len(new_doc)
+    assert tmpreproc_en.get_tokens(with_metadata=True, as_datatables=False)['new_doc']['meta_mark'] == [1]
+
+
 @preproc_test(make_checks=False)
 def test_tmpreproc_en_load_tokens_with_metadata(tmpreproc_en):
     meta = {
@@ -465,6 +536,57 @@ def test_tmpreproc_en_tokens_datatable(tmpreproc_en):
     assert np.array_equal(ind1, np.concatenate(expected_indices))
 
 
+@pytest.mark.parametrize('batch_size, with_metadata', [
+    (1, True),
+    (3, False),
+    (1000, True),
+])
+def test_tmpreproc_en_iter_tokens_batches(tmpreproc_en, batch_size, with_metadata):
+    tmpreproc_en.pos_tag().add_metadata_per_token('is_abc', {'abc': True}, default=False)
+    df = tmpreproc_en.tokens_datatable
+    colnames = pd_dt_colnames(df)
+    expected = dict(zip(colnames, pd_dt_frame_to_list(df)))
+    if not with_metadata:
+        expected = {col: expected[col] for col in ('doc', 'position', 'token')}
+
+    batches = list(tmpreproc_en.iter_tokens_batches(batch_size, with_metadata=with_metadata))
+    assert len(batches) == int(np.ceil(tmpreproc_en.n_docs / batch_size))
+
+    for batch in batches:
+        assert list(batch.keys())[:3] == ['doc', 'position', 'token']
+        assert set(batch.keys()) == set(expected.keys())
+
+    for col, values in expected.items():
+        assert np.concatenate([batch[col] for batch in batches]).tolist() == list(values)
+
+    for batch in tmpreproc_en.iter_tokens_batches(batch_size, as_datatables=True):
+        assert isinstance(batch, FRAME_TYPE)
+
+    with pytest.raises(ValueError):
+        next(tmpreproc_en.iter_tokens_batches(0))
+
+    tmpreproc_en.shutdown_workers()
+
+
+def test_tmpreproc_en_write_tokens_batches(tmpreproc_en):
+    tmpreproc_en.pos_tag()
+    tokens = tmpreproc_en.get_tokens(with_metadata=True)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        spilled = tmpreproc_en.write_tokens_batches(out_dir, batch_size=2)
+        assert isinstance(spilled, SpilledCorpus)
+        assert all(os.path.dirname(f) == out_dir for f in spilled.chunk_files)
+        assert sorted(spilled.doc_labels) == tmpreproc_en.doc_labels
+        assert spilled.vocabulary == tmpreproc_en.vocabulary
+
+        for dl, doc in spilled.iter_tokens(with_metadata=True):
+            assert set(doc.keys()) == set(tokens[dl].keys())
+            for col, values in doc.items():
+                assert values.tolist() == tokens[dl][col]
+
+    tmpreproc_en.shutdown_workers()
+
+
 @preproc_test()
 def test_tmpreproc_en_tokens_dataframe(tmpreproc_en):
     doc_lengths = tmpreproc_en.doc_lengths
@@ -558,6 +680,608 @@ def test_tmpreproc_en_get_dtm(tmpreproc_en):
     assert not (dtm != dtm_prop).toarray().any()
 
 
+@pytest.mark.parametrize('n_max_processes, use_token_ids', [
+    (1, False),
+    (3, False),
+    (3, True),
+    (len(corpus_en) + 2, False),   # more workers than documents
+])
+def test_tmpreproc_en_get_dtm_matches_sequential(n_max_processes, use_token_ids):
+    preproc = TMPreproc(corpus_en, language='en', n_max_processes=n_max_processes, use_token_ids=use_token_ids)
+    preproc.tokens_to_lowercase().clean_tokens()
+
+    tokens = preproc.tokens
+    expected_dtm, expected_vocab = sparse_dtm([tokens[dl] for dl in preproc.doc_labels])
+
+    dtm = preproc.get_dtm(dtype=np.float64)
+    assert isinstance(dtm, sparse.csr_matrix)
+    assert dtm.dtype == np.float64
+    assert dtm.has_sorted_indices
+    assert preproc.vocabulary == list(expected_vocab)
+    assert dtm.shape == expected_dtm.shape
+    assert not (dtm != expected_dtm).toarray().any()
+
+    preproc.shutdown_workers()
+
+
+@pytest.mark.skipif(not SHARED_MEMORY_AVAILABLE, reason='shared memory requires Python 3.8 or newer')
+def test_tmpreproc_en_use_shared_memory(tmpreproc_en):
+    preproc = TMPreproc(corpus_en, language='en', use_shared_memory=True)
+    assert preproc.use_shared_memory
+
+    for _ in range(2):    # second pass after tokens were modified
+        tokens = preproc.tokens
+        tokens_meta = preproc.tokens_with_metadata
+        expected_tokens_meta = tmpreproc_en.tokens_with_metadata
+        assert tokens == tmpreproc_en.tokens
+        assert set(tokens_meta.keys()) == set(expected_tokens_meta.keys())
+        for dl, doc_meta in tokens_meta.items():
+            assert _dataframes_equal(doc_meta, expected_tokens_meta[dl])
+
+        dtm = preproc.dtm
+        assert dtm.shape == tmpreproc_en.dtm.shape
+        assert not (dtm != tmpreproc_en.dtm).toarray().any()
+        assert preproc.vocabulary_counts == tmpreproc_en.vocabulary_counts
+
+        preproc.tokens_to_lowercase().clean_tokens()
+        tmpreproc_en.tokens_to_lowercase().clean_tokens()
+
+    preproc_copy = preproc.copy()
+    assert preproc_copy.use_shared_memory
+    _check_copies(preproc, preproc_copy)
+
+    preproc_copy.shutdown_workers()
+    preproc.shutdown_workers()
+    tmpreproc_en.shutdown_workers()
+
+
+@pytest.mark.skipif(not SHARED_MEMORY_AVAILABLE, reason='shared memory requires Python 3.8 or newer')
+def test_discard_shared_memory_result():
+    from multiprocessing import shared_memory
+
+    res = pack_result({'a': np.arange(10), 'b': 'foo'})
+    shared_memory.SharedMemory(name=res.shm_name).close()   # block exists
+
+    discard_result(res)
+    with pytest.raises(FileNotFoundError):   # block was unlinked
+        shared_memory.SharedMemory(name=res.shm_name)
+
+    discard_result(res)      # discarding twice doesn't fail
+    discard_result('foo')    # results without shared memory block are ignored
+
+
+def test_tmpreproc_en_use_token_ids(tmpreproc_en):
+    preproc = TMPreproc(corpus_en, language='en', use_token_ids=True)
+    assert preproc.use_token_ids
+
+    def check_equal():
+        assert preproc.tokens == tmpreproc_en.tokens
+        assert preproc.vocabulary == tmpreproc_en.vocabulary
+        assert preproc.vocabulary_counts == tmpreproc_en.vocabulary_counts
+        assert preproc.vocabulary_abs_doc_frequency == tmpreproc_en.vocabulary_abs_doc_frequency
+        assert preproc.dtm.shape == tmpreproc_en.dtm.shape
+        assert not (preproc.dtm != tmpreproc_en.dtm).toarray().any()
+
+    check_equal()
+
+    for p in (preproc, tmpreproc_en):
+        p.tokens_to_lowercase().remove_special_chars_in_tokens()
+    check_equal()
+
+    for p in (preproc, tmpreproc_en):
+        p.clean_tokens().filter_tokens('*e*', match_type='glob')
+    check_equal()
+
+    for p in (preproc, tmpreproc_en):
+        p.transform_tokens(str.upper, process_on_workers=True)
+    check_equal()
+
+    # tasks that work on string tokens without changing them, followed by tasks that change the tokens
+    assert preproc.get_kwic('THE') == tmpreproc_en.get_kwic('THE')
+    for p in (preproc, tmpreproc_en):
+        p.filter_documents('*A*', match_type='glob').filter_tokens_with_kwic('THE', context_size=2)
+    check_equal()
+
+    for p in (preproc, tmpreproc_en):
+        p.expand_compound_tokens()
+    check_equal()
+
+    preproc_copy = preproc.copy()
+    assert preproc_copy.use_token_ids
+    _check_copies(preproc, preproc_copy)
+
+    preproc_copy.shutdown_workers()
+    preproc.shutdown_workers()
+    tmpreproc_en.shutdown_workers()
+
+
+@pytest.mark.parametrize('use_token_ids', [False, True])
+def test_tmpreproc_en_use_token_index(tmpreproc_en, use_token_ids):
+    preproc = TMPreproc(corpus_en, language='en', use_token_index=True, use_token_ids=use_token_ids)
+    assert preproc.use_token_index
+
+    def check_kwic(search_tokens, **kwargs):
+        assert preproc.get_kwic(search_tokens, **kwargs) == tmpreproc_en.get_kwic(search_tokens, **kwargs)
+
+    def check_queries():
+        check_kwic('the')
+        check_kwic(['The', 'law'], context_size=1)
+        check_kwic('THE', ignore_case=True)
+        check_kwic('pol*', match_type='glob', ignore_case=True)
+        check_kwic(r'^\d+$', match_type='regex', inverse=True)
+        check_kwic('not-a-token')
+        assert preproc.tokens == tmpreproc_en.tokens
+
+    check_queries()
+
+    # the index is updated by token transformations and stays valid when filtering tokens or documents
+    for p in (preproc, tmpreproc_en):
+        p.tokens_to_lowercase().remove_special_chars_in_tokens()
+    check_queries()
+
+    for p in (preproc, tmpreproc_en):
+        p.clean_tokens().filter_tokens('*e*', match_type='glob')
+    check_queries()
+
+    for p in (preproc, tmpreproc_en):
+        p.filter_documents('the', matches_threshold=2)
+    check_queries()
+
+    for p in (preproc, tmpreproc_en):
+        p.transform_tokens(str.upper, process_on_workers=True)
+    check_queries()
+
+    for p in (preproc, tmpreproc_en):
+        p.filter_tokens_with_kwic('THE', context_size=3)
+    check_queries()
+
+    # the index is rebuilt after gluing tokens
+    assert preproc.glue_tokens(['ON', 'THE'], glue='_') == tmpreproc_en.glue_tokens(['ON', 'THE'], glue='_')
+    check_kwic('ON_THE')
+    check_queries()
+
+    preproc.shutdown_workers()
+    tmpreproc_en.shutdown_workers()
+
+
+@preproc_test()
+def test_tmpreproc_en_add_remove_update_documents(tmpreproc_en):
+    all_labels = sorted(corpus_en.keys())
+    initial_docs = {dl: corpus_en[dl] for dl in all_labels[:len(all_labels) // 2]}
+    new_docs = {dl: corpus_en[dl] for dl in all_labels[len(all_labels) // 2:]}
+
+    def apply_steps(p):
+        return p.tokens_to_lowercase().remove_special_chars_in_tokens().clean_tokens().pos_tag()\
+            .transform_tokens(str.upper)
+
+    preproc = apply_steps(TMPreproc(initial_docs, language='en'))
+    assert len(preproc.pipeline) == 5
+    assert preproc.add_documents(new_docs) is preproc
+    assert set(preproc.docs2workers.keys()) == set(corpus_en.keys())
+
+    apply_steps(tmpreproc_en)
+    assert preproc.doc_labels == tmpreproc_en.doc_labels
+    assert preproc.tokens == tmpreproc_en.tokens
+    assert preproc.vocabulary == tmpreproc_en.vocabulary
+    assert preproc.pos_tagged
+    assert preproc.tokens_with_pos_tags.keys() == tmpreproc_en.tokens_with_pos_tags.keys()
+    assert all(_dataframes_equal(df, tmpreproc_en.tokens_with_pos_tags[dl])
+               for dl, df in preproc.tokens_with_pos_tags.items())
+
+    with pytest.raises(ValueError):   # documents already exist
+        preproc.add_documents(new_docs)
+
+    removed_labels = list(new_docs.keys())[:2]
+    assert preproc.remove_documents_by_label(removed_labels) is preproc
+    assert preproc.doc_labels == sorted(set(all_labels) - set(removed_labels))
+    assert all(dl not in preproc.docs2workers for dl in removed_labels)
+
+    with pytest.raises(ValueError):   # documents do not exist anymore
+        preproc.remove_documents_by_label(removed_labels)
+
+    updated_doc_label = all_labels[0]
+    assert preproc.update_documents({updated_doc_label: 'Hello world!'}) is preproc
+    assert preproc.n_docs == len(all_labels) - len(removed_labels)
+    assert preproc.tokens[updated_doc_label] == ['HELLO', 'WORLD']
+
+    # processing steps with a function that cannot be pickled cannot be replayed
+    preproc.transform_tokens(lambda t: t.lower())
+    with pytest.raises(ValueError):
+        preproc.add_documents({'new': 'Hello world!'})
+
+    preproc.shutdown_workers()
+
+
+@preproc_test()
+def test_tmpreproc_en_lazy_pipeline(tmpreproc_en):
+    preproc = TMPreproc(corpus_en, language='en', lazy=True)
+    assert preproc.lazy
+
+    def apply_steps(p):
+        return p.tokens_to_lowercase().remove_special_chars_in_tokens().clean_tokens().pos_tag()\
+            .filter_for_pos('N').filter_documents('*e*', match_type='glob')
+
+    apply_steps(preproc)
+    assert len(preproc._pending_tasks) == 6
+    assert [task for task, _ in preproc.pipeline] == ['tokens_to_lowercase', 'remove_chars', 'clean_tokens', 'pos_tag',
+                                                       'filter_for_pos', 'filter_documents']
+
+    apply_steps(tmpreproc_en)
+    assert len(tmpreproc_en._pending_tasks) == 0
+    assert tmpreproc_en.pipeline == preproc.pipeline
+
+    # requesting results runs the deferred tasks
+    assert preproc.doc_labels == tmpreproc_en.doc_labels
+    assert len(preproc._pending_tasks) == 0
+    assert preproc.tokens == tmpreproc_en.tokens
+    assert preproc.pos_tagged
+    assert preproc.dtm.shape == tmpreproc_en.dtm.shape
+    assert not (preproc.dtm != tmpreproc_en.dtm).toarray().any()
+
+    # non-deferred tasks run the deferred tasks before
+    preproc.tokens_to_lowercase().generate_ngrams(2)
+    tmpreproc_en.tokens_to_lowercase().generate_ngrams(2)
+    assert len(preproc._pending_tasks) == 0
+    assert preproc.ngrams == tmpreproc_en.ngrams
+
+    preproc.shutdown_workers()
+
+
+def test_tmpreproc_en_apply_pipeline(tmpreproc_en):
+    tmpreproc_en.tokens_to_lowercase().remove_special_chars_in_tokens().clean_tokens()\
+        .glue_tokens(['new', 'york'])
+    pipeline = tmpreproc_en.pipeline
+    assert len(pipeline) == 4
+
+    with tempfile.TemporaryFile(suffix='.pickle') as ftemp:
+        pipeline.save(ftemp)
+        ftemp.seek(0)
+        loaded_pipeline = PreprocPipeline.load(ftemp)
+
+    assert loaded_pipeline == pipeline
+
+    for lazy in (False, True):
+        preproc = TMPreproc(corpus_en, language='en', lazy=lazy)
+        assert preproc.apply_pipeline(loaded_pipeline) is preproc
+        assert preproc.pipeline == pipeline
+        assert preproc.tokens == tmpreproc_en.tokens
+        preproc.shutdown_workers()
+
+    # pipelines with functions that cannot be pickled cannot be applied
+    tmpreproc_en.transform_tokens(lambda t: t.upper())
+    assert not tmpreproc_en.pipeline.replayable
+
+    with pytest.raises(ValueError):
+        tmpreproc_en.pipeline.save(os.path.join(tempfile.gettempdir(), 'pipeline.pickle'))
+
+    preproc = TMPreproc(corpus_en, language='en')
+    with pytest.raises(ValueError):
+        preproc.apply_pipeline(tmpreproc_en.pipeline)
+
+    preproc.shutdown_workers()
+    tmpreproc_en.shutdown_workers()
+
+
+@preproc_test()
+def test_tmpreproc_en_rebalance_workers(tmpreproc_en):
+    if tmpreproc_en.n_workers < 2:
+        pytest.skip('at least two workers required')
+
+    # remove all documents from the first worker in order to create an imbalanced load
+    first_worker_docs = [dl for dl, w in tmpreproc_en.docs2workers.items() if w == 0]
+    tmpreproc_en.remove_documents_by_label(first_worker_docs).generate_ngrams(2)
+
+    doc_labels = tmpreproc_en.doc_labels
+    tokens = tmpreproc_en.tokens
+    ngrams = tmpreproc_en.ngrams
+
+    with pytest.raises(ValueError):
+        tmpreproc_en.rebalance_workers(-1)
+
+    assert tmpreproc_en.rebalance_workers(0) is tmpreproc_en
+    assert set(tmpreproc_en.docs2workers.keys()) == set(doc_labels)
+    assert tmpreproc_en.doc_labels == doc_labels
+    assert tmpreproc_en.tokens == tokens
+    assert tmpreproc_en.ngrams == ngrams
+
+
+def test_tmpreproc_en_rebalance_threshold(tmpreproc_en):
+    preproc = TMPreproc(corpus_en, language='en', rebalance_threshold=0.1)
+    assert preproc.rebalance_threshold == 0.1
+
+    preproc.pos_tag().lemmatize()
+    tmpreproc_en.pos_tag().lemmatize()
+    assert preproc.tokens == tmpreproc_en.tokens
+
+    # in lazy mode, the rebalancing doesn't run the pending tasks, but is deferred until they're run
+    preproc_lazy = TMPreproc(corpus_en, language='en', lazy=True, rebalance_threshold=0.1)
+    preproc_lazy.pos_tag().lemmatize()
+    assert [task for task, _ in preproc_lazy._pending_tasks] == ['pos_tag', 'lemmatize']
+    assert preproc_lazy.tokens == tmpreproc_en.tokens
+    assert not preproc_lazy._pending_tasks
+    assert not preproc_lazy._rebalance_pending
+
+    preproc.shutdown_workers()
+    preproc_lazy.shutdown_workers()
+    tmpreproc_en.shutdown_workers()
+
+
+@pytest.mark.parametrize('chunk_size, use_pipeline_obj', [
+    (1, False),
+    (3, True),
+    (1000, False),
+])
+def test_tmpreproc_en_process_stream(tmpreproc_en, chunk_size, use_pipeline_obj):
+    def apply_steps(p):
+        return p.tokens_to_lowercase().remove_special_chars_in_tokens().clean_tokens().pos_tag()
+
+    apply_steps(tmpreproc_en)
+    pipeline = tmpreproc_en.pipeline if use_pipeline_obj else apply_steps
+    stream = ((dl, txt) for dl, txt in sorted(corpus_en.items()))
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        spilled = TMPreproc.process_stream(stream, pipeline, chunk_size=chunk_size, spill_dir=spill_dir,
+                                           language='en')
+        assert isinstance(spilled, SpilledCorpus)
+        assert len(spilled.chunk_files) == int(np.ceil(len(corpus_en) / chunk_size))
+        assert all(os.path.exists(f) for f in spilled.chunk_files)
+
+        assert spilled.n_docs == tmpreproc_en.n_docs
+        assert spilled.doc_labels == tmpreproc_en.doc_labels
+        assert spilled.vocabulary == tmpreproc_en.vocabulary
+
+        tokens = tmpreproc_en.tokens
+        for dl, dtok in spilled.iter_tokens():
+            assert dtok.tolist() == tokens[dl]
+
+        tokens_meta = tmpreproc_en.get_tokens(with_metadata=True)
+        for dl, doc in spilled.iter_tokens(with_metadata=True):
+            assert set(doc.keys()) == set(tokens_meta[dl].keys())
+            assert doc['pos'].tolist() == tokens_meta[dl]['pos']
+
+        dtm = spilled.get_dtm()
+        assert dtm.shape == tmpreproc_en.dtm.shape
+        assert not (dtm != tmpreproc_en.dtm).toarray().any()
+
+        spilled.remove_files()
+        assert not os.listdir(spill_dir)
+
+    stream_dirs = set(glob.glob(os.path.join(tempfile.gettempdir(), 'tmtoolkit_stream_*')))
+    with pytest.raises(ValueError):   # duplicate document labels
+        TMPreproc.process_stream([('a', 'foo'), ('a', 'bar')], chunk_size=1, language='en')
+    # the spilled chunks and the temporary spill directory are removed
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(), 'tmtoolkit_stream_*'))) == stream_dirs
+
+    with pytest.raises(ValueError):   # duplicate document labels in the same chunk
+        TMPreproc.process_stream([('a', 'foo'), ('b', 'bar'), ('a', 'baz')], chunk_size=3, language='en')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spill_dir = os.path.join(tmp_dir, 'spill')
+        with pytest.raises(ValueError):   # a spill directory created by process_stream is removed
+            TMPreproc.process_stream([('x', 'foo'), ('y', 'bar'), ('z', 'baz'), ('x', 'foo')], chunk_size=3,
+                                     spill_dir=spill_dir, language='en')
+        assert not os.path.exists(spill_dir)
+
+        os.mkdir(spill_dir)
+        with pytest.raises(ValueError):   # an existing spill directory is kept, but emptied
+            TMPreproc.process_stream([('a', 'foo'), ('b', 'bar'), ('a', 'baz')], chunk_size=2,
+                                     spill_dir=spill_dir, language='en')
+        assert os.listdir(spill_dir) == []
+
+    tmpreproc_en.shutdown_workers()
+
+
+@pytest.mark.parametrize('recreate_from_state', [False, True])
+def test_tmpreproc_en_save_load_binary_state(tmpreproc_en, recreate_from_state):
+    tmpreproc_en.tokens_to_lowercase().clean_tokens().pos_tag().generate_ngrams(2)
+    tmpreproc_en.add_metadata_per_token('is_abc', {'abc': True}, default=False)
+
+    tmpreproc_en = _check_save_load_state(tmpreproc_en, repeat=2, recreate_from_state=recreate_from_state,
+                                          binary=True)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        tmpreproc_en.save_binary_state(state_dir)
+        assert os.path.exists(os.path.join(state_dir, 'manager.pickle'))
+        assert len([f for f in os.listdir(state_dir) if f.endswith('.npz')]) == tmpreproc_en.n_workers
+
+        preproc = TMPreproc.from_binary_state(state_dir)
+        assert preproc.get_available_metadata_keys() == tmpreproc_en.get_available_metadata_keys()
+        assert _dataframes_equal(preproc.tokens_datatable, tmpreproc_en.tokens_datatable)
+        assert preproc.pipeline == tmpreproc_en.pipeline
+
+        # all token attributes and the tensors are restored
+        docs_a = tmpreproc_en.spacy_docs
+        docs_b = preproc.spacy_docs
+        for dl, doc_a in docs_a.items():
+            doc_b = docs_b[dl]
+            assert doc_a.is_tagged == doc_b.is_tagged
+            assert [(t.lemma_, t.norm_, t.tag_, t.pos_, t.dep_, t.ent_type_) for t in doc_a] == \
+                [(t.lemma_, t.norm_, t.tag_, t.pos_, t.dep_, t.ent_type_) for t in doc_b]
+            assert np.array_equal(doc_a.tensor, doc_b.tensor)
+        preproc.shutdown_workers()
+
+        with pytest.raises(ValueError):
+            TMPreproc.from_binary_state(state_dir, language='en')
+
+    tmpreproc_en.shutdown_workers()
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        with pytest.raises(RuntimeError):   # workers are shut down
+            tmpreproc_en.save_binary_state(state_dir)
+
+
+def test_tmpreproc_en_worker_pool(tmpreproc_en):
+    tmpreproc_en.tokens_to_lowercase().clean_tokens().pos_tag()
+
+    with PreprocWorkerPool(language='en', n_max_processes=2, name='test') as pool:
+        assert pool.alive
+        assert pool.n_workers == 2
+        assert pool.language_model == tmpreproc_en.language_model
+
+        preproc_a = TMPreproc(corpus_en, pool=pool)
+        preproc_b = TMPreproc({'a': 'Hello World.', 'b': 'Another test document.'}, pool=pool, use_token_ids=True)
+        assert pool.n_attached == 2
+        assert preproc_a.n_workers == preproc_b.n_workers == 2
+        assert preproc_a.workers == preproc_b.workers == pool.workers
+
+        preproc_a.tokens_to_lowercase().clean_tokens()
+        preproc_b.tokens_to_lowercase()
+        preproc_a.pos_tag()
+
+        # the sessions don't interfere with each other
+        assert preproc_a.doc_labels == tmpreproc_en.doc_labels
+        assert preproc_a.tokens == tmpreproc_en.tokens
+        assert _dataframes_equal(preproc_a.tokens_datatable, tmpreproc_en.tokens_datatable)
+        assert preproc_b.tokens == {'a': ['hello', 'world', '.'], 'b': ['another', 'test', 'document', '.']}
+
+        preproc_c = preproc_a.copy()
+        assert preproc_c.pool is pool
+        assert pool.n_attached == 3
+        assert preproc_c.tokens == preproc_a.tokens
+
+        preproc_a.shutdown_workers()
+        assert pool.n_attached == 2
+        assert pool.alive
+        assert preproc_b.tokens == {'a': ['hello', 'world', '.'], 'b': ['another', 'test', 'document', '.']}
+
+        with pytest.raises(ValueError):   # language model does not match
+            TMPreproc(corpus_de, language='de', pool=pool)
+
+        preproc_b.shutdown_workers()
+        preproc_c.shutdown_workers()
+        assert pool.n_attached == 0
+
+    assert not pool.alive
+
+    with pytest.raises(RuntimeError):   # pool was shut down
+        TMPreproc(corpus_en, pool=pool)
+
+    tmpreproc_en.shutdown_workers()
+
+
+def test_tmpreproc_en_distributed_worker_pool(tmpreproc_en):
+    tmpreproc_en.tokens_to_lowercase().clean_tokens().pos_tag()
+
+    pool = DistributedWorkerPool(3, authkey='test', address=('127.0.0.1', 0), language='en', name='test')
+    assert pool.alive
+    assert pool.n_connected == 0
+    assert pool.language_model == tmpreproc_en.language_model
+
+    # two "worker nodes" on localhost
+    nodes = [mp.Process(target=run_worker_node, args=(pool.address, 'test', 2)) for _ in range(2)]
+    [node.start() for node in nodes]
+
+    preproc = TMPreproc(corpus_en, pool=pool)
+    assert pool.n_connected == 3
+    assert preproc.n_workers == 3
+
+    preproc.tokens_to_lowercase().clean_tokens().pos_tag()
+    assert preproc.doc_labels == tmpreproc_en.doc_labels
+    assert preproc.tokens == tmpreproc_en.tokens
+    assert _dataframes_equal(preproc.tokens_datatable, tmpreproc_en.tokens_datatable)
+    assert preproc.vocabulary == tmpreproc_en.vocabulary
+    assert (preproc.dtm != tmpreproc_en.dtm).nnz == 0
+
+    with pytest.raises(ValueError):
+        TMPreproc(corpus_en, pool=pool, use_shared_memory=True)
+
+    preproc.shutdown_workers()
+    pool.shutdown()
+    assert not pool.alive
+
+    [node.join(10) for node in nodes]
+    assert all(node.exitcode == 0 for node in nodes)
+
+    tmpreproc_en.shutdown_workers()
+
+
+def test_tmpreproc_en_async(tmpreproc_en):
+    preproc = tmpreproc_en.copy()
+
+    fut = tmpreproc_en.clean_tokens_async()
+    assert isinstance(fut, Future)
+    assert fut.result() is tmpreproc_en
+
+    # submitted methods are run in order of submission
+    fut_pos = tmpreproc_en.pos_tag_async()
+    fut_lemma = tmpreproc_en.lemmatize_async()
+    fut_dtm = tmpreproc_en.get_dtm_async()
+    fut_kwic = tmpreproc_en.get_kwic_async('house', context_size=1)
+
+    # meanwhile process another instance in this thread
+    preproc.clean_tokens().pos_tag().lemmatize()
+
+    assert fut_pos.result() is tmpreproc_en
+    assert fut_lemma.result() is tmpreproc_en
+    dtm = fut_dtm.result()
+    assert dtm.shape == preproc.dtm.shape
+    assert not (dtm != preproc.dtm).toarray().any()
+    assert fut_kwic.result() == preproc.get_kwic('house', context_size=1)
+
+    async def get_vocab():
+        return await asyncio.wrap_future(preproc.submit('get_vocabulary'))
+
+    assert asyncio.get_event_loop().run_until_complete(get_vocab()) == tmpreproc_en.vocabulary
+
+    with pytest.raises(ValueError):
+        preproc.submit('_send_task_to_workers', 'pos_tag')
+
+    preproc.shutdown_workers()
+
+    with pytest.raises(RuntimeError):   # workers are shut down
+        preproc.submit('pos_tag')
+
+    tmpreproc_en.shutdown_workers()
+
+
+@pytest.mark.parametrize('use_pool', [False, True])
+def test_tmpreproc_en_profiling(use_pool):
+    pool = PreprocWorkerPool(language='en', n_max_processes=2) if use_pool else None
+    preproc = TMPreproc(corpus_en, language='en', n_max_processes=2, pool=pool, profile=True)
+    assert preproc.profiling
+
+    callback_records = []
+    preproc.add_profile_callback(callback_records.append)
+
+    with pytest.raises(ValueError):
+        preproc.add_profile_callback('not callable')
+
+    preproc.tokens_to_lowercase()
+    dtm = preproc.get_dtm()
+
+    report = preproc.profile_report()
+    assert isinstance(report, pd.DataFrame)
+
+    # the callback got the same records except for the init task, which was run before adding the callback
+    assert [rec['task'] for recs in callback_records for rec in recs] == \
+           [t for t in report.task.tolist() if t != 'init']
+
+    assert report.shape[0] > 0
+    assert set(report.task) >= {'init', 'tokens_to_lowercase', 'get_dtm'}
+    assert (report.compute_time >= 0).all()
+    assert (report.wait_time >= 0).all()
+    assert (report.wall_time >= report.compute_time + report.serialize_time).all()
+
+    dtm_rows = report[report.task == 'get_dtm']
+    assert set(dtm_rows.worker) == set(range(preproc.n_workers))
+    assert (dtm_rows.result_bytes > 0).all()
+    assert dtm_rows.n_docs.sum() == preproc.n_docs == dtm.shape[0]
+
+    report_tasks = preproc.profile_report(per_worker=False, reset=True)
+    assert report_tasks.shape[0] == len(set(report.task_id))
+    assert report_tasks.loc[report_tasks.task == 'get_dtm', 'n_docs'].iloc[0] == preproc.n_docs
+    assert preproc.profile_report().shape[0] == 0
+
+    preproc.set_profiling(False)
+    assert not preproc.profiling
+    preproc.tokens_to_lowercase()
+    assert set(preproc.profile_report().task) == {'set_profiling'}   # only the `set_profiling` task itself
+
+    preproc.shutdown_workers()
+    if pool is not None:
+        pool.shutdown()
+
+
 @preproc_test(make_checks=False)
 def test_tmpreproc_en_get_dtm_calc_tfidf(tmpreproc_en):
     tmpreproc_en.remove_documents_by_name('empty')
@@ -688,6 +1412,34 @@ def test_tmpreproc_en_pos_tag(tmpreproc_en):
             assert all(tok_pos_df.pos.str.len() > 0)
 
 
+@pytest.mark.parametrize('batch_size, threads_per_worker', [
+    (1, 1),
+    (3, 1),
+    (None, 2),
+    (2, 3),
+])
+def test_tmpreproc_en_pos_tag_batched(tmpreproc_en, batch_size, threads_per_worker):
+    with pytest.raises(ValueError):
+        TMPreproc(corpus_en, language='en', batch_size=0)
+    with pytest.raises(ValueError):
+        TMPreproc(corpus_en, language='en', threads_per_worker=0)
+
+    preproc = TMPreproc(corpus_en, language='en', batch_size=batch_size, threads_per_worker=threads_per_worker)
+    assert preproc.tokens == tmpreproc_en.tokens
+
+    preproc.pos_tag()
+    tmpreproc_en.pos_tag()
+    assert _dataframes_equal(preproc.tokens_datatable, tmpreproc_en.tokens_datatable)
+
+    preproc_copy = preproc.copy()
+    assert preproc_copy.batch_size == batch_size
+    assert preproc_copy.threads_per_worker == threads_per_worker
+
+    preproc_copy.shutdown_workers()
+    preproc.shutdown_workers()
+    tmpreproc_en.shutdown_workers()
+
+
 @preproc_test()
 def test_tmpreproc_en_lemmatize(tmpreproc_en):
     tokens = tmpreproc_en.tokens
@@ -770,6 +1522,44 @@ def test_tmpreproc_en_glue_tokens(tmpreproc_en, patterns, glue, match_type):
             assert any(g in dtok for dtok in tmpreproc_en.tokens.values())
 
 
+@pytest.mark.parametrize(
+    'phrases, glue',
+    [
+        ([], '_'),
+        (['on'], '_'),
+        (['on the'], '_'),
+        (['on the', 'on the law', ('of', 'the')], '//'),
+    ]
+)
+@preproc_test(make_checks=False)
+def test_tmpreproc_en_glue_phrases(tmpreproc_en, phrases, glue):
+    if not phrases or phrases == ['on']:
+        with pytest.raises(ValueError):
+            tmpreproc_en.glue_phrases(phrases, glue=glue)
+    else:
+        if len(phrases) == 1:
+            tmpreproc_copy = tmpreproc_en.copy()
+            glued_subsequent = tmpreproc_copy.glue_tokens(phrases[0].split(), glue=glue)
+            tokens_subsequent = tmpreproc_copy.tokens
+            tmpreproc_copy.shutdown_workers()
+        else:
+            glued_subsequent = tokens_subsequent = None
+
+        glued = tmpreproc_en.glue_phrases(phrases, glue=glue)
+        assert isinstance(glued, set)
+        assert len(glued) > 0
+
+        for t in glued:
+            assert t in {glue.join(p.split()) if isinstance(p, str) else glue.join(p) for p in phrases}
+
+        for g in glued:
+            assert any(g in dtok for dtok in tmpreproc_en.tokens.values())
+
+        if glued_subsequent is not None:   # same result as glue_tokens for a single phrase
+            assert glued == glued_subsequent
+            assert tmpreproc_en.tokens == tokens_subsequent
+
+
 @pytest.mark.parametrize(
     'patterns, glue, match_type',
     [
@@ -955,6 +1745,23 @@ def test_tmpreproc_en_transform_tokens_lambda(tmpreproc_en):
         assert all([t.upper() == t_ for t, t_ in zip(dtok, dtok_)])
 
 
+@preproc_test()
+def test_tmpreproc_en_transform_tokens_once_per_unique_token(tmpreproc_en):
+    vocab = tmpreproc_en.vocabulary
+    calls = []
+
+    def upper(t):
+        calls.append(t)
+        return t.upper()
+
+    tokens = tmpreproc_en.tokens
+    tokens_upper = tmpreproc_en.transform_tokens(upper).tokens
+    assert sorted(calls) == vocab
+
+    for dl, dtok in tokens.items():
+        assert tokens_upper[dl] == [t.upper() for t in dtok]
+
+
 @preproc_test()
 def test_tmpreproc_en_tokens_to_lowercase(tmpreproc_en):
     tokens = tmpreproc_en.tokens
@@ -981,6 +1788,27 @@ def test_tmpreproc_en_tokens_rm_specialchars_to_lowercase(tmpreproc_en):
         assert all(t.lower() == t_ for t, t_ in zip(dtok, dtok_))
 
 
+@preproc_test(make_checks=False)
+def test_tmpreproc_en_copy_worker_states(tmpreproc_en, monkeypatch):
+    tmpreproc_en.pos_tag().add_metadata_per_token('is_abc', {'abc': True}, default=False)
+    preproc_copy = tmpreproc_en.copy()
+
+    assert preproc_copy.docs2workers == tmpreproc_en.docs2workers
+    assert preproc_copy.get_available_metadata_keys() == tmpreproc_en.get_available_metadata_keys()
+    _check_copies(tmpreproc_en, preproc_copy)
+
+    # the copy is independent from the original instance
+    preproc_copy.tokens_to_lowercase()
+    assert preproc_copy.tokens != tmpreproc_en.tokens
+    preproc_copy.shutdown_workers()
+
+    # without shared memory, the worker states are passed via the results queue
+    monkeypatch.setattr('tmtoolkit.preprocess._tmpreproc.SHARED_MEMORY_AVAILABLE', False)
+    preproc_copy = tmpreproc_en.copy()
+    _check_copies(tmpreproc_en, preproc_copy)
+    preproc_copy.shutdown_workers()
+
+
 def test_tmpreproc_en_pos_tag_on_copy(tmpreproc_en):
     preproc_copy1 = tmpreproc_en.copy()
     preproc_copy1.pos_tag()
@@ -1395,6 +2223,90 @@ def test_tmpreproc_en_compact(tmpreproc_en):
     assert _dataframes_equal(orig_tokdf, tmpreproc_en.compact_documents().tokens_dataframe)   # should compact but create same output
 
 
+def test_tmpreproc_en_compact_threshold(tmpreproc_en):
+    with pytest.raises(ValueError):
+        TMPreproc(corpus_en, language='en', compact_threshold=1.5)
+
+    preproc = TMPreproc(corpus_en, language='en', compact_threshold=0.1)
+    assert preproc.compact_threshold == 0.1
+    assert preproc.compaction_stats == dict(n_compactions=0, n_tokens_removed=0, bytes_reclaimed=0)
+
+    n_tokens_before = preproc.n_tokens
+    preproc.clean_tokens()
+    tmpreproc_en.clean_tokens()
+
+    stats = preproc.compaction_stats
+    assert stats['n_compactions'] > 0
+    assert 0 < stats['n_tokens_removed'] <= n_tokens_before - preproc.n_tokens
+    assert stats['bytes_reclaimed'] >= 0
+    assert preproc.tokens == tmpreproc_en.tokens
+    assert preproc.tokens == preproc.tokens   # uses cached tokens on the workers
+
+    n_compactions = stats['n_compactions']
+    preproc.compact_documents()
+    assert preproc.compaction_stats['n_compactions'] == n_compactions + preproc.n_workers
+    assert preproc.tokens == tmpreproc_en.tokens
+
+    preproc_copy = preproc.copy()
+    assert preproc_copy.compact_threshold == 0.1
+
+    preproc_copy.shutdown_workers()
+    preproc.shutdown_workers()
+    tmpreproc_en.shutdown_workers()
+
+
+def _fail_on_sikh(t):
+    if t == 'sikh':
+        raise ValueError('malformed token')
+    return t.upper()
+
+
+def test_tmpreproc_en_worker_error():
+    preproc = TMPreproc({'doc1': 'A small example document.'}, language='en')
+    preproc.transform_tokens(_fail_on_sikh, process_on_workers=True)
+
+    # the replayed transformation fails on the worker process of the added document
+    with pytest.raises(RuntimeError):
+        preproc.add_documents({'doc2': 'A sikh temple.'})
+    assert preproc.n_workers == 0
+    assert not preproc.workers
+
+
+def test_tmpreproc_en_checkpointing(tmpreproc_en):
+    with pytest.raises(ValueError):
+        TMPreproc(corpus_en, language='en', checkpoint_interval=0)
+
+    preproc = TMPreproc(corpus_en, language='en', checkpoint_interval=2)
+    assert preproc.checkpoint_interval == 2
+    checkpoint_dir = preproc._checkpoint_dir
+    assert len(os.listdir(checkpoint_dir)) == preproc.n_workers
+
+    preproc.tokens_to_lowercase().pos_tag().clean_tokens()
+    tmpreproc_en.tokens_to_lowercase().pos_tag().clean_tokens()
+    assert _dataframes_equal(preproc.tokens_datatable, tmpreproc_en.tokens_datatable)
+
+    # an error in a document: the workers are restored to their state before the task
+    tokens = preproc.tokens
+    with pytest.raises(WorkerTaskError) as exc_info:
+        preproc.transform_tokens(_fail_on_sikh, process_on_workers=True)
+    assert exc_info.value.task == 'transform_tokens'
+    assert exc_info.value.doc_labels == ['NewsArticles-2']
+    assert 'NewsArticles-2' in str(exc_info.value)
+    assert preproc.tokens == tokens
+
+    # a killed worker is restored and the task is run again on it
+    os.kill(preproc.workers[0].pid, signal.SIGKILL)
+    preproc.generate_ngrams(2)
+    tmpreproc_en.generate_ngrams(2)
+    assert all(w.is_alive() for w in preproc.workers)
+    assert preproc.tokens == tmpreproc_en.tokens
+    assert preproc.ngrams == tmpreproc_en.ngrams
+
+    preproc.shutdown_workers()
+    tmpreproc_en.shutdown_workers()
+    assert not os.path.exists(checkpoint_dir)
+
+
 #%% tests with English corpus: KWIC
 
 
@@ -1752,7 +2664,7 @@ def _check_copies(preproc_a, preproc_b, shutdown_b_workers=True):
         preproc_b.shutdown_workers()
 
 
-def _check_save_load_state(preproc, repeat=1, recreate_from_state=False):
+def _check_save_load_state(preproc, repeat=1, recreate_from_state=False, binary=False):
     # attributes to check
     simple_state_attrs = ('n_docs', 'n_tokens', 'doc_lengths', 'vocabulary_counts',
                           'language', 'stopwords', 'special_chars',
@@ -1773,7 +2685,15 @@ def _check_save_load_state(preproc, repeat=1, recreate_from_state=False):
 
     # save and then load the same state
     for _ in range(repeat):
-        if recreate_from_state:
+        if binary:
+            with tempfile.TemporaryDirectory() as state_dir:
+                if recreate_from_state:
+                    preproc.save_binary_state(state_dir).shutdown_workers()
+                    preproc = TMPreproc.from_binary_state(state_dir)
+                else:
+                    preproc.save_binary_state(state_dir)
+                    preproc.load_binary_state(state_dir)
+        elif recreate_from_state:
             with tempfile.TemporaryFile(suffix='.pickle') as ftemp:
                 preproc.save_state(ftemp).shutdown_workers()
                 ftemp.seek(0)
@@ -1813,6 +2733,8 @@ def _check_save_load_state(preproc, repeat=1, recreate_from_state=False):
         assert all(pre_state['ngrams'][k] == preproc.ngrams[k]
                    for k in preproc.ngrams.keys())
 
+    return preproc
+
 
 def _dataframes_equal(df1, df2):
     # so far, datatable doesn't seem to support dataframe comparisons
@@ -1821,5 +2743,6 @@ def _dataframes_equal(df1, df2):
             df1 = df1.to_pandas()
         if isinstance(df2, FRAME_TYPE):
             df2 = df2.to_pandas()
-    return df1.shape == df2.shape and (df1 == df2).all(axis=1).sum() == len(df1)
+    # missing values (e.g. a None metadata default) never compare equal, so they're checked separately
+    return df1.shape == df2.shape and ((df1 == df2) | (df1.isna() & df2.isna())).all(axis=1).sum() == len(df1)
 
@@ -2,6 +2,7 @@
 Preprocessing: Tests for ._tokenfuncs submodule.
 """
 
+import re
 import string
 
 from hypothesis import given, strategies as st
@@ -10,7 +11,7 @@ import numpy as np
 
 from tmtoolkit.preprocess._tokenfuncs import (
     str_multisplit, str_shape, str_shapesplit, expand_compound_token, make_index_window_around_matches,
-    token_match_subsequent, token_glue_subsequent, token_match
+    token_match_subsequent, token_match_phrases, token_glue_subsequent, token_match, vocab_match
 )
 
 
@@ -229,6 +230,29 @@ def test_token_match(pattern, tokens, match_type, ignore_case, glob_method, expe
     assert np.array_equal(token_match(pattern, tokens, match_type, ignore_case, glob_method), np.array(expected))
 
 
+@pytest.mark.parametrize('patterns, vocab, match_type, ignore_case, glob_method, expected', [
+    (['a'], [], 'exact', False, 'match', []),
+    (['a', 'c'], ['a', 'b', 'c'], 'exact', False, 'match', [True, False, True]),
+    (['A', 'C'], ['a', 'b', 'c'], 'exact', False, 'match', [False, False, False]),
+    (['A', 'C'], ['a', 'b', 'c'], 'exact', True, 'match', [True, False, True]),
+    ([r'foo$', r'^b'], ['a', 'bar', 'xfoo'], 'regex', False, 'match', [False, True, True]),
+    ([r'foo$', r'^b'], ['a', 'BAR', 'xFOO'], 'regex', True, 'match', [False, True, True]),
+    ([r'(o)\1', r'^a'], ['a', 'foo', 'fo'], 'regex', False, 'match', [True, True, False]),      # with group
+    ([r'(?i)^B', r'c$'], ['a', 'bar', 'abc'], 'regex', False, 'match', [False, True, True]),     # with inline flag
+    ([re.compile(r'^b'), r'c$'], ['a', 'bar', 'abc'], 'regex', False, 'match', [False, True, True]),
+    (['foo*', 'b?r'], ['a', 'food', 'bar', 'xfoo'], 'glob', False, 'match', [False, True, True, False]),
+    (['foo*', 'b?r'], ['a', 'food', 'BAR', 'xfoo'], 'glob', True, 'search', [False, True, True, True]),
+])
+def test_vocab_match(patterns, vocab, match_type, ignore_case, glob_method, expected):
+    res = vocab_match(patterns, vocab, match_type, ignore_case, glob_method)
+    assert np.array_equal(res, np.array(expected, dtype=bool))
+
+    # same as combining the matches of the single patterns
+    if vocab:
+        single = [token_match(pat, vocab, match_type, ignore_case, glob_method) for pat in patterns]
+        assert np.array_equal(res, np.logical_or.reduce(single))
+
+
 def test_token_match_subsequent():
     tok = ['green', 'test', 'emob', 'test', 'greener', 'tests', 'test', 'test']
 
@@ -281,6 +305,46 @@ def test_token_match_subsequent_hypothesis(tokens, n_patterns):
                 assert np.array_equal(tokens[ind], patterns)
 
 
+def test_token_match_phrases():
+    tok = ['the', 'European', 'Union', 'and', 'the', 'European', 'Central', 'Bank']
+
+    with pytest.raises(ValueError):
+        token_match_phrases('European Union', tok)
+
+    with pytest.raises(ValueError):
+        token_match_phrases([], tok)
+
+    with pytest.raises(ValueError):
+        token_match_phrases(['European'], tok)
+
+    assert token_match_phrases(['European Union'], []) == []
+    assert token_match_phrases(['foo bar'], tok) == []
+
+    res = token_match_phrases(['European Union', 'European Central Bank', 'Central Bank'], tok)
+    assert len(res) == 2
+    assert np.array_equal(res[0], np.array([1, 2]))
+    assert np.array_equal(res[1], np.array([5, 6, 7]))
+
+    # longest match first, phrases as token sequences
+    res = token_match_phrases([('the', 'European'), ('the', 'European', 'Union'), 'Central Bank'], tok)
+    assert len(res) == 3
+    assert np.array_equal(res[0], np.array([0, 1, 2]))
+    assert np.array_equal(res[1], np.array([4, 5]))
+    assert np.array_equal(res[2], np.array([6, 7]))
+
+    assert token_match_phrases(['european union'], tok) == []
+    res = token_match_phrases(['european union'], tok, ignore_case=True)
+    assert len(res) == 1
+    assert np.array_equal(res[0], np.array([1, 2]))
+
+    # same results as token_match_subsequent for a single phrase
+    tok = ['green', 'test', 'emob', 'test', 'green', 'test', 'test', 'test']
+    res = token_match_phrases(['green test'], tok)
+    expected = token_match_subsequent(['green', 'test'], tok)
+    assert len(res) == len(expected)
+    assert all(np.array_equal(r, e) for r, e in zip(res, expected))
+
+
 def test_token_glue_subsequent():
     tok = ['green', 'test', 'emob', 'test', 'greener', 'tests', 'test', 'test']
 
@@ -138,6 +138,7 @@ def test_greedy_partitioning(elems_dict, k):
         else:
             assert sum(len(b.keys()) for b in bins) == len(elems_dict)
             assert all((k in elems_dict.keys() for k in b.keys()) for b in bins)
+            assert greedy_partitioning(elems_dict, k, return_only_labels=True) == [list(b.keys()) for b in bins]
 
             if k > len(elems_dict):
                 assert all(len(b) == 1 for b in bins)
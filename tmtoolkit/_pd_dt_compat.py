@@ -70,3 +70,14 @@ def pd_dt_frame_to_list(frame):
         return frame.to_list()
     else:
         return frame.to_numpy().T.tolist()
+
+
+def pd_dt_frame_to_arrays(frame):
+    """
+    Convert data in datatable Frame or pandas DataFrame `frame` to dict mapping column names to NumPy arrays.
+    """
+
+    if USE_DT:
+        return {col: frame[:, col].to_numpy()[:, 0] for col in frame.names}
+    else:
+        return {col: frame[col].to_numpy() for col in frame.columns}
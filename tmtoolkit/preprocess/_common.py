@@ -67,6 +67,25 @@ def load_stopwords(language):
         return None
 
 
+#: cache for stopword sets per language code; see :func:`_stopwords_set`
+_stopwords_sets = {}
+
+
+def _stopwords_set(language):
+    """
+    Return the stopwords for language code `language` as frozenset. Other than :func:`load_stopwords`, this loads the
+    stopwords only once per language.
+
+    :param language: two-letter ISO 639-1 language code
+    :return: frozenset of stopword strings or None if loading failed
+    """
+    if language not in _stopwords_sets:
+        stopwords = load_stopwords(language)
+        _stopwords_sets[language] = None if stopwords is None else frozenset(stopwords)
+
+    return _stopwords_sets[language]
+
+
 def simplified_pos(pos, tagset='ud', default=''):
     """
     Return a simplified POS tag for a full POS tag `pos` belonging to a tagset `tagset`.
@@ -0,0 +1,246 @@
+"""
+Worker pool whose worker processes run on several machines.
+
+A :class:`DistributedWorkerPool` serves the task queues, the results and profile queues and the shutdown and worker
+error events via a :class:`multiprocessing.managers.BaseManager` server over TCP. Worker processes on other machines
+("worker nodes") connect to this server with :func:`run_worker_node`. A :class:`~tmtoolkit.preprocess.TMPreproc`
+instance uses a distributed pool just like a local :class:`~tmtoolkit.preprocess.PreprocWorkerPool` by passing it as
+``pool`` argument, i.e. the documents are partitioned across the workers, processed and merged in the same way as with
+local worker processes.
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import logging
+from multiprocessing.managers import BaseManager
+
+import spacy
+
+from ._preprocworker import PreprocWorker
+from ._workerpool import PreprocWorkerPool
+
+
+logger = logging.getLogger('tmtoolkit')
+logger.addHandler(logging.NullHandler())
+
+
+_server = {}   # state of the server process: configuration, queues, events and worker ID counter
+
+
+def _init_server(config):
+    _server['config'] = config
+    _server['tasks_queues'] = [queue.Queue() for _ in range(config['n_workers'])]
+    _server['queues'] = {'results': queue.Queue(), 'profile': queue.Queue()}
+    _server['events'] = {'shutdown': threading.Event(), 'worker_error': threading.Event()}
+    _server['lock'] = threading.Lock()
+    _server['n_claimed'] = 0
+
+
+def _get_config():
+    return _server['config']
+
+
+def _get_tasks_queue(i_worker):
+    return _server['tasks_queues'][i_worker]
+
+
+def _get_queue(name):
+    return _server['queues'][name]
+
+
+def _get_event(name):
+    return _server['events'][name]
+
+
+def _claim_worker_ids(n):
+    with _server['lock']:
+        start = _server['n_claimed']
+        _server['n_claimed'] = min(start + n, _server['config']['n_workers'])
+        return list(range(start, _server['n_claimed']))
+
+
+def _get_n_claimed():
+    with _server['lock']:
+        return _server['n_claimed']
+
+
+class _WorkerQueuesManager(BaseManager):
+    pass
+
+
+_WorkerQueuesManager.register('get_config', callable=_get_config)
+_WorkerQueuesManager.register('get_tasks_queue', callable=_get_tasks_queue)
+_WorkerQueuesManager.register('get_queue', callable=_get_queue)
+_WorkerQueuesManager.register('get_event', callable=_get_event)
+_WorkerQueuesManager.register('claim_worker_ids', callable=_claim_worker_ids)
+_WorkerQueuesManager.register('get_n_claimed', callable=_get_n_claimed)
+
+
+class DistributedWorkerPool(PreprocWorkerPool):
+    """
+    Pool of worker processes that run on one or more machines and can be shared by several
+    :class:`~tmtoolkit.preprocess.TMPreproc` instances by passing it as ``pool`` argument. The pool starts a server
+    that listens on `address`. The worker processes are started on each machine by calling :func:`run_worker_node` with
+    this address and the same `authkey`.
+
+    Tasks are only processed when all `n_workers` worker processes are running, i.e. attaching a TMPreproc instance to
+    the pool blocks until enough worker nodes are connected.
+
+    .. note:: Shared memory (``use_shared_memory=True``) is not supported. Methods of TMPreproc that let the workers
+              write or read files, e.g. :meth:`~tmtoolkit.preprocess.TMPreproc.save_binary_state` or
+              :meth:`~tmtoolkit.preprocess.TMPreproc.load_binary_state`, require a file system that is shared by all
+              machines.
+    """
+
+    def __init__(self, n_workers, authkey, address=('127.0.0.1', 0), language=None, language_model=None,
+                 enable_vectors=False, spacy_opts=None, name=None):
+        """
+        Start a server for a pool of `n_workers` worker processes with a spaCy language model for language `language`
+        or the explicitly given model name `language_model`.
+
+        :param n_workers: number of worker processes across all worker nodes
+        :param authkey: secret key as bytes or string that worker nodes need for connecting to the server
+        :param address: ``(host, port)`` tuple on which the server listens; by default, listen only on localhost on
+                        an arbitrary free port (see :attr:`~DistributedWorkerPool.address`); pass e.g.
+                        ``('', port)`` to listen on all interfaces for worker nodes on other machines
+        :param language: language of the documents that will be processed by this pool
+        :param language_model: spaCy language model name; if None, use the default model for `language`; the model
+                               must be installed on all worker nodes
+        :param enable_vectors: if True, load the medium-sized language model that includes word vectors
+        :param spacy_opts: keyword arguments passed to spaCy's ``spacy.load()`` function on the worker nodes
+        :param name: optional name of this pool; used in log messages and worker process names
+        """
+        if n_workers is None or n_workers < 1:
+            raise ValueError('`n_workers` must be at least 1')
+
+        self.authkey = authkey.encode() if isinstance(authkey, str) else authkey
+        self.address = address
+        self._server = None
+
+        super().__init__(language=language, language_model=language_model, n_max_processes=n_workers,
+                         enable_vectors=enable_vectors, spacy_opts=spacy_opts, name=name)
+
+    @property
+    def n_connected(self):
+        """Number of worker processes that were started on worker nodes."""
+        return self._server.get_n_claimed()._getvalue()
+
+    def attach(self, use_shared_memory=False, **kwargs):
+        """
+        Open a new session on all worker processes. See :meth:`PreprocWorkerPool.attach`.
+
+        :param use_shared_memory: must be False; shared memory is not supported by a distributed worker pool
+        :param kwargs: further session options passed to :meth:`PreprocWorkerPool.attach`
+        :return: new session ID
+        """
+        if use_shared_memory:
+            raise ValueError('shared memory is not supported by a distributed worker pool')
+
+        return super().attach(use_shared_memory=False, **kwargs)
+
+    def shutdown(self, force=False):
+        """
+        Shut down all worker processes on the worker nodes and the server of this pool.
+
+        :param force: if True, don't wait for the worker processes to finish their current tasks
+        """
+        if not self.workers:
+            return
+
+        try:   # may cause exception when the logger is actually already destroyed
+            logger.info('pool `%s`: sending shutdown signal to workers (force=%s)' % (self.name, str(force)))
+        except: pass
+
+        try:
+            self.shutdown_event.set()
+
+            if not force:
+                [q.put(None) for q in self.tasks_queues]
+                # wait for the worker processes that were started so far
+                [q.join() for q in self.tasks_queues[:self.n_connected]]
+        except: pass   # server may not be reachable any more
+
+        self._server.shutdown()
+
+        self.workers = []
+        self._sessions = set()
+
+    def _start_workers(self):
+        """
+        Start the server that provides the queues and events for communicating with the worker processes on the worker
+        nodes.
+        """
+        self._server = _WorkerQueuesManager(address=self.address, authkey=self.authkey)
+        self._server.start(_init_server, ({
+            'n_workers': self.n_workers,
+            'name': self.name,
+            'language': self.language,
+            'language_model': self.language_model,
+            'spacy_opts': self.spacy_opts,
+        }, ))
+        self.address = self._server.address
+
+        logger.info('pool `%s`: listening on %s for %d worker processes' % (self.name, str(self.address),
+                                                                          self.n_workers))
+
+        self.tasks_queues = [self._server.get_tasks_queue(i_worker) for i_worker in range(self.n_workers)]
+        self.results_queue = self._server.get_queue('results')
+        self.profile_queue = self._server.get_queue('profile')
+        self.shutdown_event = self._server.get_event('shutdown')
+        self.worker_error_event = self._server.get_event('worker_error')
+        self.workers = list(range(self.n_workers))   # worker IDs; the worker processes run on the worker nodes
+
+
+def run_worker_node(address, authkey, n_processes=None):
+    """
+    Connect to the server of a :class:`DistributedWorkerPool` at `address` and run up to `n_processes` worker
+    processes on this machine until the pool is shut down. Call this function on each machine that should run worker
+    processes, e.g. as ``python -c "from tmtoolkit.preprocess import run_worker_node; run_worker_node(...)"``.
+
+    :param address: ``(host, port)`` tuple of the pool's server (see :attr:`DistributedWorkerPool.address`)
+    :param authkey: secret key as bytes or string as passed to :class:`DistributedWorkerPool`
+    :param n_processes: max. number of worker processes on this machine; uses the number of CPUs on this machine if
+                        None is passed
+    :return: list of IDs of the workers that ran on this machine
+    """
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+
+    server = _WorkerQueuesManager(address=tuple(address), authkey=authkey)
+    server.connect()
+
+    config = server.get_config()._getvalue()
+    worker_ids = server.claim_worker_ids(n_processes or mp.cpu_count())._getvalue()
+
+    if not worker_ids:
+        logger.warning('all %d worker processes of pool `%s` are already running' % (config['n_workers'],
+                                                                                   config['name']))
+        return worker_ids
+
+    spacy_opts = dict(disable=['parser', 'ner'])
+    spacy_opts.update(config['spacy_opts'])
+    logger.debug('loading spaCy language model %s with options: %s' % (config['language_model'], str(spacy_opts)))
+    nlp = spacy.load(config['language_model'], **spacy_opts)
+
+    logger.info('starting worker processes %s of pool `%s`' % (str(worker_ids), config['name']))
+
+    results_queue = server.get_queue('results')
+    profile_queue = server.get_queue('profile')
+    shutdown_event = server.get_event('shutdown')
+    worker_error_event = server.get_event('worker_error')
+
+    workers = []
+    for i_worker in worker_ids:
+        w = PreprocWorker(i_worker, tasks_queue=server.get_tasks_queue(i_worker), results_queue=results_queue,
+                          profile_queue=profile_queue,
+                          shutdown_event=shutdown_event,
+                          worker_error_event=worker_error_event,
+                          name='_PreprocWorker#%d@%s' % (i_worker, config['name']),
+                          nlp=nlp, language=config['language'])
+        w.start()
+        workers.append(w)
+
+    [w.join() for w in workers]
+
+    return worker_ids
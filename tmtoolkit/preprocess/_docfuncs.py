@@ -2,20 +2,25 @@
 Functions that operate on lists of spaCy documents.
 """
 
+import atexit
 import operator
 import string
 from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import partial
 
 import numpy as np
 import spacy
+from scipy.sparse import vstack
 from spacy.tokens import Doc
 from spacy.vocab import Vocab
+from spacy.attrs import LEMMA, TAG, POS
 
-from ._common import DEFAULT_LANGUAGE_MODELS, load_stopwords, simplified_pos
+from ._common import DEFAULT_LANGUAGE_MODELS, simplified_pos, _stopwords_set
 from ._tokenfuncs import (
-    require_tokendocs, token_match, token_match_subsequent, token_glue_subsequent, make_index_window_around_matches,
-    expand_compound_token
+    require_tokendocs, token_match, vocab_match, token_match_subsequent, token_glue_subsequent,
+    make_index_window_around_matches, expand_compound_token, _phrase_trie, _match_phrase_trie
 )
 from ..utils import require_listlike, require_types, flatten_list, empty_chararray, widen_chararray
 from ..bow.dtm import create_sparse_dtm
@@ -62,7 +67,7 @@ def init_for_language(language=None, language_model=None, **spacy_opts):
 
 
 def tokenize(docs, as_spacy_docs=True, doc_labels=None, doc_labels_fmt='doc-{i1}', enable_vectors=False,
-             nlp_instance=None):
+             nlp_instance=None, n_workers=None):
     """
     Tokenize a list or dict of documents `docs`, where each element contains the raw text of the document as string.
 
@@ -77,6 +82,7 @@ def tokenize(docs, as_spacy_docs=True, doc_labels=None, doc_labels_fmt='doc-{i1}
     :param enable_vectors: if True, generate word vectors (aka word embeddings) during tokenization;
                            this will be more computationally expensive
     :param nlp_instance: spaCy nlp instance
+    :param n_workers: if given, process the documents in parallel in this number of worker processes
     :return: list of spaCy ``Doc`` documents if `as_spacy_docs` is True (default) or list of string token documents
     """
 
@@ -99,6 +105,17 @@ def tokenize(docs, as_spacy_docs=True, doc_labels=None, doc_labels_fmt='doc-{i1}
     elif len(doc_labels) != len(docs):
         raise ValueError('`doc_labels` must have same length as `docs`')
 
+    if _use_parallel(n_workers, docs):
+        # documents are tokenized and initialized in the worker processes; only the labels are set here
+        tokenized_docs = _parallel_map_docs(tokenize, docs, n_workers, nlp_instance=_nlp,
+                                            kwargs=dict(as_spacy_docs=as_spacy_docs, enable_vectors=enable_vectors))
+
+        if as_spacy_docs:
+            for dl, doc in zip(doc_labels, tokenized_docs):
+                doc._.label = dl
+
+        return tokenized_docs
+
     if enable_vectors:
         tokenized_docs = [_nlp(d) for d in docs]
     else:
@@ -215,7 +232,7 @@ def vocabulary_counts(docs):
     return Counter(flatten_list(doc_tokens(docs)))
 
 
-def doc_frequencies(docs, proportions=False):
+def doc_frequencies(docs, proportions=False, n_workers=None):
     """
     Document frequency per vocabulary token as dict with token to document frequency mapping.
     Document frequency is the measure of how often a token occurs *at least once* in a document.
@@ -236,15 +253,21 @@ def doc_frequencies(docs, proportions=False):
 
     :param docs: list of string tokens or spaCy documents
     :param proportions: if True, normalize by number of documents to obtain proportions
+    :param n_workers: if given, process the documents in parallel in this number of worker processes
     :return: dict mapping token to document frequency
     """
     require_spacydocs_or_tokens(docs)
 
     doc_freqs = Counter()
 
-    for dtok in docs:
-        for t in set(_filtered_doc_tokens(dtok, as_list=True)):
-            doc_freqs[t] += 1
+    if _use_parallel(n_workers, docs):
+        # map: absolute document frequencies per shard of documents; reduce: sum them up
+        for shard_doc_freqs in _parallel_map(doc_frequencies, docs, n_workers, returns_docs=False):
+            doc_freqs.update(shard_doc_freqs)
+    else:
+        for dtok in docs:
+            for t in set(_filtered_doc_tokens(dtok, as_list=True)):
+                doc_freqs[t] += 1
 
     if proportions:
         n_docs = len(docs)
@@ -270,7 +293,7 @@ def ngrams(docs, n, join=True, join_str=' '):
             for dtok in docs]
 
 
-def sparse_dtm(docs, vocab=None):
+def sparse_dtm(docs, vocab=None, n_workers=None):
     """
     Create a sparse document-term-matrix (DTM) from a list of tokenized documents `docs`. If `vocab` is None, determine
     the vocabulary (unique terms) from `docs`, otherwise take `vocab` which must be a *sorted* list or NumPy array.
@@ -279,21 +302,32 @@ def sparse_dtm(docs, vocab=None):
 
     :param docs: list of string tokens or spaCy documents
     :param vocab: optional *sorted* list / NumPy array of vocabulary (unique terms) in `docs`
+    :param n_workers: if given, process the documents in parallel in this number of worker processes
     :return: either a single value (sparse document-term-matrix) or a tuple with sparse DTM and sorted vocabulary if
              none was passed
     """
     require_spacydocs_or_tokens(docs)
 
+    parallel = _use_parallel(n_workers, docs)
+
     if vocab is None:
-        vocab = vocabulary(docs, sort=True)
+        if parallel:
+            vocab = sorted(set.union(*_parallel_map(vocabulary, docs, n_workers, returns_docs=False)))
+        else:
+            vocab = vocabulary(docs, sort=True)
         return_vocab = True
     else:
         return_vocab = False
 
-    tokens = doc_tokens(docs)
-    alloc_size = sum(len(set(dtok)) for dtok in tokens)  # sum of *unique* tokens in each document
+    if parallel:
+        # each worker creates the DTM rows for its shard of documents
+        dtm_shards = _parallel_map(sparse_dtm, docs, n_workers, kwargs=dict(vocab=vocab), returns_docs=False)
+        dtm = vstack(dtm_shards, format=dtm_shards[0].format)
+    else:
+        tokens = doc_tokens(docs)
+        alloc_size = sum(len(set(dtok)) for dtok in tokens)  # sum of *unique* tokens in each document
 
-    dtm = create_sparse_dtm(vocab, tokens, alloc_size, vocab_is_sorted=True)
+        dtm = create_sparse_dtm(vocab, tokens, alloc_size, vocab_is_sorted=True)
 
     if return_vocab:
         return dtm, vocab
@@ -303,7 +337,7 @@ def sparse_dtm(docs, vocab=None):
 
 def kwic(docs, search_tokens, context_size=2, match_type='exact', ignore_case=False,
          glob_method='match', inverse=False, with_metadata=False, as_dict=False, as_datatable=False, non_empty=False,
-         glue=None, highlight_keyword=None):
+         glue=None, highlight_keyword=None, n_workers=None):
     """
     Perform keyword-in-context (kwic) search for search pattern(s) `search_tokens`. Returns result as list of KWIC
     windows or datatable / dataframe. If you want to filter with KWIC, use
@@ -335,6 +369,7 @@ def kwic(docs, search_tokens, context_size=2, match_type='exact', ignore_case=Fa
     :param glue: if not None, this must be a string which is used to combine all tokens per match to a single string
     :param highlight_keyword: if not None, this must be a string which is used to indicate the start and end of the
                               matched keyword
+    :param n_workers: if given, process the documents in parallel in this number of worker processes
     :return: return either as: (1) list with KWIC results per document, (2) as dict with document labels mapping to
              KWIC results when `as_dict` is True or (3) dataframe / datatable when `as_datatable` is True
     """
@@ -357,15 +392,20 @@ def kwic(docs, search_tokens, context_size=2, match_type='exact', ignore_case=Fa
         if not isinstance(glue, str):
             raise ValueError('if `glue` is given, it must be of type str')
 
-    kwic_raw = _build_kwic(docs, search_tokens,
-                           highlight_keyword=highlight_keyword,
-                           with_metadata=with_metadata,
-                           with_window_indices=as_datatable,
-                           context_size=context_size,
-                           match_type=match_type,
-                           ignore_case=ignore_case,
-                           glob_method=glob_method,
-                           inverse=inverse)
+    kwic_kwargs = dict(search_tokens=search_tokens,
+                       highlight_keyword=highlight_keyword,
+                       with_metadata=with_metadata,
+                       with_window_indices=as_datatable,
+                       context_size=context_size,
+                       match_type=match_type,
+                       ignore_case=ignore_case,
+                       glob_method=glob_method,
+                       inverse=inverse)
+
+    if _use_parallel(n_workers, docs):
+        kwic_raw = flatten_list(_parallel_map(_build_kwic, docs, n_workers, kwargs=kwic_kwargs, returns_docs=False))
+    else:
+        kwic_raw = _build_kwic(docs, **kwic_kwargs)
 
     if as_dict or as_datatable:
         kwic_raw = dict(zip(doc_labels(docs), kwic_raw))
@@ -477,7 +517,59 @@ def glue_tokens(docs, patterns, glue='_', match_type='exact', ignore_case=False,
         return res
 
 
-def expand_compounds(docs, split_chars=('-',), split_on_len=2, split_on_casechange=False):
+def glue_phrases(docs, phrases, glue='_', ignore_case=False, return_glued_tokens=False):
+    """
+    Glue all occurrences of the phrases in `phrases`, i.e. join the subsequent tokens of each occurrence by glue string
+    `glue`, and replace these tokens in the documents. In contrast to :func:`~tmtoolkit.preprocess.glue_tokens`, which
+    glues a single sequence of patterns, this glues a whole list of phrases (e.g. a lexicon of multi-word expressions
+    like ``"European Union"``) in a single pass over each document. If phrases overlap, the longest phrase is glued
+    (see :func:`~tmtoolkit.preprocess.token_match_phrases`).
+
+    If there is metadata, the respective entries for the joint tokens are set to None.
+
+    .. note:: If `docs` is a list of spaCy documents, this modifies the documents in `docs` in place.
+
+    :param docs: list of string tokens or spaCy documents
+    :param phrases: sequence of phrases, each given either as string with whitespace-separated tokens or as sequence
+                    of at least two tokens
+    :param glue: string for joining the tokens of each phrase
+    :param ignore_case: if True, ignore case for matching
+    :param return_glued_tokens: if True, additionally return a set of tokens that were glued
+    :return: updated documents `docs` if `docs` is a list of spaCy documents or otherwise a list of string token
+             documents; if `return_glued_tokens` is True, return 2-tuple with additional set of tokens that were glued
+    """
+    is_spacydocs = require_spacydocs_or_tokens(docs)
+
+    glued_tokens = set()
+
+    if is_spacydocs is not None:
+        trie = _phrase_trie(phrases, ignore_case=ignore_case)
+
+        # all documents must be compact before gluing
+        if is_spacydocs:
+            docs = compact_documents(docs)
+
+        res = []
+        for doc in docs:
+            matches = _match_phrase_trie(trie, _filtered_doc_tokens(doc), ignore_case=ignore_case)
+
+            if is_spacydocs:
+                new_doc, glued = doc_glue_subsequent(doc, matches, glue=glue, return_glued=True)
+            else:
+                new_doc, glued = token_glue_subsequent(doc, matches, glue=glue, return_glued=True)
+
+            res.append(new_doc)
+            glued_tokens.update(glued)
+    else:
+        res = []
+
+    if return_glued_tokens:
+        return res, glued_tokens
+    else:
+        return res
+
+
+def expand_compounds(docs, split_chars=('-',), split_on_len=2, split_on_casechange=False, n_workers=None):
     """
     Expand all compound tokens in documents `docs`, e.g. splitting token "US-Student" into two tokens "US" and
     "Student".
@@ -487,6 +579,7 @@ def expand_compounds(docs, split_chars=('-',), split_on_len=2, split_on_casechan
     :param split_on_len: minimum length of a result token when considering splitting (e.g. when ``split_on_len=2``
                          "e-mail" would not be split into "e" and "mail")
     :param split_on_casechange: use case change to split tokens, e.g. "CamelCase" would become "Camel", "Case"
+    :param n_workers: if given, process the documents in parallel in this number of worker processes
     :return: list of string tokens or spaCy documents, depending on `docs`
     """
     is_spacydocs = require_spacydocs_or_tokens(docs)
@@ -494,6 +587,11 @@ def expand_compounds(docs, split_chars=('-',), split_on_len=2, split_on_casechan
     if is_spacydocs is None:
         return []
 
+    if _use_parallel(n_workers, docs):
+        return _parallel_map_docs(expand_compounds, docs, n_workers,
+                                  kwargs=dict(split_chars=split_chars, split_on_len=split_on_len,
+                                              split_on_casechange=split_on_casechange))
+
     exp_comp = partial(expand_compound_token, split_chars=split_chars, split_on_len=split_on_len,
                        split_on_casechange=split_on_casechange)
 
@@ -623,7 +721,7 @@ def remove_chars(docs, chars):
 
 def clean_tokens(docs, remove_punct=True, remove_stopwords=True, remove_empty=True,
                  remove_shorter_than=None, remove_longer_than=None, remove_numbers=False,
-                 nlp_instance=None, language=None):
+                 nlp_instance=None, language=None, n_workers=None):
     """
     Apply several token cleaning steps to documents `docs` and optionally documents metadata `docs_meta`, depending on
     the given parameters.
@@ -634,14 +732,17 @@ def clean_tokens(docs, remove_punct=True, remove_stopwords=True, remove_empty=Tr
                          if arg is a list, tuple or set, remove all tokens listed in this arg from the
                          documents; if False do not apply punctuation token removal
     :param remove_stopwords: if True, remove stop words for the given `language` as loaded via
-                             `~tmtoolkit.preprocess.load_stopwords` ; if arg is a list, tuple or set, remove all tokens
-                             listed in this arg from the documents; if False do not apply stop word token removal
+                             `~tmtoolkit.preprocess.load_stopwords` (the stop words are cached per language); if arg
+                             is a list, tuple or set, remove all tokens listed in this arg from the documents; if False
+                             do not apply stop word token removal
     :param remove_empty: if True, remove empty strings ``""`` from documents
     :param remove_shorter_than: if given a positive number, remove tokens that are shorter than this number
     :param remove_longer_than: if given a positive number, remove tokens that are longer than this number
     :param remove_numbers: if True, remove all tokens that are deemed numeric by :func:`np.char.isnumeric`
     :param nlp_instance: spaCy nlp instance
     :param language: language for stop word removal
+    :param n_workers: if given, process the documents in parallel in this number of worker processes; spaCy
+                      documents are then not modified in place, but new documents are returned
     :return: list of string tokens or spaCy documents, depending on `docs`
     """
     if remove_shorter_than is not None and remove_shorter_than < 0:
@@ -654,62 +755,76 @@ def clean_tokens(docs, remove_punct=True, remove_stopwords=True, remove_empty=Tr
     if is_spacydocs is None:
         return []
 
-    is_arrays = not is_spacydocs and isinstance(next(iter(docs)), np.ndarray)
-
-    # add empty token to list of tokens to remove
-    tokens_to_remove = [''] if remove_empty else []
-
-    # add punctuation characters to list of tokens to remove
-    if isinstance(remove_punct, (tuple, list, set)):
-        tokens_to_remove.extend(remove_punct)
-
-    # add stopwords to list of tokens to remove
     if remove_stopwords is True:
-        # default stopword list
-        tokens_to_remove.extend(load_stopwords(language or _current_nlp(nlp_instance).lang))
-    elif isinstance(remove_stopwords, (tuple, list, set)):
-        tokens_to_remove.extend(remove_stopwords)
-
-    # the "remove masks" list holds a binary array for each document where `True` signals a token to be removed
+        # default stopword list; loaded only once per language
+        language = language or _current_nlp(nlp_instance).lang
+        remove_stopwords = _stopwords_set(language)
+        if remove_stopwords is None:
+            raise ValueError('no stopwords available for language "%s"' % language)
+
+    if _use_parallel(n_workers, docs):
+        return _parallel_map_docs(clean_tokens, docs, n_workers, nlp_instance=nlp_instance,
+                                  kwargs=dict(remove_punct=remove_punct, remove_stopwords=remove_stopwords,
+                                              remove_empty=remove_empty, remove_shorter_than=remove_shorter_than,
+                                              remove_longer_than=remove_longer_than,
+                                              remove_numbers=remove_numbers))
+
+    # set of tokens to remove; add empty token if requested
+    tokens_to_remove = {''} if remove_empty else set()
+
+    # add punctuation characters to set of tokens to remove
+    if isinstance(remove_punct, (tuple, list, set, frozenset)):
+        tokens_to_remove.update(remove_punct)
+    elif remove_punct is True and not is_spacydocs:
+        tokens_to_remove.update(string.punctuation)
+
+    # add stopwords to set of tokens to remove
+    if isinstance(remove_stopwords, (tuple, list, set, frozenset)):
+        tokens_to_remove.update(remove_stopwords)
+
+    # factorize the tokens of all documents, so that the removal criteria based on the token strings are evaluated
+    # only once per unique token
     docs_as_tokens = doc_tokens(docs)
-    remove_masks = [np.repeat(False, len(doc)) for doc in docs_as_tokens]
+    doc_offsets = np.cumsum([len(dtok) for dtok in docs_as_tokens])
+    nonempty_docs = [dtok for dtok in docs_as_tokens if len(dtok) > 0]
 
-    # update remove mask for punctuation
-    if remove_punct is True:
-        if is_spacydocs:
-            remove_masks = [mask | doc.to_array('is_punct')[doc.user_data['mask']].astype(np.bool_)
-                            for mask, doc in zip(remove_masks, docs)]
-        else:
-            tokens_to_remove.extend(list(string.punctuation))
+    if nonempty_docs:
+        vocab, token_ids = np.unique(np.concatenate(nonempty_docs).astype(str), return_inverse=True)
+    else:
+        vocab, token_ids = empty_chararray(), np.array([], dtype=np.intp)
+
+    # flag for each unique token whether it should be removed
+    remove_vocab = np.repeat(False, len(vocab))
 
-    # update remove mask for tokens shorter/longer than a certain number of characters
+    if tokens_to_remove:
+        remove_vocab |= np.array([t in tokens_to_remove for t in vocab.tolist()], dtype=bool)
+
+    # remove tokens shorter/longer than a certain number of characters
     if remove_shorter_than is not None or remove_longer_than is not None:
-        token_lengths = [np.fromiter(map(len, doc), np.int, len(doc)) for doc in docs_as_tokens]
+        token_lengths = np.char.str_len(vocab)
 
         if remove_shorter_than is not None:
-            remove_masks = [mask | (n < remove_shorter_than) for mask, n in zip(remove_masks, token_lengths)]
+            remove_vocab |= token_lengths < remove_shorter_than
 
         if remove_longer_than is not None:
-            remove_masks = [mask | (n > remove_longer_than) for mask, n in zip(remove_masks, token_lengths)]
+            remove_vocab |= token_lengths > remove_longer_than
 
-    # update remove mask for numeric tokens
-    if remove_numbers:
-        if is_spacydocs:
-            remove_masks = [mask | doc.to_array('like_num')[doc.user_data['mask']].astype(np.bool_)
+    # remove numeric tokens; for spaCy documents, this is determined per token below
+    if remove_numbers and not is_spacydocs:
+        remove_vocab |= np.char.isnumeric(vocab)
+
+    # the "remove masks" list holds a binary array for each document where `True` signals a token to be removed
+    remove_masks = [remove_vocab.take(doc_token_ids) for doc_token_ids in np.split(token_ids, doc_offsets[:-1])]
+
+    # update remove masks for punctuation and numeric tokens as determined by spaCy
+    if is_spacydocs:
+        if remove_punct is True:
+            remove_masks = [mask | doc.to_array('is_punct')[doc.user_data['mask']].astype(np.bool_)
                             for mask, doc in zip(remove_masks, docs)]
-        elif is_arrays:
-            remove_masks = [mask | np.char.isnumeric(doc)
-                            for mask, doc in zip(remove_masks, docs_as_tokens)]
-        else:
-            remove_masks = [mask | np.array([t.isnumeric() for t in doc], dtype=np.bool_)
-                            for mask, doc in zip(remove_masks, docs_as_tokens)]
 
-    # update remove mask for general list of tokens to be removed
-    if tokens_to_remove:
-        tokens_to_remove = set(tokens_to_remove)
-        # this is actually much faster than using np.isin:
-        remove_masks = [mask | np.array([t in tokens_to_remove for t in doc], dtype=bool)
-                        for mask, doc in zip(remove_masks, docs_as_tokens)]
+        if remove_numbers:
+            remove_masks = [mask | doc.to_array('like_num')[doc.user_data['mask']].astype(np.bool_)
+                            for mask, doc in zip(remove_masks, docs)]
 
     # apply the mask
     return _apply_matches_array(docs, remove_masks, invert=True)
@@ -744,7 +859,7 @@ def remove_tokens_by_mask(docs, mask):
 
 
 def filter_tokens(docs, search_tokens, by_meta=None, match_type='exact', ignore_case=False,
-                  glob_method='match', inverse=False):
+                  glob_method='match', inverse=False, n_workers=None):
     """
     Filter tokens in `docs` according to search pattern(s) `search_tokens` and several matching options. Only those
     tokens are retained that match the search criteria unless you set ``inverse=True``, which will *remove* all tokens
@@ -767,28 +882,36 @@ def filter_tokens(docs, search_tokens, by_meta=None, match_type='exact', ignore_
                         behavior as Python's :func:`re.match` or :func:`re.search`)
     :param inverse: inverse the match results for filtering (i.e. *remove* all tokens that match the search
                     criteria)
+    :param n_workers: if given, process the documents in parallel in this number of worker processes; spaCy
+                      documents are then not modified in place, but new documents are returned
     :return: list of string tokens or spaCy documents, depending on `docs`
     """
     require_spacydocs_or_tokens(docs)
 
+    if _use_parallel(n_workers, docs):
+        return _parallel_map_docs(filter_tokens, docs, n_workers,
+                                  kwargs=dict(search_tokens=search_tokens, by_meta=by_meta, match_type=match_type,
+                                              ignore_case=ignore_case, glob_method=glob_method, inverse=inverse))
+
     matches = _token_pattern_matches(_match_against(docs, by_meta), search_tokens, match_type=match_type,
                                      ignore_case=ignore_case, glob_method=glob_method)
 
     return filter_tokens_by_mask(docs, matches, inverse=inverse)
 
 
-def remove_tokens(docs, search_tokens, by_meta=None, match_type='exact', ignore_case=False, glob_method='match'):
+def remove_tokens(docs, search_tokens, by_meta=None, match_type='exact', ignore_case=False, glob_method='match',
+                  n_workers=None):
     """
     Same as :func:`~tmtoolkit.preprocess.filter_tokens` but with ``inverse=True``.
 
     .. seealso:: :func:`~tmtoolkit.preprocess.filter_tokens` and :func:`~tmtoolkit.preprocess.token_match`.
     """
     return filter_tokens(docs, search_tokens=search_tokens, by_meta=by_meta, match_type=match_type,
-                         ignore_case=ignore_case, glob_method=glob_method, inverse=True)
+                         ignore_case=ignore_case, glob_method=glob_method, inverse=True, n_workers=n_workers)
 
 
 def filter_tokens_with_kwic(docs, search_tokens, context_size=2, match_type='exact', ignore_case=False,
-                            glob_method='match', inverse=False):
+                            glob_method='match', inverse=False, matches=None):
     """
     Filter tokens in `docs` according to Keywords-in-Context (KWIC) context window of size `context_size` around
     `search_tokens`. Works similar to :func:`~tmtoolkit.preprocess.kwic`, but returns result as list of tokenized
@@ -812,6 +935,9 @@ def filter_tokens_with_kwic(docs, search_tokens, context_size=2, match_type='exa
                         behavior as Python's :func:`re.match` or :func:`re.search`)
     :param inverse: inverse the match results for filtering (i.e. *remove* all tokens that match the search
                     criteria)
+    :param matches: optional precomputed matches of `search_tokens` as list of NumPy boolean arrays with one array
+                    per document in `docs` (for spaCy documents, only the unfiltered tokens are matched); if given,
+                    `match_type`, `ignore_case` and `glob_method` are not used for matching
     :return: list of string tokens or spaCy documents, depending on `docs`
     """
     require_spacydocs_or_tokens(docs)
@@ -821,19 +947,25 @@ def filter_tokens_with_kwic(docs, search_tokens, context_size=2, match_type='exa
     else:
         require_listlike(context_size)
 
-    matches = _build_kwic(docs, search_tokens,
-                          context_size=context_size,
-                          match_type=match_type,
-                          ignore_case=ignore_case,
-                          glob_method=glob_method,
-                          inverse=inverse,
-                          only_token_masks=True)
+    if matches is not None:
+        require_listlike(matches)
+        if len(matches) != len(docs):
+            raise ValueError('`matches` must contain one array per document in `docs`')
+
+    kwic_masks = _build_kwic(docs, search_tokens,
+                             context_size=context_size,
+                             match_type=match_type,
+                             ignore_case=ignore_case,
+                             glob_method=glob_method,
+                             inverse=inverse,
+                             only_token_masks=True,
+                             matches=matches)
 
-    return filter_tokens_by_mask(docs, matches)
+    return filter_tokens_by_mask(docs, kwic_masks)
 
 
 def remove_tokens_by_doc_frequency(docs, which, df_threshold, absolute=False, return_blacklist=False,
-                                   return_mask=False):
+                                   return_mask=False, n_workers=None):
     """
     Remove tokens according to their document frequency.
 
@@ -849,6 +981,7 @@ def remove_tokens_by_doc_frequency(docs, which, df_threshold, absolute=False, re
     :param return_blacklist: if True return a list of tokens that should be removed instead of the filtered tokens
     :param return_mask: if True return a list of token masks where each occurrence of True signals a token to
                         be removed
+    :param n_workers: if given, compute the document frequencies in parallel in this number of worker processes
     :return: list of string tokens or spaCy documents, depending on `docs`
     """
     require_spacydocs_or_tokens(docs)
@@ -877,7 +1010,7 @@ def remove_tokens_by_doc_frequency(docs, which, df_threshold, absolute=False, re
         comp = operator.le
 
     toks = doc_tokens(docs, to_lists=True)
-    doc_freqs = doc_frequencies(toks, proportions=not absolute)
+    doc_freqs = doc_frequencies(toks, proportions=not absolute, n_workers=n_workers)
     mask = [[comp(doc_freqs[t], df_threshold) for t in dtok] for dtok in toks]
 
     if return_blacklist:
@@ -891,7 +1024,7 @@ def remove_tokens_by_doc_frequency(docs, which, df_threshold, absolute=False, re
     return remove_tokens_by_mask(docs, mask)
 
 
-def remove_common_tokens(docs, df_threshold=0.95, absolute=False):
+def remove_common_tokens(docs, df_threshold=0.95, absolute=False, n_workers=None):
     """
     Shortcut for :func:`~tmtoolkit.preprocess.remove_tokens_by_doc_frequency` for removing tokens *above* a certain
     document frequency.
@@ -900,12 +1033,14 @@ def remove_common_tokens(docs, df_threshold=0.95, absolute=False):
     :param df_threshold: document frequency threshold value
     :param absolute: if True, use absolute document frequency (i.e. number of times token X occurs at least once
                  in a document), otherwise use relative document frequency (normalized by number of documents)
+    :param n_workers: if given, compute the document frequencies in parallel in this number of worker processes
     :return: list of string tokens or spaCy documents, depending on `docs`
     """
-    return remove_tokens_by_doc_frequency(docs, 'common', df_threshold=df_threshold, absolute=absolute)
+    return remove_tokens_by_doc_frequency(docs, 'common', df_threshold=df_threshold, absolute=absolute,
+                                          n_workers=n_workers)
 
 
-def remove_uncommon_tokens(docs, df_threshold=0.05, absolute=False):
+def remove_uncommon_tokens(docs, df_threshold=0.05, absolute=False, n_workers=None):
     """
     Shortcut for :func:`~tmtoolkit.preprocess.remove_tokens_by_doc_frequency` for removing tokens *below* a certain
     document frequency.
@@ -914,9 +1049,11 @@ def remove_uncommon_tokens(docs, df_threshold=0.05, absolute=False):
     :param df_threshold: document frequency threshold value
     :param absolute: if True, use absolute document frequency (i.e. number of times token X occurs at least once
                  in a document), otherwise use relative document frequency (normalized by number of documents)
+    :param n_workers: if given, compute the document frequencies in parallel in this number of worker processes
     :return: list of string tokens or spaCy documents, depending on `docs`
     """
-    return remove_tokens_by_doc_frequency(docs, 'uncommon', df_threshold=df_threshold, absolute=absolute)
+    return remove_tokens_by_doc_frequency(docs, 'uncommon', df_threshold=df_threshold, absolute=absolute,
+                                          n_workers=n_workers)
 
 
 def filter_documents(docs, search_tokens, by_meta=None, matches_threshold=1,
@@ -952,18 +1089,8 @@ def filter_documents(docs, search_tokens, by_meta=None, matches_threshold=1,
     matches = _token_pattern_matches(_match_against(docs, by_meta), search_tokens, match_type=match_type,
                                      ignore_case=ignore_case, glob_method=glob_method)
 
-    if inverse_matches:
-        matches = [~m for m in matches]
-
-    new_docs = []
-    for i, (doc, n_matches) in enumerate(zip(docs, map(np.sum, matches))):
-        thresh_met = n_matches >= matches_threshold
-        if inverse_result:
-            thresh_met = not thresh_met
-        if thresh_met:
-            new_docs.append(doc)
-
-    return new_docs
+    return _filter_documents_by_matches(docs, matches, matches_threshold=matches_threshold,
+                                        inverse_result=inverse_result, inverse_matches=inverse_matches)
 
 
 def remove_documents(docs, search_tokens, by_meta=None, matches_threshold=1,
@@ -1080,7 +1207,7 @@ def compact_documents(docs):
     return _apply_matches_array(docs, compact=True)
 
 
-def pos_tag(docs, tagger=None, nlp_instance=None):
+def pos_tag(docs, tagger=None, nlp_instance=None, n_workers=None):
     """
     Apply Part-of-Speech (POS) tagging to all documents.
 
@@ -1091,16 +1218,25 @@ def pos_tag(docs, tagger=None, nlp_instance=None):
               retrieve the tags, you may use :func:`~tmtoolkit.preprocess.pos_tags`.
 
     .. note:: This function modifies the documents in `docs` in place and adds/modifies a `pos_` attribute in each
-              token.
+              token. When `n_workers` is given, new documents are returned instead.
 
 
     :param docs: list of spaCy documents
     :param tagger: POS tagger instance to use; by default, use the tagger for the currently loaded spaCy nlp instance
     :param nlp_instance: spaCy nlp instance
-    :return: input spaCy documents `docs` with in-place modified documents
+    :param n_workers: if given, process the documents in parallel in this number of worker processes; each worker
+                      process uses the tagger of its own instance of the currently loaded spaCy language model, so
+                      `tagger` must not be set
+    :return: input spaCy documents `docs` with in-place modified documents or new documents if `n_workers` is given
     """
     require_spacydocs(docs)
 
+    if _use_parallel(n_workers, docs):
+        if tagger is not None:
+            raise ValueError('`tagger` cannot be used when processing the documents in parallel via `n_workers`')
+
+        return _parallel_map_docs(pos_tag, docs, n_workers, nlp_instance=nlp_instance)
+
     tagger = tagger or _current_nlp(nlp_instance, pipeline_component='tagger')
 
     for doc in docs:
@@ -1182,17 +1318,22 @@ def filter_for_pos(docs, required_pos, simplify_pos=True, pos_attrib='pos_', tag
     return _apply_matches_array(docs, matches, invert=inverse)
 
 
-def lemmatize(docs, lemma_attrib='lemma_'):
+def lemmatize(docs, lemma_attrib='lemma_', n_workers=None):
     """
     Lemmatize documents according to `language` or use a custom lemmatizer function `lemmatizer_fn`.
 
     :param docs: list of spaCy documents
     :param tag_attrib: spaCy document tag attribute to fetch the lemmata; ``"lemma_"`` gives lemmata as strings,
                        ``"lemma"`` gives lemmata as integer token IDs
+    :param n_workers: if given, process the documents in parallel in this number of worker processes
     :return: list of string lists with lemmata for each document
     """
     require_spacydocs(docs)
 
+    if _use_parallel(n_workers, docs):
+        return flatten_list(_parallel_map(lemmatize, docs, n_workers, kwargs=dict(lemma_attrib=lemma_attrib),
+                                          returns_docs=False))
+
     docs_lemmata = _get_docs_tokenattrs(docs, lemma_attrib, custom_attr=False)
 
     # SpaCy lemmata sometimes contain special markers like -PRON- instead of the lemma;
@@ -1361,6 +1502,8 @@ def doc_glue_subsequent(doc, matches, glue='_', return_glued=False):
 
     doc.user_data['tokens'] = np.delete(doc.user_data['tokens'], del_tokens_indices)
     doc.user_data['mask'] = np.delete(doc.user_data['mask'], del_tokens_indices)
+    for attr in _get_doc_meta_keys(doc):
+        doc.user_data[attr] = np.delete(doc.user_data[attr], del_tokens_indices)
 
     if return_glued:
         return doc, glued
@@ -1420,11 +1563,33 @@ def _get_docs_tokenattrs_keys(docs, default_attrs=None):
                 firsttok = next(iter(doc))
                 attrs.extend([attr for attr in dir(firsttok._)
                              if attr not in {'has', 'get', 'set'} and not attr.startswith('_')])
+                attrs.extend([attr for attr in _get_doc_meta_keys(doc) if attr not in attrs])
                 break
 
     return attrs
 
 
+def _get_doc_meta_keys(doc):
+    """Return the keys of the metadata columns (``"meta_..."``) stored as NumPy arrays in `doc.user_data`."""
+    return [k for k, v in doc.user_data.items()
+            if isinstance(k, str) and k.startswith('meta_') and isinstance(v, np.ndarray)]
+
+
+def _get_doc_tokenattr_arr(doc, attr, default=None):
+    """
+    Return the values of token attribute `attr` for *all* tokens in `doc` (including masked tokens) as NumPy array.
+    Metadata columns (``"meta_..."``) stored in `doc.user_data` are used directly; if `doc` doesn't have such a
+    column, all values are set to `default`. Other attributes are collected from the spaCy tokens.
+    """
+    data = doc.user_data.get(attr)
+    if isinstance(data, np.ndarray):
+        return data
+    elif attr.startswith('meta_'):
+        return _metadata_values([default] * len(doc))
+    else:
+        return np.array([_get_spacytoken_attr(t, attr) for t in doc])
+
+
 def _filtered_doc_arr(lst, doc):
     return np.array(lst)[doc.user_data['mask']]
 
@@ -1474,7 +1639,7 @@ def _match_against(docs, by_meta=None):
     """Return the list of values to match against in filtering functions."""
     if by_meta:
         require_spacydocs(docs)
-        return [_filtered_doc_arr([_get_spacytoken_attr(t, by_meta) for t in doc], doc) for doc in docs]
+        return [_get_doc_tokenattr_arr(doc, by_meta)[doc.user_data['mask']] for doc in docs]
     else:
         return [_filtered_doc_tokens(doc) for doc in docs]
 
@@ -1485,6 +1650,9 @@ def _token_pattern_matches(tokens, search_tokens, match_type, ignore_case, glob_
     The matching results for each pattern in `search_tokens` are combined via logical OR.
     Returns a list of length `docs` containing boolean arrays that signal the pattern matches for each token in each
     document.
+
+    The tokens of all documents are matched at once and each unique token is matched only once against all patterns
+    (see :func:`~tmtoolkit.preprocess.vocab_match`).
     """
 
     # search tokens may be of any type (e.g. bool when matching against token meta data)
@@ -1493,20 +1661,50 @@ def _token_pattern_matches(tokens, search_tokens, match_type, ignore_case, glob_
     elif isinstance(search_tokens, (list, tuple, set)) and not search_tokens:
         raise ValueError('`search_tokens` must not be empty')
 
-    matches = [np.repeat(False, repeats=len(dtok)) for dtok in tokens]
+    doc_lengths = [len(dtok) for dtok in tokens]
+    nonempty_tokens = [np.asarray(dtok) for dtok in tokens if len(dtok) > 0]
 
-    for dtok, dmatches in zip(tokens, matches):
+    if not nonempty_tokens:
+        return [np.array([], dtype=bool) for _ in tokens]
+
+    all_tokens = np.concatenate(nonempty_tokens)
+
+    if match_type == 'exact' and not ignore_case and \
+            (all_tokens.dtype.kind != 'U' or not all(isinstance(pat, str) for pat in search_tokens)):
+        # e.g. matching against token metadata of any type
+        all_matches = np.repeat(False, repeats=len(all_tokens))
         for pat in search_tokens:
-            pat_match = token_match(pat, dtok, match_type=match_type, ignore_case=ignore_case, glob_method=glob_method)
+            all_matches |= token_match(pat, all_tokens, match_type=match_type)
+    else:
+        vocab, token_ids = np.unique(all_tokens, return_inverse=True)
+        all_matches = vocab_match(search_tokens, vocab, match_type=match_type, ignore_case=ignore_case,
+                                  glob_method=glob_method)[token_ids]
 
-            dmatches |= pat_match
+    return np.split(all_matches, np.cumsum(doc_lengths)[:-1])
 
-    return matches
+
+def _filter_documents_by_matches(docs, matches, matches_threshold, inverse_result, inverse_matches):
+    """
+    Helper function to filter documents `docs` by the number of matches per document in `matches` as done in
+    :func:`~tmtoolkit.preprocess.filter_documents`.
+    """
+    if inverse_matches:
+        matches = [~m for m in matches]
+
+    new_docs = []
+    for i, (doc, n_matches) in enumerate(zip(docs, map(np.sum, matches))):
+        thresh_met = n_matches >= matches_threshold
+        if inverse_result:
+            thresh_met = not thresh_met
+        if thresh_met:
+            new_docs.append(doc)
+
+    return new_docs
 
 
 def _build_kwic(docs, search_tokens, context_size, match_type, ignore_case, glob_method, inverse,
                 highlight_keyword=None, with_metadata=False, with_window_indices=False,
-                only_token_masks=False):
+                only_token_masks=False, matches=None):
     """
     Helper function to build keywords-in-context (KWIC) results from documents `docs`.
 
@@ -1526,12 +1724,14 @@ def _build_kwic(docs, search_tokens, context_size, match_type, ignore_case, glob
     :param with_metadata: add document metadata to KWIC results
     :param with_window_indices: add window indices to KWIC results
     :param only_token_masks: return only flattened token masks for filtering
+    :param matches: optional precomputed matches for `search_tokens` as list of NumPy boolean mask arrays
     :return: list with KWIC results per document
     """
 
     # find matches for search criteria -> list of NumPy boolean mask arrays
-    matches = _token_pattern_matches(_match_against(docs), search_tokens, match_type=match_type,
-                                     ignore_case=ignore_case, glob_method=glob_method)
+    if matches is None:
+        matches = _token_pattern_matches(_match_against(docs), search_tokens, match_type=match_type,
+                                         ignore_case=ignore_case, glob_method=glob_method)
 
     if not only_token_masks and inverse:
         matches = [~m for m in matches]
@@ -1548,8 +1748,9 @@ def _build_kwic(docs, search_tokens, context_size, match_type, ignore_case, glob
             assert ind_windows.ndim == 1
             assert len(ind) <= len(ind_windows)
 
-            # from indices back to binary mask; this only works with remove_overlaps=True
-            win_mask = np.repeat(False, len(doc))
+            # from indices back to binary mask; this only works with remove_overlaps=True; the mask refers to the
+            # unfiltered tokens of `doc` like the matches
+            win_mask = np.repeat(False, len(mask))
             win_mask[ind_windows] = True
 
             if inverse:
@@ -1594,11 +1795,11 @@ def _build_kwic(docs, search_tokens, context_size, match_type, ignore_case, glob
                             attr_keys_ext.append(attrlabel)
 
                         if attr == 'whitespace_':
-                            attrdata = [bool(t.whitespace_) for t in doc]
+                            attrdata = np.array([bool(t.whitespace_) for t in doc])
                         else:
-                            attrdata = [_get_spacytoken_attr(t, attr) for t in doc]
+                            attrdata = _get_doc_tokenattr_arr(doc, attr)
 
-                        attr_vals[attrlabel] = np.array(attrdata)[win].tolist()
+                        attr_vals[attrlabel] = attrdata[win].tolist()
 
                     for attrlabel in list(sorted(attr_keys_base)) + list(sorted(attr_keys_ext)):
                         win_res[attrlabel] = attr_vals[attrlabel]
@@ -1756,6 +1957,8 @@ def _apply_matches_array(docs, matches=None, invert=False, compact=False):
                             attrname = attr[:-1]
                             vals = doc.to_array(attrname)   # without trailing underscore
                             new_doc.from_array(attrname, vals[mask])
+                        elif attr.startswith('meta_'):   # metadata column
+                            new_doc.user_data[attr] = _get_doc_tokenattr_arr(doc, attr)[mask]
                         else:
                             for v, nt in zip((getattr(t._, attr) for t, _ in filtered), new_doc):
                                 setattr(nt._, attr, v)
@@ -1797,6 +2000,252 @@ def _get_spacytoken_attr(t, attr):
     return getattr(t._, attr, getattr(t, attr, None))
 
 
+def _metadata_values(values):
+    """
+    Convert the list of metadata values `values` to a NumPy array. Values of mixed types (e.g. ``None`` and numbers or
+    strings and numbers) are stored in an object array.
+    """
+    arr = np.array(values)
+    if arr.ndim != 1 or (arr.dtype.kind == 'U' and not all(isinstance(v, str) for v in values)):
+        arr = np.empty(len(values), dtype=object)
+        for i, v in enumerate(values):
+            arr[i] = v
+    return arr
+
+
+#: temporary ``user_data`` key used by :func:`_doc_to_bytes` for the tags of documents that are not POS tagged
+_UNTAGGED_TAGS_KEY = '_untagged_tags'
+
+
+def _doc_to_bytes(doc):
+    """
+    Serialize `doc` via its ``to_bytes()`` method. spaCy's serialization of NumPy arrays in ``doc.user_data`` doesn't
+    support object arrays, hence metadata columns of object type are temporarily converted to lists.
+
+    spaCy only serializes tags of POS tagged documents. Tags of documents that are not POS tagged yet, which are set by
+    the tokenizer's special cases (e.g. for "they" in "they're"), are temporarily stored in ``doc.user_data``, too,
+    because the tagger doesn't overwrite them and would otherwise produce different tags after deserialization.
+    """
+    tmp_data = {k: v.tolist() for k, v in doc.user_data.items() if isinstance(v, np.ndarray) and v.dtype.kind == 'O'}
+
+    if not doc.is_tagged and any(t.tag != 0 for t in doc):
+        tmp_data[_UNTAGGED_TAGS_KEY] = [(t.tag_, t.pos) for t in doc]
+
+    orig_data = {k: doc.user_data[k] for k in tmp_data.keys() if k in doc.user_data}
+    doc.user_data.update(tmp_data)
+
+    try:
+        return doc.to_bytes()
+    finally:
+        doc.user_data.pop(_UNTAGGED_TAGS_KEY, None)
+        doc.user_data.update(orig_data)
+
+
+def _doc_from_bytes(vocab, doc_bytes):
+    """
+    Deserialize a spaCy document from `doc_bytes` as created by :func:`_doc_to_bytes` using the vocabulary `vocab`.
+    """
+    doc = Doc(vocab).from_bytes(doc_bytes)
+
+    untagged_tags = doc.user_data.pop(_UNTAGGED_TAGS_KEY, None)
+    if untagged_tags is not None:
+        # setting the tags would also set the lemmata, so the deserialized lemmata are set again
+        tag_pos_lemma = np.column_stack([
+            np.array([vocab.strings.add(tag) if tag else 0 for tag, _ in untagged_tags], dtype=np.uint64),
+            np.array([pos for _, pos in untagged_tags], dtype=np.uint64),
+            doc.to_array([LEMMA]),
+        ])
+        doc.from_array([TAG, POS, LEMMA], tag_pos_lemma)
+        doc.is_tagged = False
+
+    # document tensor array and user_data arrays may only be immutable "views" -> create mutable copies
+    if not doc.tensor.flags.owndata:
+        doc.tensor = doc.tensor.copy()
+
+    for k, docdata in doc.user_data.items():
+        if isinstance(docdata, np.ndarray) and not docdata.flags.owndata:
+            doc.user_data[k] = docdata.copy()
+        elif isinstance(k, str) and k.startswith('meta_') and isinstance(docdata, (list, tuple)):
+            doc.user_data[k] = _metadata_values(docdata)    # see _doc_to_bytes()
+
+    return doc
+
+
+#%% helper functions for parallel processing via `n_workers` argument
+
+
+#: process pool used when passing `n_workers`; it is kept running for subsequent calls with the same configuration,
+#: so that the spaCy language model is loaded only once per worker process; it is shut down at exit
+_parallel_executor = None
+_parallel_executor_config = None
+
+
+class _SerializedDocs:
+    """
+    Compact representation of a list of documents for passing them between processes. spaCy documents are serialized
+    via :func:`_doc_to_bytes`, i.e. as arrays of token attribute IDs *without* the vocabulary, which is much smaller
+    than pickling the ``Doc`` objects. String token documents are stored as array of unique tokens, a flat array of
+    token IDs and the document lengths.
+    """
+
+    def __init__(self, docs):
+        self.is_spacydocs = len(docs) > 0 and isinstance(docs[0], Doc)
+
+        if self.is_spacydocs:
+            self.data = [_doc_to_bytes(doc) for doc in docs]
+        else:
+            self.as_arrays = len(docs) > 0 and isinstance(docs[0], np.ndarray)
+            vocab, token_ids = np.unique(np.array(flatten_list(docs), dtype=str), return_inverse=True)
+            self.data = (vocab, token_ids.astype(np.uint32), np.array([len(d) for d in docs], dtype=np.int64))
+
+    def load(self, vocab=None):
+        """
+        Deserialize the documents.
+
+        :param vocab: spaCy vocabulary used for deserializing spaCy documents
+        :return: list of string tokens or spaCy documents
+        """
+        if self.is_spacydocs:
+            return [_doc_from_bytes(vocab, doc_bytes) for doc_bytes in self.data]
+        else:
+            vocab, token_ids, doc_lengths = self.data
+            tokens = np.split(vocab[token_ids], np.cumsum(doc_lengths)[:-1]) if len(doc_lengths) > 0 else []
+            if self.as_arrays:
+                return [dtok if len(dtok) > 0 else empty_chararray() for dtok in tokens]
+            else:
+                return [dtok.tolist() for dtok in tokens]
+
+
+def _use_parallel(n_workers, docs):
+    """
+    Check the `n_workers` argument and return True if `docs` should be processed in parallel.
+    """
+    if n_workers is None:
+        return False
+
+    if not isinstance(n_workers, int) or n_workers < 1:
+        raise ValueError('`n_workers` must be a positive integer')
+
+    return n_workers > 1 and len(docs) > 1
+
+
+def _parallel_map(fn, docs, n_workers, kwargs=None, returns_docs=True, nlp_instance=None):
+    """
+    Split `docs` into `n_workers` shards of subsequent documents and apply `fn` with keyword arguments `kwargs` to each
+    shard in a separate worker process. The worker processes load the same spaCy language model as the nlp instance
+    `nlp_instance` (or the global nlp instance), either from the model's path or, if the nlp instance wasn't loaded
+    from a path (e.g. ``spacy.blank()``), from its serialized data.
+
+    :param fn: function that accepts a list of documents as first argument; must be picklable, i.e. defined on module
+               level
+    :param docs: list of string tokens, spaCy documents or raw text strings
+    :param n_workers: number of worker processes
+    :param kwargs: keyword arguments passed to `fn`
+    :param returns_docs: if True, `fn` returns a list of string tokens or spaCy documents, which are then passed back
+                         in a compact format
+    :param nlp_instance: spaCy nlp instance
+    :return: list with the result of `fn` for each shard in the order of the shards
+    """
+    global _parallel_executor, _parallel_executor_config
+
+    docs = list(docs)
+    is_spacydocs = isinstance(docs[0], Doc)
+    _nlp = _current_nlp(nlp_instance) if is_spacydocs else nlp_instance or nlp
+
+    # the nlp instance is compared by identity, because serializing it for comparison would be too expensive
+    config = (n_workers, _nlp, tuple(_nlp.pipe_names) if _nlp is not None else ())
+
+    if _parallel_executor is None or _parallel_executor_config[0] != config[0] or \
+            _parallel_executor_config[1] is not config[1] or _parallel_executor_config[2] != config[2]:
+        _shutdown_parallel_executor()
+
+        _parallel_executor = ProcessPoolExecutor(n_workers, initializer=_init_parallel_worker,
+                                                 initargs=_parallel_worker_nlp_spec(_nlp))
+        _parallel_executor_config = config
+
+    bounds = np.linspace(0, len(docs), min(n_workers, len(docs)) + 1).astype(int)
+    shards = [docs[i:j] for i, j in zip(bounds[:-1], bounds[1:])]
+    try:
+        futures = [_parallel_executor.submit(_parallel_task, fn,
+                                             shard if isinstance(shard[0], str) else _SerializedDocs(shard),
+                                             kwargs or {}, returns_docs)
+                   for shard in shards]
+        results = [f.result() for f in futures]
+    except BrokenProcessPool:
+        # a worker process died abruptly; the process pool can't be used anymore and is replaced on the next call
+        _shutdown_parallel_executor()
+        raise
+
+    vocab = docs[0].vocab if is_spacydocs else getattr(_nlp, 'vocab', None)
+    return [res.load(vocab) if returns_docs else res for res in results]
+
+
+def _parallel_map_docs(fn, docs, n_workers, kwargs=None, nlp_instance=None):
+    """
+    Same as :func:`_parallel_map` for a function `fn` that returns a list of documents. Returns the concatenation of
+    the resulting documents of all shards.
+    """
+    return flatten_list(_parallel_map(fn, docs, n_workers, kwargs=kwargs, nlp_instance=nlp_instance))
+
+
+def _parallel_worker_nlp_spec(nlp_instance):
+    """
+    Return the arguments for :func:`_init_parallel_worker` for recreating `nlp_instance` in a worker process as tuple
+    ``(language code, model path, pipeline component names, serialized nlp instance)``. The model path is used if the
+    nlp instance was loaded from a path, otherwise the serialized nlp instance is passed.
+    """
+    if nlp_instance is None:
+        return None, None, (), None
+
+    pipe_names = tuple(nlp_instance.pipe_names)
+    model_path = getattr(nlp_instance, 'path', None)
+    if model_path is not None:
+        return nlp_instance.lang, str(model_path), pipe_names, None
+    else:
+        return nlp_instance.lang, None, pipe_names, nlp_instance.to_bytes()
+
+
+def _init_parallel_worker(language, model_path, pipe_names, nlp_bytes):
+    global nlp
+
+    if language is None:
+        return
+
+    if model_path is not None:
+        model_pipeline = spacy.util.get_model_meta(model_path).get('pipeline', [])
+        nlp = spacy.load(model_path, disable=[comp for comp in model_pipeline if comp not in pipe_names])
+    else:
+        nlp = spacy.util.get_lang_class(language)()
+        for comp in pipe_names:
+            nlp.add_pipe(nlp.create_pipe(comp))
+        nlp.from_bytes(nlp_bytes)
+
+
+def _shutdown_parallel_executor():
+    """Shut down the process pool used for parallel processing via `n_workers` argument (if it is running)."""
+    global _parallel_executor, _parallel_executor_config
+
+    if _parallel_executor is not None:
+        _parallel_executor.shutdown()
+        _parallel_executor = None
+        _parallel_executor_config = None
+
+
+atexit.register(_shutdown_parallel_executor)
+
+
+def _parallel_task(fn, docs, kwargs, returns_docs):
+    if isinstance(docs, _SerializedDocs):
+        docs = docs.load(None if nlp is None else nlp.vocab)
+
+    res = fn(docs, **kwargs)
+
+    if returns_docs:
+        return _SerializedDocs(res)
+    else:
+        return res
+
+
 def require_spacydocs(docs, types=(Doc, ), error_msg='the argument must be a list of spaCy documents'):
     require_listlike(docs)
 
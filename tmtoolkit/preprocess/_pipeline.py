@@ -0,0 +1,115 @@
+"""
+Recorded processing pipelines for :class:`~tmtoolkit.preprocess.TMPreproc`.
+
+A :class:`PreprocPipeline` holds the sequence of processing steps that were applied to the documents of a TMPreproc
+instance. Each step is a tuple ``(task name, task kwargs)`` as it is sent to the worker processes. Pipelines can be
+saved to disk, loaded again and applied to other TMPreproc instances via :meth:`TMPreproc.apply_pipeline`.
+"""
+
+from ..utils import pickle_data, unpickle_file
+
+
+#: worker tasks that only depend on each individual document's tokens; these tasks are recorded so that they can be
+#: replayed on other documents, e.g. on documents that are added later via :meth:`TMPreproc.add_documents`
+REPLAYABLE_TASKS = {
+    'add_metadata_per_token', 'remove_metadata', 'generate_ngrams', 'use_joined_ngrams_as_tokens',
+    'transform_tokens', 'tokens_to_lowercase', 'pos_tag', 'lemmatize', 'expand_compound_tokens', 'remove_chars',
+    'clean_tokens', 'compact_documents', 'filter_tokens', 'filter_tokens_with_kwic', 'filter_documents',
+    'filter_for_pos', 'glue_tokens', 'glue_phrases',
+}
+
+#: replayable tasks that put a result in the results queue
+TASKS_WITH_RESULTS = {'glue_tokens', 'glue_phrases'}
+
+#: replayable tasks that don't produce results and don't change metadata attributes except for the ones in
+#: FUSABLE_TASKS_METADATA_KEYS; in lazy mode, these tasks are collected and then executed by the workers in a single
+#: pass over the documents
+FUSABLE_TASKS = {
+    'tokens_to_lowercase', 'remove_chars', 'transform_tokens', 'clean_tokens', 'filter_tokens',
+    'filter_tokens_with_kwic', 'filter_for_pos', 'filter_documents', 'pos_tag', 'lemmatize', 'compact_documents',
+}
+
+#: metadata keys that are added by tasks in FUSABLE_TASKS; in lazy mode, the available metadata keys are determined
+#: from the workers' current metadata keys and the keys added by the deferred tasks without running these tasks
+FUSABLE_TASKS_METADATA_KEYS = {'pos_tag': 'pos'}
+
+
+class PreprocPipeline:
+    """
+    Sequence of processing steps recorded by a :class:`~tmtoolkit.preprocess.TMPreproc` instance. Each step is a
+    tuple ``(task name, task kwargs)``.
+    """
+
+    def __init__(self, steps=None):
+        """
+        Create a pipeline from an optional sequence of steps `steps`.
+
+        :param steps: sequence of ``(task name, task kwargs)`` tuples
+        """
+        self.steps = [(task, dict(kwargs)) for task, kwargs in (steps or [])]
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __getitem__(self, item):
+        return self.steps[item]
+
+    def __eq__(self, other):
+        return isinstance(other, PreprocPipeline) and self.steps == other.steps
+
+    def __repr__(self):
+        return '<PreprocPipeline [%d steps: %s]>' % (len(self), ', '.join(task for task, _ in self.steps))
+
+    @property
+    def replayable(self):
+        """
+        True if all steps can be replayed on other documents, i.e. they can be sent to worker processes. This is not
+        the case if a function that cannot be pickled was passed to :meth:`TMPreproc.transform_tokens`.
+        """
+        return not any(task == 'transform_tokens' and kwargs['transform_fn'] is None for task, kwargs in self.steps)
+
+    def add_step(self, task, kwargs):
+        """
+        Append a step for task `task` with task parameters `kwargs`.
+
+        :param task: task name
+        :param kwargs: dict with task parameters
+        :return: this instance
+        """
+        self.steps.append((task, kwargs))
+        return self
+
+    def copy(self):
+        """
+        Copy this pipeline.
+
+        :return: shallow copy of this pipeline
+        """
+        return PreprocPipeline(self.steps)
+
+    def save(self, picklefile):
+        """
+        Save this pipeline to the pickle file `picklefile`.
+
+        :param picklefile: target file path as string or file handle
+        :return: this instance
+        """
+        if not self.replayable:
+            raise ValueError('the pipeline cannot be saved because a function passed to `transform_tokens` cannot be '
+                             'pickled')
+
+        pickle_data(self.steps, picklefile)
+        return self
+
+    @classmethod
+    def load(cls, picklefile):
+        """
+        Load a pipeline from the pickle file `picklefile` as saved with :meth:`~PreprocPipeline.save`.
+
+        :param picklefile: file path as string or file handle
+        :return: new pipeline instance
+        """
+        return cls(unpickle_file(picklefile))
@@ -2,36 +2,126 @@
 Preprocessing worker class for parallel text processing.
 """
 
+import os
 import multiprocessing as mp
 import logging
+import pickle
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import spacy
-from spacy.vocab import Vocab
-from spacy.tokens import Doc, Token
+from spacy.tokens import Doc
+from spacy.attrs import LEMMA, NORM, ENT_IOB, ENT_TYPE, ENT_ID, ENT_KB_ID, TAG, POS, HEAD, DEP, SENT_START
+from spacy.parts_of_speech import IDS as POS_IDS
 
 from ._docfuncs import (
-    ngrams, vocabulary, vocabulary_counts, doc_frequencies, sparse_dtm, compact_documents, glue_tokens, doc_labels,
-    expand_compounds, clean_tokens, filter_tokens_by_mask, filter_tokens, filter_tokens_with_kwic, filter_documents,
-    filter_documents_by_name, filter_for_pos, transform, remove_chars, lemmatize, to_lowercase,
-    _build_kwic, _filtered_doc_tokens, _filtered_doc_arr, _init_doc, _replace_doc_tokens
+    ngrams, vocabulary, vocabulary_counts, doc_frequencies, compact_documents, glue_tokens, glue_phrases,
+    doc_labels, expand_compounds, clean_tokens, filter_tokens_by_mask, filter_tokens, filter_tokens_with_kwic,
+    filter_documents, filter_documents_by_name, filter_for_pos, transform, remove_chars, lemmatize, to_lowercase,
+    _build_kwic, _filter_documents_by_matches, _filtered_doc_tokens, _filtered_doc_arr, _init_doc,
+    _replace_doc_tokens, _token_pattern_matches, _doc_to_bytes, _doc_from_bytes, _metadata_values
 )
+from ._pipeline import REPLAYABLE_TASKS
+from ._sharedmem import pack_result, unpack_result, release_shared_blocks
+from ._streaming import spill_chunk
+from ._tokenindex import TokenIndex
+from ..utils import empty_chararray
 
 
 logger = logging.getLogger('tmtoolkit')
 logger.addHandler(logging.NullHandler())
 
+#: version of the binary state format written by :meth:`PreprocWorker._task_save_binary_state`
+BINARY_STATE_FORMAT_VERSION = 1
+
+#: spaCy token attributes stored in the binary state format; these are the same attributes that spaCy stores with
+#: ``Doc.to_bytes()``, which is used for the pickled state; attributes in the second and third group are only
+#: restored for tagged and for parsed documents respectively (SENT_START only for documents that are not parsed)
+BINARY_STATE_TOKEN_ATTRS = (LEMMA, NORM, ENT_IOB, ENT_TYPE, ENT_ID, ENT_KB_ID,
+                            TAG, POS,
+                            HEAD, DEP, SENT_START)
+
+#: token attributes in :data:`BINARY_STATE_TOKEN_ATTRS` whose values are string hashes
+BINARY_STATE_STRING_ATTRS = (LEMMA, NORM, ENT_TYPE, ENT_ID, ENT_KB_ID, TAG, DEP)
+
+#: tasks that can directly work with documents that use integer token IDs; all other tasks are run on materialized
+#: string tokens when integer token IDs are enabled
+TOKEN_ID_TASKS = {
+    'get_doc_labels', 'get_tokens', 'get_doc_vectors', 'get_token_vectors', 'get_available_metadata_keys',
+    'get_vocab', 'get_vocab_counts', 'get_vocab_doc_frequencies', 'get_ngrams', 'get_dtm',
+    'add_metadata_per_token', 'add_metadata_per_doc', 'remove_metadata', 'generate_ngrams',
+    'transform_tokens', 'tokens_to_lowercase', 'remove_chars', 'pos_tag', 'filter_tokens_by_mask',
+    'remove_documents_by_label', 'get_doc_loads', 'open_session', 'close_session', 'get_tokens_batch',
+    'write_tokens_batches', 'set_profiling', 'map_tokens',
+}
+
+#: tasks that don't modify the documents; the filtered tokens of the documents are cached between these tasks
+READ_ONLY_TASKS = {
+    'get_doc_labels', 'get_tokens', 'get_spacydocs', 'get_doc_vectors', 'get_token_vectors',
+    'get_available_metadata_keys', 'get_vocab', 'get_vocab_counts', 'get_vocab_doc_frequencies', 'get_ngrams',
+    'get_dtm', 'get_kwic', 'get_state', 'save_binary_state', 'get_binary_state', 'get_doc_loads', 'set_profiling',
+    'get_compaction_stats', 'get_tokens_batch', 'write_tokens_batches', 'save_checkpoint',
+}
+
+#: tasks that don't change the token strings of the documents, but may filter tokens or documents; when integer token
+#: IDs are enabled, the previous token IDs are restored after these tasks instead of encoding the tokens again
+TOKEN_STRINGS_PRESERVING_TASKS = READ_ONLY_TASKS | {
+    'clean_tokens', 'filter_tokens', 'filter_tokens_with_kwic', 'filter_documents', 'filter_documents_by_name',
+    'filter_for_pos', 'pop_docs',
+}
+
+#: tasks that may filter tokens, i.e. after which documents are compacted automatically if the fraction of filtered
+#: tokens exceeds the compaction threshold
+FILTERING_TASKS = {
+    'add_docs', 'run_pipeline', 'clean_tokens', 'filter_tokens_by_mask', 'filter_tokens', 'filter_tokens_with_kwic',
+    'filter_for_pos',
+}
+
+#: tasks that match token patterns via the token index if it is enabled
+TOKEN_INDEX_TASKS = {'get_kwic', 'filter_tokens', 'filter_tokens_with_kwic', 'filter_documents', 'glue_tokens'}
+
+#: tasks after which the token index stays valid, i.e. tasks that don't modify the documents, that only filter tokens
+#: or documents or that transform tokens (these tasks update the index)
+TOKEN_INDEX_PRESERVING_TASKS = READ_ONLY_TASKS | {
+    'clean_tokens', 'filter_tokens_by_mask', 'filter_tokens', 'filter_tokens_with_kwic', 'filter_documents',
+    'filter_documents_by_name', 'filter_for_pos', 'remove_documents_by_label', 'pop_docs', 'add_metadata_per_token',
+    'add_metadata_per_doc', 'remove_metadata', 'generate_ngrams', 'pos_tag', 'transform_tokens', 'tokens_to_lowercase',
+    'remove_chars', 'map_tokens',
+}
+
+#: worker attributes that make up the state of a session, i.e. the documents of a TMPreproc instance attached to a
+#: worker pool
+SESSION_ATTRS = ('_docs', '_std_attrs', '_metadata_attrs', '_ngrams', '_token_table', '_tokens_cache',
+                 '_token_index', '_compaction_stats', 'use_shared_memory', 'use_token_ids', 'use_token_index',
+                 'profile', 'batch_size', 'threads_per_worker', 'compact_threshold')
+
 
 class PreprocWorker(mp.Process):
     def __init__(self, worker_id, nlp, language, tasks_queue, results_queue, shutdown_event, worker_error_event,
-                 group=None, target=None, name=None, args=(), kwargs=None):
+                 use_shared_memory=False, use_token_ids=False, profile_queue=None, profile=False,
+                 batch_size=None, threads_per_worker=1, compact_threshold=None, status_queue=None,
+                 use_token_index=False, group=None, target=None, name=None, args=(), kwargs=None):
         super().__init__(group, target, name, args, kwargs or {}, daemon=True)
         logger.debug('worker `%s`: init with worker ID %d' % (name, worker_id))
         self.worker_id = worker_id
         self.tasks_queue = tasks_queue
         self.results_queue = results_queue
+        self._results_queue = results_queue   # actual results queue; results_queue is replaced for each task
         self.shutdown_event = shutdown_event
         self.worker_error_event = worker_error_event
+        self.use_shared_memory = use_shared_memory
+        self.use_token_ids = use_token_ids
+        self.use_token_index = use_token_index
+        self.profile_queue = profile_queue   # queue for task profiles; only used when profiling is enabled
+        self.profile = profile
+        self.batch_size = batch_size                    # batch size for spaCy's pipe() methods
+        self.threads_per_worker = threads_per_worker    # number of threads for spaCy's pipe() methods
+        self.compact_threshold = compact_threshold      # fraction of filtered tokens that triggers compaction
+        # queue for the status of each finished task; only set when the worker is supervised by the TMPreproc
+        # instance, i.e. a failed worker is restored from its last checkpoint instead of shutting down all workers
+        self.status_queue = status_queue
 
         self.language = language
 
@@ -46,6 +136,15 @@ class PreprocWorker(mp.Process):
         self._std_attrs = ['lemma', 'whitespace']
         self._metadata_attrs = {}     # metadata key -> default value
         self._ngrams = []             # generated ngrams as list of token strings
+        self._token_table = None      # sorted array of unique token strings when integer token IDs are used
+        self._tokens_cache = None     # cached filtered tokens of each document; only used during read-only tasks
+        self._use_tokens_cache = False
+        self._token_index = None      # positional inverted index of the tokens; only used when enabled
+        self._use_token_index = False
+        self._compaction_stats = _empty_compaction_stats()
+
+        self._session_id = None       # currently active session when the worker is part of a worker pool
+        self._sessions = {}           # inactive session ID -> session state (see SESSION_ATTRS)
 
     def run(self):
         logger.debug('worker `%s`: run' % self.name)
@@ -56,42 +155,244 @@ class PreprocWorker(mp.Process):
             if q_item is None:
                 break
 
-            next_task, task_kwargs = q_item
-            logger.debug('worker `%s`: received task `%s`' % (self.name, next_task))
+            # a task item consists of the task name, its parameters, an optional session ID when the worker is part
+            # of a worker pool and an optional task ID with which all results of this task are tagged
+            next_task, task_kwargs, session_id, task_id = q_item
+            logger.debug('worker `%s`: received task `%s` (task ID %s)' % (self.name, next_task, task_id))
+
+            if session_id is not None:
+                self._switch_session(session_id)
+
+            # tasks without task ID are sent by a worker pool and are not profiled
+            profile = self.profile and task_id is not None
+
+            if profile:
+                self.results_queue = _ProfiledTaskResults(self._results_queue, task_id, self.worker_id)
+                n_docs, n_tokens = self._n_docs_and_tokens()
+                t_start = time.perf_counter()
+            else:
+                self.results_queue = _TaskResults(self._results_queue, task_id, self.worker_id)
+
+            # the cached filtered tokens stay valid as long as only read-only tasks are run
+            self._use_tokens_cache = next_task in READ_ONLY_TASKS
+            if not self._use_tokens_cache:
+                self._tokens_cache = None
+
+            # the token index is only used by tasks that are run directly, i.e. not when replaying tasks on added
+            # documents or when running a pipeline; "glue_tokens" uses the index before modifying the documents and
+            # resets it afterwards
+            self._use_token_index = self.use_token_index and next_task in TOKEN_INDEX_TASKS
+            if next_task not in TOKEN_INDEX_PRESERVING_TASKS and next_task not in TOKEN_INDEX_TASKS:
+                self._token_index = None
 
             exec_task_fn = getattr(self, '_task_' + next_task)
             if exec_task_fn:
                 try:
-                    exec_task_fn(**task_kwargs)
+                    self._exec_task(next_task, exec_task_fn, task_kwargs)
+
+                    if profile:
+                        self._put_task_profile(next_task, task_id, n_docs, n_tokens, time.perf_counter() - t_start)
                 except Exception as exc:
                     logger.error('worker `%s`: an exception occurred: "%s"' % (self.name, str(exc)))
-                    self.tasks_queue.task_done()
+
+                    if self.status_queue is not None:
+                        # supervised worker: only this worker fails and will be restored by the TMPreproc instance
+                        self.status_queue.put((task_id, self.worker_id, {
+                            'error': '%s: %s' % (type(exc).__name__, str(exc)),
+                            'doc_label': self._find_failing_doc(next_task, exec_task_fn, task_kwargs)
+                        }))
+                        self.tasks_queue.task_done()
+                        raise exc
+
+                    # the signals must be set before the task is marked as done so that the TMPreproc instance
+                    # notices the error as soon as it stops waiting for the task
                     self.worker_error_event.set()   # signal worker error
                     self.shutdown_event.set()    # signal shutdown for all workers
+                    self.tasks_queue.task_done()
                     raise exc                    # re-raise exception
 
+                if self.status_queue is not None:
+                    self.status_queue.put((task_id, self.worker_id, None))
+
                 self.tasks_queue.task_done()
             else:
-                self.tasks_queue.task_done()
                 self.worker_error_event.set()  # signal worker error
                 self.shutdown_event.set()        # signal shutdown for all workers
+                self.tasks_queue.task_done()
                 raise NotImplementedError("Task not implemented: `%s`" % next_task)
 
         # normal shutdown
         logger.debug('worker `%s`: shutting down' % self.name)
         self.tasks_queue.task_done()
 
-    def _get_tokens_with_metadata(self, as_dict=True, only_metadata=False):
+    def _exec_task(self, task, exec_task_fn, task_kwargs):
+        if self.use_token_ids and task not in TOKEN_ID_TASKS:
+            # task requires string tokens in the documents
+            decoded = self._decode_token_ids()
+            exec_task_fn(**task_kwargs)
+            if decoded is not None and task in TOKEN_STRINGS_PRESERVING_TASKS:
+                self._restore_token_ids(*decoded)
+            else:
+                self._encode_token_ids()
+        else:
+            exec_task_fn(**task_kwargs)
+
+        if self.compact_threshold is not None and task in FILTERING_TASKS:
+            n_total = sum(len(doc) for doc in self._docs)
+            if n_total > 0 and 1 - self._n_docs_and_tokens()[1] / n_total > self.compact_threshold:
+                logger.debug('worker `%s`: automatic compaction after task `%s`' % (self.name, task))
+                self._compact_docs()
+
+    def _pipe(self, component, items):
+        """
+        Process `items` (texts or documents) with the ``pipe()`` method of the spaCy language model or pipeline
+        component `component` in batches of size `self.batch_size`. If `self.threads_per_worker` is greater than 1, the
+        items are split into as many contiguous parts which are processed in parallel threads. Returns the processed
+        documents as list in the order of `items`.
+        """
+        pipe_kwargs = {} if self.batch_size is None else {'batch_size': self.batch_size}
+
+        if self.threads_per_worker > 1 and len(items) > 1:
+            part_size = -(-len(items) // self.threads_per_worker)   # ceil. division
+            parts = [items[i:i+part_size] for i in range(0, len(items), part_size)]
+
+            with ThreadPoolExecutor(max_workers=len(parts)) as executor:
+                processed_parts = executor.map(lambda part: list(component.pipe(part, **pipe_kwargs)), parts)
+
+                return [doc for part in processed_parts for doc in part]
+        else:
+            return list(component.pipe(items, **pipe_kwargs))
+
+    def _find_failing_doc(self, task, exec_task_fn, task_kwargs):
+        """
+        Find the document that caused the task `task` to fail by running the task separately for each document. This is
+        only done for tasks that process each document independently and only after the task failed, i.e. when the
+        worker's documents are discarded anyway. Returns the label of the first document for which the task fails or
+        None if it can't be determined.
+        """
+        self.results_queue = _DiscardedResults()
+
+        try:
+            if task in {'init', 'add_docs'}:
+                for dl, doc in task_kwargs['docs'].items():
+                    try:
+                        exec_task_fn(**dict(task_kwargs, docs={dl: doc}))
+                    except Exception:
+                        return dl
+            elif task in REPLAYABLE_TASKS or task == 'run_pipeline':
+                for doc in self._docs:
+                    self._docs = [doc]
+                    try:
+                        self._exec_task(task, exec_task_fn, task_kwargs)
+                    except Exception:
+                        return doc._.label
+        except Exception:   # the worker's state is too broken to find the document
+            pass
+
+        return None
+
+    def _compact_docs(self):
+        """
+        Compact the documents, i.e. recreate them without the filtered tokens, and update the compaction statistics.
+        """
+        n_tokens_before = sum(len(doc) for doc in self._docs)
+        nbytes_before = sum(_doc_nbytes(doc) for doc in self._docs)
+
+        # compaction requires string tokens in the documents
+        encoded = self.use_token_ids and self._token_table is not None
+        if encoded:
+            self._decode_token_ids()
+
+        self._docs = compact_documents(self._docs)
+        self._token_index = None    # token positions changed
+
+        if encoded:
+            self._encode_token_ids()
+
+        n_tokens_removed = n_tokens_before - sum(len(doc) for doc in self._docs)
+        bytes_reclaimed = nbytes_before - sum(_doc_nbytes(doc) for doc in self._docs)
+
+        self._compaction_stats['n_compactions'] += 1
+        self._compaction_stats['n_tokens_removed'] += n_tokens_removed
+        self._compaction_stats['bytes_reclaimed'] += bytes_reclaimed
+
+        logger.debug('worker `%s`: compaction removed %d tokens and reclaimed %d bytes'
+                     % (self.name, n_tokens_removed, bytes_reclaimed))
+
+    def _n_docs_and_tokens(self):
+        """Return the number of documents and the number of unfiltered tokens in these documents."""
+        return len(self._docs), int(sum(np.sum(doc.user_data['mask']) for doc in self._docs))
+
+    def _put_task_profile(self, task, task_id, n_docs, n_tokens, total_time):
+        """
+        Put the profile of the finished task `task` in the profile queue. The time needed for serializing the task's
+        results is subtracted from the total time `total_time` of the task.
+        """
+        self.profile_queue.put({
+            'task_id': task_id,
+            'task': task,
+            'worker': self.worker_id,
+            'n_docs': n_docs,
+            'n_tokens': n_tokens,
+            'compute_time': total_time - self.results_queue.serialize_time,
+            'serialize_time': self.results_queue.serialize_time,
+            'n_results': self.results_queue.n_results,
+            'result_bytes': self.results_queue.result_bytes,
+        })
+
+    def _switch_session(self, session_id):
+        """Store the state of the currently active session and activate the session `session_id`."""
+        if session_id == self._session_id:
+            return
+
+        logger.debug('worker `%s`: switching to session %d' % (self.name, session_id))
+
+        if self._session_id is not None:
+            self._sessions[self._session_id] = {attr: getattr(self, attr) for attr in SESSION_ATTRS}
+
+        session_state = self._sessions.pop(session_id, None) or self._empty_session_state()
+        for attr, val in session_state.items():
+            setattr(self, attr, val)
+
+        self._session_id = session_id
+
+    @staticmethod
+    def _empty_session_state():
+        return {
+            '_docs': [],
+            '_std_attrs': ['lemma', 'whitespace'],
+            '_metadata_attrs': {},
+            '_ngrams': [],
+            '_token_table': None,
+            'use_shared_memory': False,
+            'use_token_ids': False,
+            'use_token_index': False,
+            '_tokens_cache': None,
+            '_token_index': None,
+            '_compaction_stats': _empty_compaction_stats(),
+            'profile': False,
+            'batch_size': None,
+            'threads_per_worker': 1,
+            'compact_threshold': None,
+        }
+
+    def _get_tokens_with_metadata(self, as_dict=True, only_metadata=False, docs=None):
         if as_dict:
             res = {}
         else:
             res = []
 
-        for doc in self._docs:
+        if docs is None:
+            docs = self._docs
+            docs_tokens = None if only_metadata else self._tokens
+        else:
+            docs_tokens = None if only_metadata else [self._doc_tokens(doc) for doc in docs]
+
+        for doc_i, doc in enumerate(docs):
             if only_metadata:
                 resdoc = {}
             else:
-                resdoc = {'token': _filtered_doc_tokens(doc)}
+                resdoc = {'token': docs_tokens[doc_i]}
 
             for meta_key in self._std_attrs:
                 assert meta_key not in resdoc
@@ -103,7 +404,7 @@ class PreprocWorker(mp.Process):
             for meta_key in self._metadata_attrs.keys():
                 k = 'meta_' + meta_key
                 assert k not in resdoc
-                resdoc[k] = _filtered_doc_arr([getattr(t._, k) for t in doc], doc)
+                resdoc[k] = self._doc_metadata(doc, meta_key)[doc.user_data['mask']]
 
             if as_dict:
                 res[doc._.label] = resdoc
@@ -112,9 +413,180 @@ class PreprocWorker(mp.Process):
 
         return res
 
+    def _doc_metadata(self, doc, key):
+        """
+        Return the metadata column for key `key` of `doc` for all tokens (including masked tokens). Metadata is stored
+        as NumPy array in ``doc.user_data['meta_<key>']``; if `doc` doesn't have this column yet, it is created with
+        the default value for `key`.
+        """
+        k = 'meta_' + key
+        if k not in doc.user_data:
+            doc.user_data[k] = _metadata_column(len(doc), self._metadata_attrs[key])
+        return doc.user_data[k]
+
+    def _fill_metadata_columns(self):
+        """
+        Create the metadata columns that are missing in the documents with the respective default values, e.g. for
+        documents that were added after metadata was added to the other documents. Documents from states that were
+        saved with older versions store the metadata as spaCy token extension values in ``doc.user_data``; these values
+        are converted to metadata columns.
+        """
+        for doc in self._docs:
+            for key, default in self._metadata_attrs.items():
+                k = 'meta_' + key
+                if k in doc.user_data:
+                    continue
+
+                ext_keys = [('._.', k, t.idx, None) for t in doc]
+                if any(ek in doc.user_data for ek in ext_keys):
+                    doc.user_data[k] = _metadata_values([doc.user_data.pop(ek, default) for ek in ext_keys])
+                else:
+                    doc.user_data[k] = _metadata_column(len(doc), default)
+
+    def _put_result(self, res):
+        """
+        Put result `res` in the results queue. If shared memory transport is enabled, the NumPy arrays in `res` are
+        passed via a shared memory block and only a small descriptor object is put in the queue.
+        """
+        if self.use_shared_memory:
+            res = pack_result(res)
+        self.results_queue.put(res)
+
+    def _doc_tokens(self, doc):
+        """Return the filtered string tokens of `doc` as NumPy array."""
+        if self.use_token_ids:
+            ids = doc.user_data['token_ids'][doc.user_data['mask']]
+            return self._token_table[ids] if len(ids) > 0 else empty_chararray()
+        else:
+            return _filtered_doc_tokens(doc)
+
     @property
     def _tokens(self):
-        return [_filtered_doc_tokens(doc) for doc in self._docs]
+        if self._use_tokens_cache:
+            if self._tokens_cache is None:
+                self._tokens_cache = [self._doc_tokens(doc) for doc in self._docs]
+            return self._tokens_cache
+        else:
+            return [self._doc_tokens(doc) for doc in self._docs]
+
+    @property
+    def _token_ids(self):
+        """Filtered token IDs of each document; only available when integer token IDs are used."""
+        return [doc.user_data['token_ids'][doc.user_data['mask']] for doc in self._docs]
+
+    def _token_ids_counts(self):
+        """Number of occurrences of each entry in the token table across all documents."""
+        return np.bincount(_concat_ids(self._token_ids), minlength=len(self._token_table))
+
+    def _encode_token_ids(self):
+        """
+        Replace the string tokens array of each document by an array of integer IDs into a sorted table of unique
+        token strings (`self._token_table`).
+        """
+        docs_tokens = [doc.user_data.pop('tokens') for doc in self._docs]
+        if docs_tokens:
+            self._token_table, ids = np.unique(np.concatenate(docs_tokens), return_inverse=True)
+        else:
+            self._token_table, ids = empty_chararray(), np.array([], dtype=np.uint32)
+
+        offsets = np.cumsum([len(dtok) for dtok in docs_tokens])[:-1]
+        for doc, doc_ids in zip(self._docs, np.split(ids.astype(np.uint32), offsets)):
+            doc.user_data['token_ids'] = doc_ids
+
+    def _decode_token_ids(self):
+        """
+        Inverse of :meth:`_encode_token_ids`: restore the string tokens array of each document. Return the previous
+        token table and a dict that maps the object ID of each document to a tuple with the document and its token
+        IDs, which can be passed to :meth:`_restore_token_ids`, or None if the tokens were not encoded so far.
+        """
+        if self._token_table is None:   # nothing encoded so far
+            return None
+
+        token_table = self._token_table
+        docs_ids = {}
+        for doc in self._docs:
+            ids = doc.user_data.pop('token_ids')
+            doc.user_data['tokens'] = token_table[ids] if len(ids) > 0 else empty_chararray()
+            docs_ids[id(doc)] = (doc, ids)
+
+        self._token_table = None
+
+        return token_table, docs_ids
+
+    def _restore_token_ids(self, token_table, docs_ids):
+        """
+        Restore the token table `token_table` and the token IDs of each document from `docs_ids` as returned by
+        :meth:`_decode_token_ids` after a task that didn't change the token strings. Falls back to
+        :meth:`_encode_token_ids` if there are documents that were not decoded before, e.g. compacted documents.
+        """
+        if any(docs_ids.get(id(doc), (None, ))[0] is not doc for doc in self._docs):
+            self._encode_token_ids()
+            return
+
+        for doc in self._docs:
+            del doc.user_data['tokens']
+            doc.user_data['token_ids'] = docs_ids[id(doc)][1]
+
+        self._token_table = token_table
+
+    def _transform_token_table(self, new_table):
+        """
+        Replace the token table by the transformed token table `new_table` in which each token string at index `i`
+        is the transformed token string of the current table at index `i`. As different tokens may be transformed to
+        the same string, the new table is de-duplicated and all documents' token IDs are remapped.
+        """
+        self._token_table, id_map = np.unique(np.asarray(new_table, dtype=str), return_inverse=True)
+        id_map = id_map.astype(np.uint32)
+
+        for doc in self._docs:
+            doc.user_data['token_ids'] = id_map[doc.user_data['token_ids']]
+
+    def _transform_vocab(self, transform_fn):
+        """
+        Transform the tokens of all documents by applying `transform_fn` only once to each unique token. `transform_fn`
+        must accept an array of unique token strings and return a sequence of the transformed tokens in the same order.
+        """
+        if self.use_token_ids:   # transform the token table
+            vocab = self._token_table
+            new_vocab = np.asarray(transform_fn(vocab), dtype=str)
+            self._transform_token_table(new_vocab)
+        else:
+            docs_tokens = self._tokens
+            if not docs_tokens:
+                return
+
+            vocab, token_ids = np.unique(np.concatenate(docs_tokens), return_inverse=True)
+            new_vocab = np.asarray(transform_fn(vocab), dtype=str)
+            new_tokens = new_vocab[token_ids]
+
+            offsets = np.cumsum([len(dtok) for dtok in docs_tokens])[:-1]
+            for doc, new_tok in zip(self._docs, np.split(new_tokens, offsets)):
+                _replace_doc_tokens(doc, new_tok)
+
+        if self._token_index is not None:
+            self._token_index.transform(vocab, new_vocab)
+
+    def _token_pattern_matches(self, search_tokens, match_type, ignore_case, glob_method):
+        """
+        Match `search_tokens` against the filtered tokens of each document. Uses the token index if it is enabled for
+        the current task; the index is built on first use. Returns a list with a boolean array for each document.
+        """
+        # the calling tasks are not in TOKEN_ID_TASKS, i.e. the documents contain string tokens
+        match_opts = dict(match_type=match_type, ignore_case=ignore_case, glob_method=glob_method)
+
+        if self._use_token_index:
+            matches = None
+            if self._token_index is not None:
+                matches = self._token_index.matches(self._docs, search_tokens, **match_opts)
+
+            if matches is None:   # index not built yet or documents not indexed
+                logger.debug('worker `%s`: building token index' % self.name)
+                self._token_index = TokenIndex(self._docs, [_filtered_doc_tokens(doc) for doc in self._docs])
+                matches = self._token_index.matches(self._docs, search_tokens, **match_opts)
+
+            return matches
+
+        return _token_pattern_matches([_filtered_doc_tokens(doc) for doc in self._docs], search_tokens, **match_opts)
 
     @property
     def _doc_labels(self):
@@ -126,7 +598,8 @@ class PreprocWorker(mp.Process):
 
     def _remove_metadata(self, key):
         if key in self._metadata_attrs:
-            Token.remove_extension('meta_' + key)
+            for doc in self._docs:
+                doc.user_data.pop('meta_' + key, None)
             del self._metadata_attrs[key]
 
     def _clear_metadata(self, pos=True):
@@ -148,10 +621,17 @@ class PreprocWorker(mp.Process):
         if docs_are_tokenized:
             logger.info('got %d already tokenized documents' % len(docs))
 
+            # the token strings are directly used as `tokens` arrays of the documents and all other attributes are
+            # set at once per document via integer arrays, which is much faster than setting them for each token
+            strings = self.nlp.vocab.strings
+            docs_tokens = []
             for doc_i, doc_data in enumerate(docs.values()):
-                doc_kwargs = dict(words=doc_data['token'])
+                tokens = np.asarray(doc_data['token'])
+                if tokens.dtype.kind != 'U':   # e.g. object arrays from data frames
+                    tokens = tokens.astype(str)
+                doc_kwargs = dict(words=tokens.tolist())
                 if 'whitespace' in doc_data:
-                    doc_kwargs['spaces'] = doc_data['whitespace']
+                    doc_kwargs['spaces'] = np.asarray(doc_data['whitespace'], dtype=bool).tolist()
                 new_doc = Doc(self.nlp.vocab, **doc_kwargs)
 
                 for k, metadata in doc_data.items():
@@ -166,39 +646,197 @@ class PreprocWorker(mp.Process):
                             meta_k = k[5:]       # strip "meta_"
                             if meta_k not in self._metadata_attrs:
                                 self._metadata_attrs[meta_k] = None   # cannot infer correct default value here
-                                Token.set_extension(k, default=None)
 
                     assert len(new_doc) == len(metadata)
-                    for t, v in zip(new_doc, metadata):
-                        if is_std:
-                            attr = k + '_'
-                            obj = t
-                        else:
-                            attr = k
-                            obj = t._
-
-                        setattr(obj, attr, v)
+                    if is_std:
+                        if len(new_doc) > 0:
+                            # map the unique attribute strings to their IDs
+                            uniq_vals, val_ids = np.unique(np.asarray(metadata, dtype=str), return_inverse=True)
+                            if k == 'pos':
+                                uniq_ids = [POS_IDS.get(v, 0) for v in uniq_vals.tolist()]
+                                attr = POS
+                            else:
+                                uniq_ids = [strings.add(v) for v in uniq_vals.tolist()]
+                                attr = LEMMA
+                            attr_ids = np.array(uniq_ids, dtype=np.uint64)[val_ids]
+                            new_doc.from_array([attr], attr_ids.reshape((-1, 1)))
+                    else:
+                        new_doc.user_data[k] = metadata if isinstance(metadata, np.ndarray) \
+                            else _metadata_values(metadata)
 
                 self._docs.append(new_doc)
+                docs_tokens.append(tokens)
         else:
             # directly tokenize documents
             logger.info('tokenizing %d documents' % len(docs))
 
             if enable_vectors:
-                self._docs = [self.nlp(d) for d in docs.values()]
+                self._docs = self._pipe(self.nlp, list(docs.values()))
             else:
-                self._docs = [self.nlp.make_doc(d) for d in docs.values()]
+                self._docs = self._pipe(self.nlp.tokenizer, list(docs.values()))
 
         # set attributes for transformed text and filter mask
         # will use user_data directly because this is much faster than <token>._.<attr>
-        self._init_docs(docs.keys())
+        self._init_docs(docs.keys(), docs_tokens if docs_are_tokenized else None)
+
+    def _task_open_session(self, use_shared_memory, use_token_ids, profile=False, batch_size=None,
+                           threads_per_worker=1, compact_threshold=None, use_token_index=False):
+        self.use_shared_memory = use_shared_memory
+        self.use_token_ids = use_token_ids
+        self.use_token_index = use_token_index
+        self.profile = profile
+        self.batch_size = batch_size
+        self.threads_per_worker = threads_per_worker
+        self.compact_threshold = compact_threshold
+
+    def _task_close_session(self):
+        logger.debug('worker `%s`: closing session %d' % (self.name, self._session_id))
+
+        for attr, val in self._empty_session_state().items():
+            setattr(self, attr, val)
+
+        self._session_id = None
+
+    def _task_set_profiling(self, enabled):
+        self.profile = enabled
+
+    def _task_add_docs(self, docs, enable_vectors, replay_tasks):
+        """
+        Add new documents `docs` to this worker and apply the sequence of recorded tasks `replay_tasks` (as
+        ``(task name, task kwargs)`` tuples) only to these new documents.
+        """
+        logger.debug('worker `%s`: adding %d docs' % (self.name, len(docs)))
+
+        # stash the state of the existing documents; the new documents are processed as if they were the only
+        # documents of this worker
+        prev_docs, prev_ngrams = self._docs, self._ngrams
+        prev_std_attrs, prev_metadata_attrs = self._std_attrs, self._metadata_attrs
+        prev_results_queue = self.results_queue
+
+        self._std_attrs = ['lemma', 'whitespace']
+        self._metadata_attrs = {}
+        self.results_queue = _DiscardedResults()     # results of replayed tasks are not needed
+
+        try:
+            self._task_init(docs, docs_are_tokenized=False, enable_vectors=enable_vectors)
+            if self.use_token_ids:
+                self._encode_token_ids()
+
+            for task, task_kwargs in replay_tasks:
+                logger.debug('worker `%s`: replaying task `%s`' % (self.name, task))
+                self._exec_task(task, getattr(self, '_task_' + task), task_kwargs)
+
+            self._decode_token_ids()
+        finally:
+            self.results_queue = prev_results_queue
+
+        # merge the new documents with the existing ones
+        self._docs = prev_docs + self._docs
+
+        if isinstance(prev_ngrams, list) and isinstance(self._ngrams, list):
+            self._ngrams = prev_ngrams + self._ngrams
+        else:
+            self._ngrams = prev_ngrams
+
+        self._std_attrs = prev_std_attrs + [a for a in self._std_attrs if a not in prev_std_attrs]
+        for key, default in self._metadata_attrs.items():
+            prev_metadata_attrs.setdefault(key, default)
+        self._metadata_attrs = prev_metadata_attrs
+        self._fill_metadata_columns()
+
+    def _task_run_pipeline(self, steps):
+        """
+        Run the sequence of tasks `steps` (as ``(task name, task kwargs)`` tuples) received in a single task item. Each
+        task is applied to all documents of this worker before the next task is run, so that tasks keep processing the
+        documents in batches (e.g. POS tagging) and transform each unique token only once.
+        """
+        logger.debug('worker `%s`: running pipeline with %d steps' % (self.name, len(steps)))
+
+        task_fns = [(getattr(self, '_task_' + task), task_kwargs) for task, task_kwargs in steps]
+
+        # the documents are already decoded to string tokens when using integer token IDs (this task is not in
+        # TOKEN_ID_TASKS), so the tasks must not operate on the token table
+        use_token_ids, self.use_token_ids = self.use_token_ids, False
+
+        try:
+            for task_fn, task_kwargs in task_fns:
+                task_fn(**task_kwargs)
+        finally:
+            self.use_token_ids = use_token_ids
+
+    def _task_remove_documents_by_label(self, doc_labels):
+        doc_labels = set(doc_labels)
+        keep = [doc._.label not in doc_labels for doc in self._docs]
+
+        if isinstance(self._ngrams, list) and len(self._ngrams) == len(self._docs):
+            self._ngrams = [dngrams for dngrams, k in zip(self._ngrams, keep) if k]
+
+        self._docs = [doc for doc, k in zip(self._docs, keep) if k]
 
     def _task_get_doc_labels(self):
         self.results_queue.put(self._doc_labels)
 
     def _task_get_tokens(self):
         # tokens with metadata
-        self.results_queue.put(self._get_tokens_with_metadata())
+        self._put_result(self._get_tokens_with_metadata())
+
+    def _task_get_tokens_batch(self, start, stop, with_metadata):
+        """
+        Put the tokens of the documents `start` to `stop` (in the order of the document labels) of this worker in
+        columnar format in the result queue, i.e. as dict mapping column name to a NumPy array with the values for all
+        tokens of these documents. The columns are "doc" (document label), "position" (token position in the
+        document), "token" and the metadata columns if `with_metadata` is True.
+        """
+        self._sort_docs_by_label()
+        docs = self._docs[start:stop]
+
+        if with_metadata:
+            docs_tokens = self._get_tokens_with_metadata(as_dict=False, docs=docs)
+        else:
+            docs_tokens = [{'token': self._doc_tokens(doc)} for doc in docs]
+
+        doc_lengths = [len(doc_tokens['token']) for doc_tokens in docs_tokens]
+        batch = {
+            'doc': np.repeat(np.array(doc_labels(docs), dtype=str), doc_lengths),
+            'position': _concat_ids([np.arange(n) for n in doc_lengths]),
+        }
+
+        if docs_tokens:
+            for col in docs_tokens[0].keys():
+                batch[col] = np.concatenate([doc_tokens[col] for doc_tokens in docs_tokens])
+        else:
+            batch['token'] = empty_chararray()
+
+        self._put_result(batch)
+
+    def _task_write_tokens_batches(self, file_prefix, batch_size):
+        """
+        Write the tokens and metadata of this worker's documents in batches of `batch_size` documents (in the order of
+        the document labels) to files ``<file_prefix>_<batch number>.npz``. Put the list of written files in the
+        result queue.
+        """
+        self._sort_docs_by_label()
+
+        batch_files = []
+        for i_batch, start in enumerate(range(0, len(self._docs), batch_size)):
+            docs = self._docs[start:start+batch_size]
+            batch_file = '%s_%05d.npz' % (file_prefix, i_batch)
+            spill_chunk(dict(zip(doc_labels(docs), self._get_tokens_with_metadata(as_dict=False, docs=docs))),
+                        batch_file)
+            batch_files.append(batch_file)
+
+        self.results_queue.put(batch_files)
+
+    def _sort_docs_by_label(self):
+        """Sort this worker's documents by their labels if they're not sorted, yet."""
+        labels = self._doc_labels
+        if all(a < b for a, b in zip(labels, labels[1:])):
+            return
+
+        order = sorted(range(len(labels)), key=lambda i: labels[i])
+        if isinstance(self._ngrams, list) and len(self._ngrams) == len(self._docs):
+            self._ngrams = [self._ngrams[i] for i in order]
+        self._docs = [self._docs[i] for i in order]
 
     def _task_get_spacydocs(self):
         # spaCy documents
@@ -206,52 +844,107 @@ class PreprocWorker(mp.Process):
 
     def _task_get_doc_vectors(self):
         # document vectors
-        self.results_queue.put(dict(zip(self._doc_labels, (d.vector for d in self._docs))))
+        self._put_result(dict(zip(self._doc_labels, (d.vector for d in self._docs))))
 
     def _task_get_token_vectors(self):
         # document token vectors
-        self.results_queue.put(
+        self._put_result(
             {dl: np.vstack([t.vector for t in doc])
              for dl, doc in zip(self._doc_labels, self._docs)}
         )
 
-    def _task_replace_tokens(self, tokens):
-        assert set(tokens.keys()) == set(self._doc_labels)
-        for dl, new_tok in tokens.items():
-            doc = self._docs[self._doc_labels.index(dl)]
-            _replace_doc_tokens(doc, new_tok)
-
     def _task_get_available_metadata_keys(self):
         self.results_queue.put(self._std_attrs + list(self._metadata_attrs.keys()))
 
     def _task_get_vocab(self):
         """Put this worker's vocabulary in the result queue."""
-        self.results_queue.put(vocabulary(self._tokens))
+        if self.use_token_ids:
+            self.results_queue.put(set(self._token_table[self._token_ids_counts() > 0].tolist()))
+        else:
+            self.results_queue.put(vocabulary(self._tokens))
 
     def _task_get_vocab_counts(self):
-        self.results_queue.put(vocabulary_counts(self._tokens))
+        if self.use_token_ids:
+            counts = self._token_ids_counts()
+            used = counts > 0
+            self.results_queue.put(Counter(dict(zip(self._token_table[used].tolist(), counts[used].tolist()))))
+        else:
+            self.results_queue.put(vocabulary_counts(self._tokens))
 
     def _task_get_vocab_doc_frequencies(self):
-        self.results_queue.put(doc_frequencies(self._tokens))
+        if self.use_token_ids:
+            doc_freqs = np.bincount(_concat_ids([np.unique(ids) for ids in self._token_ids]),
+                                    minlength=len(self._token_table))
+            used = doc_freqs > 0
+            self.results_queue.put(Counter(dict(zip(self._token_table[used].tolist(), doc_freqs[used].tolist()))))
+        else:
+            self.results_queue.put(doc_frequencies(self._tokens))
 
     def _task_get_ngrams(self):
         self.results_queue.put(dict(zip(self._doc_labels, self._ngrams)))
 
-    def _task_get_dtm(self):
+    def _task_get_dtm(self, vocab):
         """
-        Put this worker's document-term-matrix (DTM), the document labels and sorted vocabulary in the result queue.
+        Put this worker's rows of the document-term-matrix (DTM) in CSR format in the result queue. The columns of the
+        DTM correspond to the global sorted vocabulary `vocab` of all workers, hence the manager can concatenate the
+        rows of all workers without remapping the columns.
         """
-        # create a sparse DTM in COO format
-        logger.info('creating sparse DTM for %d documents' % len(self._docs))
-        dtm, vocab = sparse_dtm(self._tokens)
+        logger.info('creating sparse DTM rows for %d documents' % len(self._docs))
+
+        vocab = np.array(vocab, dtype=str)
+
+        # map each document's tokens to column indices into the global vocabulary
+        if self.use_token_ids:
+            table_ids_to_cols = np.searchsorted(vocab, self._token_table)
+            docs_cols = [table_ids_to_cols[ids] for ids in self._token_ids]
+        else:
+            docs_cols = [np.searchsorted(vocab, tok) for tok in self._tokens]
+
+        row_nnz = np.empty(len(docs_cols), dtype=np.int64)   # number of non-zero entries per row
+        indices = []
+        data = []
+        for i, cols in enumerate(docs_cols):
+            doc_cols, doc_counts = np.unique(cols, return_counts=True)   # sorted column indices per row
+            row_nnz[i] = len(doc_cols)
+            indices.append(doc_cols)
+            data.append(doc_counts)
 
         # put tuple in queue with:
-        # DTM, document labels that correspond to DTM rows and vocab that corresponds to DTM columns
-        self.results_queue.put((dtm, self._doc_labels, vocab))
+        # document labels that correspond to DTM rows, number of non-zero entries per row, column indices and data of
+        # the non-zero entries
+        self._put_result((self._doc_labels, row_nnz, _concat_ids(indices), _concat_ids(data)))
 
     def _task_get_state(self):
         logger.debug('worker `%s`: getting state' % self.name)
+        state = self._get_state()
+        logger.debug('worker `%s`: got state with %d items' % (self.name, len(state)))
+        self.results_queue.put(state)
+
+    def _task_set_state(self, **state):
+        logger.debug('worker `%s`: setting state' % self.name)
+        self._set_state(state)
+
+    def _task_save_checkpoint(self, checkpoint_file):
+        """
+        Save the state of this worker in the binary format of :meth:`_task_save_binary_state` to the NumPy ``.npz``
+        file `checkpoint_file`. The previous checkpoint is only replaced after the new one was completely written.
+        """
+        logger.debug('worker `%s`: saving checkpoint to `%s`' % (self.name, checkpoint_file))
+        tmp_file = checkpoint_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, **self._binary_state_arrays())
+        os.replace(tmp_file, checkpoint_file)
+
+    def _task_load_checkpoint(self, checkpoint_file, language_model=None, spacy_opts=None):
+        """
+        Load the state of this worker from the checkpoint file `checkpoint_file` as written by
+        :meth:`_task_save_checkpoint`. If this worker was started without a spaCy language model, the model
+        `language_model` is loaded with options `spacy_opts`.
+        """
+        logger.debug('worker `%s`: loading checkpoint from `%s`' % (self.name, checkpoint_file))
+        self._task_load_binary_state(state_file=checkpoint_file, language_model=language_model, spacy_opts=spacy_opts)
 
+    def _get_state(self):
         # serialize SpaCy docs
         #
         # tried out several approaches for both serializing and de-serializing:
@@ -267,7 +960,7 @@ class PreprocWorker(mp.Process):
         #
 
         state = {
-            'docs_bytes': [doc.to_bytes() for doc in self._docs],
+            'docs_bytes': [_doc_to_bytes(doc) for doc in self._docs],
             'nlp_bytes': self.nlp.to_bytes(exclude=['vocab']),
             'tagger_bytes': self.tagger.to_bytes() if self.tagger is not None else None,
             'vocab_bytes': self.nlp.vocab.to_bytes(),
@@ -281,18 +974,14 @@ class PreprocWorker(mp.Process):
         )
 
         state.update({attr: getattr(self, attr) for attr in other_attrs})
-        logger.debug('worker `%s`: got state with %d items' % (self.name, len(state)))
-        self.results_queue.put(state)
 
-    def _task_set_state(self, **state):
-        logger.debug('worker `%s`: setting state' % self.name)
-
-        for key, default in state['_metadata_attrs'].items():
-            Token.set_extension('meta_' + key, default=default)
+        return state
 
+    def _set_state(self, state):
         # de-serialize SpaCy docs
         lang_cls = spacy.util.get_lang_class(self.language)
-        vocab = Vocab().from_bytes(state.pop('vocab_bytes'))
+        # the language's default vocab provides the lexical attributes like `is_punct` for the documents' tokens
+        vocab = lang_cls.Defaults.create_vocab().from_bytes(state.pop('vocab_bytes'))
         self.nlp = lang_cls(vocab).from_bytes(state.pop('nlp_bytes'))
         tagger_bytes = state.pop('tagger_bytes')
         if tagger_bytes is not None:
@@ -301,32 +990,232 @@ class PreprocWorker(mp.Process):
         else:
             self.tagger = None
 
+        self._docs = [self._doc_from_bytes(doc_bytes) for doc_bytes in state.pop('docs_bytes')]
+
+        for attr, val in state.items():
+            setattr(self, attr, val)
+
+        self._fill_metadata_columns()
+
+    def _task_save_binary_state(self, state_file):
+        """
+        Save the state of this worker to the NumPy ``.npz`` file `state_file`. All documents' data is stored as flat
+        arrays that contain the data of all tokens (including masked tokens) along with the document offsets in these
+        arrays. In contrast to :meth:`_task_get_state`, the spaCy language model is not stored.
+        """
+        logger.debug('worker `%s`: saving binary state to `%s`' % (self.name, state_file))
+        np.savez(state_file, **self._binary_state_arrays())
+
+    def _task_get_binary_state(self, shared_memory=False):
+        """
+        Put the state of this worker as dict of arrays (see :meth:`_binary_state_arrays`) in the result queue. If
+        `shared_memory` is True, the arrays are passed via a shared memory block that is mapped by the worker that
+        loads the state with :meth:`_task_load_binary_state`.
+        """
+        logger.debug('worker `%s`: getting binary state' % self.name)
+        arrays = self._binary_state_arrays()
+        self.results_queue.put(pack_result(arrays) if shared_memory else arrays)
+
+    def _task_load_binary_state(self, state_file=None, state=None, language_model=None, spacy_opts=None):
+        """
+        Load the state of this worker either from the NumPy ``.npz`` file `state_file` as written by
+        :meth:`_task_save_binary_state` or from `state` as returned by :meth:`_task_get_binary_state`. If this worker
+        was started without a spaCy language model, the model `language_model` is loaded with options `spacy_opts`.
+        """
+        if self.nlp is None:
+            logger.debug('worker `%s`: loading spaCy language model %s' % (self.name, language_model))
+            self.nlp = spacy.load(language_model, **(spacy_opts or {}))
+            self.tagger = dict(self.nlp.pipeline).get('tagger', None)
+
+        if state_file is not None:
+            logger.debug('worker `%s`: loading binary state from `%s`' % (self.name, state_file))
+            with np.load(state_file, allow_pickle=True) as data:
+                self._load_binary_state_arrays({k: data[k] for k in data.files})
+        else:
+            logger.debug('worker `%s`: loading binary state' % self.name)
+            shm_blocks = []
+            self._load_binary_state_arrays(unpack_result(state, shm_blocks))
+            release_shared_blocks(shm_blocks)
+
+    def _binary_state_arrays(self):
+        """
+        Return the state of this worker as dict of arrays. All documents' data is stored as flat arrays that contain
+        the data of all tokens (including masked tokens) along with the document offsets in these arrays.
+        """
+        n_attrs = len(BINARY_STATE_TOKEN_ATTRS)
+        token_attrs = [doc.to_array(BINARY_STATE_TOKEN_ATTRS) if len(doc) > 0
+                       else np.empty((0, n_attrs), dtype=np.uint64) for doc in self._docs]
+        token_attrs = np.concatenate(token_attrs) if token_attrs else np.empty((0, n_attrs), dtype=np.uint64)
+
+        # strings for all string hashes in the token attributes; lemmata that are not set yet have a hash of 0 and
+        # hence stay unset when loading, so that the tagger can set the POS dependent lemma later
+        string_cols = [BINARY_STATE_TOKEN_ATTRS.index(a) for a in BINARY_STATE_STRING_ATTRS]
+        strings = self.nlp.vocab.strings
+        used_strings = [strings[h] for h in np.unique(token_attrs[:, string_cols]).tolist() if h != 0 and h in strings]
+
+        # tensors are stored flattened along with their shape per document
+        tensors = [doc.tensor for doc in self._docs]
+
+        arrays = {
+            'version': np.array(BINARY_STATE_FORMAT_VERSION),
+            'doc_labels': np.array(self._doc_labels, dtype=str),
+            'doc_offsets': np.cumsum([0] + [len(doc) for doc in self._docs]),
+            'doc_tagged': np.array([doc.is_tagged for doc in self._docs], dtype=bool),
+            'doc_parsed': np.array([doc.is_parsed for doc in self._docs], dtype=bool),
+            'doc_sentiment': np.array([doc.sentiment for doc in self._docs], dtype=float),
+            'doc_cats': _object_array([doc.cats for doc in self._docs]),
+            'tensor_shapes': _object_array([t.shape for t in tensors]),
+            'tensor_data': np.concatenate([t.ravel() for t in tensors]) if tensors else np.array([], dtype=np.float32),
+            'std_attrs': np.array(self._std_attrs, dtype=str),
+            'metadata_attrs': _object_array(self._metadata_attrs),
+            'ngrams': _object_array(self._ngrams),
+            'strings': np.array(used_strings, dtype=str),
+            'token_attrs': token_attrs,
+        }
+
+        columns = {
+            'text': lambda doc: [t.text for t in doc],
+            'whitespace': lambda doc: [bool(t.whitespace_) for t in doc],
+            'tokens': lambda doc: doc.user_data['tokens'],
+            'mask': lambda doc: doc.user_data['mask'],
+        }
+
+        for key in self._metadata_attrs.keys():
+            columns['meta_' + key] = lambda doc, k=key: self._doc_metadata(doc, k)
+
+        for col, col_fn in columns.items():
+            col_data = [np.asarray(col_fn(doc)) for doc in self._docs]
+            arrays['col_' + col] = np.concatenate(col_data) if col_data else np.array([])
+
+        return arrays
+
+    def _load_binary_state_arrays(self, data):
+        """
+        Load the state of this worker from the dict of arrays `data` as returned by :meth:`_binary_state_arrays`. The
+        arrays may be views into a shared memory block, hence no references to them are kept.
+        """
+        version = int(data['version'])
+        if version != BINARY_STATE_FORMAT_VERSION:
+            raise ValueError('unsupported binary state format version %d' % version)
+
+        doc_labels = data['doc_labels'].tolist()
+        offsets = data['doc_offsets']
+        doc_tagged = data['doc_tagged']
+        doc_parsed = data['doc_parsed']
+        doc_sentiment = data['doc_sentiment']
+        doc_cats = data['doc_cats'][0]
+        tensor_shapes = data['tensor_shapes'][0]
+        tensor_data = data['tensor_data']
+        self._std_attrs = data['std_attrs'].tolist()
+        self._metadata_attrs = data['metadata_attrs'][0]
+        self._ngrams = data['ngrams'][0]
+        strings = data['strings'].tolist()
+        token_attrs = data['token_attrs']
+        columns = {k[4:]: v for k, v in data.items() if k.startswith('col_')}
+
+        for s in strings:
+            self.nlp.vocab.strings.add(s)
+
+        attr_cols = {a: i for i, a in enumerate(BINARY_STATE_TOKEN_ATTRS)}
+        tensor_offset = 0
         self._docs = []
-        for doc_bytes in state.pop('docs_bytes'):
-            doc = Doc(self.nlp.vocab).from_bytes(doc_bytes)
+        for i_doc, (dl, begin, end) in enumerate(zip(doc_labels, offsets[:-1], offsets[1:])):
+            doc = Doc(self.nlp.vocab, words=columns['text'][begin:end].tolist(),
+                      spaces=columns['whitespace'][begin:end].tolist())
+            doc._.label = dl
+
+            if end > begin:
+                doc_attrs = token_attrs[begin:end]
+                attrs = [LEMMA, NORM, ENT_IOB, ENT_TYPE, ENT_ID, ENT_KB_ID]
+                # documents that are not POS tagged may have tags set by the tokenizer's special cases
+                if doc_tagged[i_doc] or doc_attrs[:, attr_cols[TAG]].any():
+                    attrs.extend([TAG, POS])
+                if doc_parsed[i_doc]:
+                    attrs.extend([HEAD, DEP])
+                else:
+                    attrs.append(SENT_START)
+                doc.from_array(attrs, doc_attrs[:, [attr_cols[a] for a in attrs]])
+                doc.is_tagged = bool(doc_tagged[i_doc])
 
-            # document tensor array and user_data arrays may only be immutable "views" -> create mutable copies
-            if not doc.tensor.flags.owndata:
-                doc.tensor = doc.tensor.copy()
+            tensor_size = int(np.prod(tensor_shapes[i_doc]))
+            # copy the tensor, because spaCy resizes it in-place when extending it, e.g. on POS tagging
+            doc.tensor = tensor_data[tensor_offset:tensor_offset + tensor_size].reshape(tensor_shapes[i_doc]).copy()
+            tensor_offset += tensor_size
 
-            for k, docdata in doc.user_data.items():
-                if isinstance(docdata, np.ndarray) and not docdata.flags.owndata:
-                    doc.user_data[k] = docdata.copy()
+            doc.sentiment = doc_sentiment[i_doc]
+            doc.cats = doc_cats[i_doc]
 
+            for key in self._metadata_attrs.keys():
+                k = 'meta_' + key
+                doc.user_data[k] = columns[k][begin:end].copy()
+
+            _init_doc(doc, columns['tokens'][begin:end].copy(), columns['mask'][begin:end].astype(bool))
             self._docs.append(doc)
 
-        for attr, val in state.items():
-            setattr(self, attr, val)
+    def _task_get_doc_loads(self):
+        """Put the load of each document, i.e. its number of tokens including masked tokens, in the result queue."""
+        self.results_queue.put({doc._.label: len(doc) for doc in self._docs})
+
+    def _task_pop_docs(self, doc_labels):
+        """
+        Remove the documents with labels `doc_labels` from this worker and put them in the result queue as list of
+        ``(document label, serialized document, document n-grams)`` tuples, so that they can be inserted in another
+        worker via :meth:`_task_insert_docs`.
+        """
+        logger.debug('worker `%s`: popping %d docs' % (self.name, len(doc_labels)))
+
+        doc_labels = set(doc_labels)
+        has_ngrams = isinstance(self._ngrams, list) and len(self._ngrams) == len(self._docs)
+        docs_ngrams = self._ngrams if has_ngrams else [None] * len(self._docs)
+
+        popped = []
+        keep_docs = []
+        keep_ngrams = []
+        for doc, dngrams in zip(self._docs, docs_ngrams):
+            if doc._.label in doc_labels:
+                popped.append((doc._.label, _doc_to_bytes(doc), dngrams))
+            else:
+                keep_docs.append(doc)
+                keep_ngrams.append(dngrams)
+
+        self._docs = keep_docs
+        if has_ngrams:
+            self._ngrams = keep_ngrams
+
+        self.results_queue.put(popped)
+
+    def _task_insert_docs(self, docs_data):
+        """
+        Insert the serialized documents `docs_data` as returned from :meth:`_task_pop_docs` of another worker.
+        """
+        logger.debug('worker `%s`: inserting %d docs' % (self.name, len(docs_data)))
+
+        for _, doc_bytes, dngrams in docs_data:
+            self._docs.append(self._doc_from_bytes(doc_bytes))
+            if isinstance(self._ngrams, list) and dngrams is not None:
+                self._ngrams.append(dngrams)
+
+        self._fill_metadata_columns()
 
     def _task_add_metadata_per_token(self, key, data, default):
         logger.debug('worker `%s`: adding metadata per token' % self.name)
 
         attr_name = 'meta_' + key
-        Token.set_extension(attr_name, default=default)
 
-        for doc in self._docs:
-            for t, tok_text in zip(doc, _filtered_doc_tokens(doc)):
-                setattr(t._, attr_name, data.get(tok_text, default))
+        # look up the metadata value only once for each unique token and map the values back to the documents'
+        # tokens via index arrays
+        if self.use_token_ids:
+            table_values = _metadata_values([data.get(t, default) for t in self._token_table.tolist()])
+            for doc in self._docs:
+                doc.user_data[attr_name] = table_values[doc.user_data['token_ids']]
+        else:
+            docs_tokens = [doc.user_data['tokens'] for doc in self._docs]
+            if docs_tokens:
+                uniq_tokens, ids = np.unique(np.concatenate(docs_tokens), return_inverse=True)
+                uniq_values = _metadata_values([data.get(t, default) for t in uniq_tokens.tolist()])
+                offsets = np.cumsum([len(dtok) for dtok in docs_tokens])[:-1]
+                for doc, doc_ids in zip(self._docs, np.split(ids, offsets)):
+                    doc.user_data[attr_name] = uniq_values[doc_ids]
 
         if key not in self._metadata_attrs.keys():
             self._metadata_attrs[key] = default
@@ -335,14 +1224,12 @@ class PreprocWorker(mp.Process):
         logger.debug('worker `%s`: adding metadata per document' % self.name)
 
         attr_name = 'meta_' + key
-        Token.set_extension(attr_name, default=default)
 
         for doc in self._docs:
-            meta_vals = data.get(doc._.label, [default] * len(doc))
-            assert sum(doc.user_data['mask']) == len(meta_vals)
-            for t, v, m in zip(doc, meta_vals, doc.user_data['mask']):
-                if m:
-                    setattr(t._, attr_name, v)
+            meta_vals = data.get(doc._.label, None)
+            if meta_vals is not None:
+                assert sum(doc.user_data['mask']) == len(meta_vals)
+            doc.user_data[attr_name] = _metadata_column(len(doc), default, meta_vals, doc.user_data['mask'])
 
         if key not in self._metadata_attrs:
             self._metadata_attrs[key] = default
@@ -369,24 +1256,24 @@ class PreprocWorker(mp.Process):
         self._ngrams = {}
 
     def _task_transform_tokens(self, transform_fn, **kwargs):
-        for doc, new_tok in zip(self._docs, transform(self._tokens, transform_fn, **kwargs)):
-            _replace_doc_tokens(doc, new_tok)
+        self._transform_vocab(lambda vocab: transform([vocab], transform_fn, **kwargs)[0])
 
     def _task_tokens_to_lowercase(self):
-        for doc, new_tok in zip(self._docs, to_lowercase(self._tokens)):
-            _replace_doc_tokens(doc, new_tok)
+        self._transform_vocab(lambda vocab: to_lowercase([vocab])[0])
 
     def _task_remove_chars(self, chars):
-        for doc, new_tok in zip(self._docs, remove_chars(self._tokens, chars=chars)):
-            _replace_doc_tokens(doc, new_tok)
+        self._transform_vocab(lambda vocab: remove_chars([vocab], chars=chars)[0])
+
+    def _task_map_tokens(self, mapping):
+        # tokens that are not in `mapping` (e.g. filtered tokens in the token table) stay the same
+        self._transform_vocab(lambda vocab: [mapping.get(t, t) for t in vocab])
 
     def _task_pos_tag(self):
         if 'pos' not in self._std_attrs:
-            for doc in self._docs:
-                # this will be done for all tokens in the document, i.e. also for masked tokens,
-                # unless "compact" is called before
-                if self.tagger is not None:
-                    self.tagger(doc)
+            # this will be done for all tokens in the document, i.e. also for masked tokens,
+            # unless "compact" is called before
+            if self.tagger is not None:
+                self._pipe(self.tagger, self._docs)   # modifies the documents in-place
             self._std_attrs.append('pos')
 
     def _task_lemmatize(self):
@@ -412,6 +1299,8 @@ class PreprocWorker(mp.Process):
     def _task_get_kwic(self, search_tokens, highlight_keyword, with_metadata, with_window_indices, context_size,
                        match_type, ignore_case, glob_method, inverse):
         kwic = _build_kwic(self._docs, search_tokens,
+                           matches=self._token_pattern_matches(search_tokens, match_type=match_type,
+                                                               ignore_case=ignore_case, glob_method=glob_method),
                            highlight_keyword=highlight_keyword,
                            with_metadata=with_metadata,
                            with_window_indices=with_window_indices,
@@ -426,10 +1315,34 @@ class PreprocWorker(mp.Process):
         self.results_queue.put(dict(zip(self._doc_labels, kwic)))
 
     def _task_glue_tokens(self, patterns, glue, match_type, ignore_case, glob_method, inverse):
-        _, glued_tokens = glue_tokens(self._docs, patterns,
-                                      glue=glue, match_type=match_type, ignore_case=ignore_case,
-                                      glob_method=glob_method, inverse=inverse,
-                                      return_glued_tokens=True)
+        if self._use_token_index and not inverse:
+            # only documents with matches for all patterns can contain subsequent matches
+            candidates = np.repeat(True, len(self._docs))
+            for pat in patterns:
+                pat_matches = self._token_pattern_matches(pat, match_type=match_type, ignore_case=ignore_case,
+                                                          glob_method=glob_method)
+                candidates &= np.array([m.any() for m in pat_matches], dtype=bool)
+        else:
+            candidates = np.repeat(True, len(self._docs))
+
+        glued_docs, glued_tokens = glue_tokens([doc for doc, c in zip(self._docs, candidates) if c], patterns,
+                                               glue=glue, match_type=match_type, ignore_case=ignore_case,
+                                               glob_method=glob_method, inverse=inverse,
+                                               return_glued_tokens=True)
+
+        glued_docs = iter(glued_docs)
+        self._docs = [next(glued_docs) if c else doc for doc, c in zip(self._docs, candidates)]
+        self._token_index = None    # tokens changed
+
+        # do reset because meta data doesn't match any more:
+        self._clear_metadata()
+
+        # result is a set of glued tokens
+        self.results_queue.put(glued_tokens)
+
+    def _task_glue_phrases(self, phrases, glue, ignore_case):
+        self._docs, glued_tokens = glue_phrases(self._docs, phrases, glue=glue, ignore_case=ignore_case,
+                                                return_glued_tokens=True)
 
         # do reset because meta data doesn't match any more:
         self._clear_metadata()
@@ -438,7 +1351,10 @@ class PreprocWorker(mp.Process):
         self.results_queue.put(glued_tokens)
 
     def _task_compact_documents(self):
-        self._docs = compact_documents(self._docs)
+        self._compact_docs()
+
+    def _task_get_compaction_stats(self):
+        self.results_queue.put(dict(self._compaction_stats))
 
     def _task_filter_tokens_by_mask(self, mask, inverse):
         mask_list = [mask[dl] for dl in self._doc_labels]
@@ -446,28 +1362,33 @@ class PreprocWorker(mp.Process):
 
     def _task_filter_tokens(self, search_tokens, match_type, ignore_case, glob_method, inverse, by_meta):
         if by_meta:
-            by_meta = 'meta_' + by_meta
-
-        filter_tokens(self._docs, search_tokens, match_type=match_type, ignore_case=ignore_case,
-                      glob_method=glob_method, inverse=inverse, by_meta=by_meta)
+            filter_tokens(self._docs, search_tokens, match_type=match_type, ignore_case=ignore_case,
+                          glob_method=glob_method, inverse=inverse, by_meta='meta_' + by_meta)
+        else:
+            matches = self._token_pattern_matches(search_tokens, match_type=match_type, ignore_case=ignore_case,
+                                                  glob_method=glob_method)
+            filter_tokens_by_mask(self._docs, matches, inverse=inverse)
 
     def _task_filter_tokens_with_kwic(self, search_tokens, context_size, match_type, ignore_case,
                                       glob_method, inverse):
-        filter_tokens_with_kwic(self._docs, search_tokens,
-                                context_size=context_size, match_type=match_type,
-                                ignore_case=ignore_case, glob_method=glob_method,
-                                inverse=inverse)
+        filter_tokens_with_kwic(self._docs, search_tokens, context_size=context_size, match_type=match_type,
+                                ignore_case=ignore_case, glob_method=glob_method, inverse=inverse,
+                                matches=self._token_pattern_matches(search_tokens, match_type=match_type,
+                                                                    ignore_case=ignore_case, glob_method=glob_method))
 
     def _task_filter_documents(self, search_tokens, by_meta, matches_threshold, match_type, ignore_case, glob_method,
                                inverse_result, inverse_matches):
         if by_meta:
-            by_meta = 'meta_' + by_meta
-
-        self._docs = filter_documents(
-            self._docs, search_tokens, by_meta=by_meta,
-            matches_threshold=matches_threshold, match_type=match_type, ignore_case=ignore_case,
-            glob_method=glob_method, inverse_result=inverse_result, inverse_matches=inverse_matches
-        )
+            self._docs = filter_documents(
+                self._docs, search_tokens, by_meta='meta_' + by_meta,
+                matches_threshold=matches_threshold, match_type=match_type, ignore_case=ignore_case,
+                glob_method=glob_method, inverse_result=inverse_result, inverse_matches=inverse_matches
+            )
+        else:
+            matches = self._token_pattern_matches(search_tokens, match_type=match_type, ignore_case=ignore_case,
+                                                  glob_method=glob_method)
+            self._docs = _filter_documents_by_matches(self._docs, matches, matches_threshold=matches_threshold,
+                                                      inverse_result=inverse_result, inverse_matches=inverse_matches)
 
     def _task_filter_documents_by_name(self, name_patterns, match_type, ignore_case, glob_method, inverse):
         self._docs = filter_documents_by_name(self._docs, name_patterns, match_type=match_type,
@@ -476,10 +1397,115 @@ class PreprocWorker(mp.Process):
     def _task_filter_for_pos(self, required_pos, simplify_pos, inverse):
         self._docs = filter_for_pos(self._docs, required_pos=required_pos, simplify_pos=simplify_pos, inverse=inverse)
 
-    def _init_docs(self, doc_labels):
-        for doc in self._docs:
-            _init_doc(doc)
+    def _doc_from_bytes(self, doc_bytes):
+        return _doc_from_bytes(self.nlp.vocab, doc_bytes)
+
+    def _init_docs(self, doc_labels, docs_tokens=None):
+        if docs_tokens is None:
+            docs_tokens = [None] * len(self._docs)
+
+        for doc, tokens in zip(self._docs, docs_tokens):
+            _init_doc(doc, tokens)
 
         assert len(doc_labels) == len(self._docs)
         for dl, doc in zip(doc_labels, self._docs):
             doc._.label = dl
+
+
+def _empty_compaction_stats():
+    return {'n_compactions': 0, 'n_tokens_removed': 0, 'bytes_reclaimed': 0}
+
+
+def _doc_nbytes(doc):
+    """Number of bytes used by the NumPy arrays of `doc`, i.e. its ``user_data`` arrays and its tensor."""
+    return doc.tensor.nbytes + sum(v.nbytes for v in doc.user_data.values() if isinstance(v, np.ndarray))
+
+
+def _object_array(obj):
+    """Wrap the arbitrary Python object `obj` in a single element NumPy object array."""
+    arr = np.empty(1, dtype=object)
+    arr[0] = obj
+    return arr
+
+
+def _metadata_column(n, default, values=None, mask=None):
+    """
+    Create a metadata column of length `n` with all elements set to `default`. If `values` is given, set these values
+    at the positions where the boolean array `mask` is True.
+    """
+    default_arr = _metadata_values([default])
+    if values is not None and len(values) > 0:
+        values = _metadata_values(values)
+        if values.dtype.kind == default_arr.dtype.kind or \
+                (values.dtype.kind in 'biuf' and default_arr.dtype.kind in 'biuf'):
+            dtype = np.result_type(values, default_arr)
+        else:
+            dtype = object
+    else:
+        dtype = default_arr.dtype
+
+    col = np.empty(n, dtype=dtype)
+    col[:] = default_arr[0]
+    if values is not None:
+        col[mask] = values
+
+    return col
+
+
+def _concat_ids(arrays):
+    """Concatenate the integer arrays in `arrays`; return an empty integer array if `arrays` is empty."""
+    if arrays:
+        return np.concatenate(arrays)
+    else:
+        return np.array([], dtype=np.intc)
+
+
+class _TaskResults:
+    """
+    Stand-in for the results queue that puts each result as tuple ``(task ID, worker ID, result)`` into the actual
+    results queue so that the results can be correlated with the task that produced them.
+    """
+    def __init__(self, queue, task_id, worker_id):
+        self.queue = queue
+        self.task_id = task_id
+        self.worker_id = worker_id
+
+    def put(self, obj):
+        self.queue.put((self.task_id, self.worker_id, obj))
+
+
+class _ProfiledTaskResults(_TaskResults):
+    """
+    Stand-in for the results queue used when profiling is enabled: each result is pickled before it is put into the
+    actual results queue in order to measure the serialization time and the size of the serialized result.
+    """
+    def __init__(self, queue, task_id, worker_id):
+        super().__init__(queue, task_id, worker_id)
+        self.serialize_time = 0.0
+        self.n_results = 0
+        self.result_bytes = 0
+
+    def put(self, obj):
+        t_start = time.perf_counter()
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        self.serialize_time += time.perf_counter() - t_start
+        self.n_results += 1
+        self.result_bytes += len(data)
+
+        super().put(SerializedResult(data))
+
+
+class SerializedResult:
+    """A task result that was already pickled by the worker process."""
+    def __init__(self, data):
+        self.data = data
+
+    def load(self):
+        """Unpickle and return the result."""
+        return pickle.loads(self.data)
+
+
+class _DiscardedResults:
+    """Stand-in for the results queue that discards all results put into it."""
+    def put(self, obj):
+        pass
@@ -0,0 +1,226 @@
+"""
+Transfer of NumPy arrays from :class:`~tmtoolkit.preprocess.TMPreproc` worker processes to the main process via shared
+memory blocks.
+
+Instead of pickling a result that contains (potentially many and large) NumPy arrays and sending it through the results
+queue, a worker copies all arrays of the result into a single shared memory block and only sends a small descriptor
+object. The main process maps the block and recreates the arrays as views into the shared memory, i.e. without copying
+the data again.
+
+Requires Python 3.8 or newer, since it uses the :mod:`multiprocessing.shared_memory` module.
+"""
+
+import os
+import logging
+
+import numpy as np
+from scipy.sparse import coo_matrix, isspmatrix_coo
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:   # Python < 3.8
+    SHARED_MEMORY_AVAILABLE = False
+
+
+logger = logging.getLogger('tmtoolkit')
+logger.addHandler(logging.NullHandler())
+
+#: byte alignment of arrays inside a shared memory block
+ARRAY_ALIGNMENT = 64
+
+
+class SharedArraysResult:
+    """
+    Descriptor for a worker result whose NumPy arrays were copied to the shared memory block `shm_name`. `structure`
+    is the original result in which the arrays were replaced by references into the shared memory block.
+    """
+    __slots__ = ('shm_name', 'structure')
+
+    def __init__(self, shm_name, structure):
+        self.shm_name = shm_name
+        self.structure = structure
+
+    def __reduce__(self):
+        return SharedArraysResult, (self.shm_name, self.structure)
+
+
+class _SharedArrayRef:
+    """Reference to an array with dtype `dtype` and shape `shape` at byte offset `offset` in a shared memory block."""
+    __slots__ = ('offset', 'dtype', 'shape')
+
+    def __init__(self, offset, dtype, shape):
+        self.offset = offset
+        self.dtype = dtype
+        self.shape = shape
+
+    def __reduce__(self):
+        return _SharedArrayRef, (self.offset, self.dtype, self.shape)
+
+
+class _SharedCOORef:
+    """Reference to a sparse matrix in COO format whose data and index arrays are stored in a shared memory block."""
+    __slots__ = ('data', 'row', 'col', 'shape')
+
+    def __init__(self, data, row, col, shape):
+        self.data = data
+        self.row = row
+        self.col = col
+        self.shape = shape
+
+    def __reduce__(self):
+        return _SharedCOORef, (self.data, self.row, self.col, self.shape)
+
+
+def pack_result(res):
+    """
+    Copy all NumPy arrays (and sparse matrices in COO format) inside the result `res` to a new shared memory block and
+    return a :class:`SharedArraysResult` descriptor for it. `res` may be an array or a nested structure of dicts,
+    lists and tuples. Arrays of dtype "object" are not copied to shared memory and remain in the descriptor. If `res`
+    does not contain any arrays, it is returned as-is.
+
+    Ownership of the shared memory block passes to the process that calls :func:`unpack_result` on the descriptor.
+
+    :param res: worker result
+    :return: :class:`SharedArraysResult` descriptor or `res` if it doesn't contain any arrays
+    """
+    if not SHARED_MEMORY_AVAILABLE:
+        raise RuntimeError('shared memory transport requires Python 3.8 or newer')
+
+    arrays = []
+    structure, size = _replace_arrays(res, arrays, 0)
+
+    if not arrays:
+        return res
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    for ref, arr in arrays:
+        np.ndarray(ref.shape, dtype=ref.dtype, buffer=shm.buf, offset=ref.offset)[...] = arr
+
+    # the receiving process unlinks the block after mapping it, hence this process must not track it any more
+    _untrack_shared_block(shm.name)
+    shm.close()
+
+    return SharedArraysResult(shm.name, structure)
+
+
+def unpack_result(res, shm_blocks):
+    """
+    If `res` is a :class:`SharedArraysResult` descriptor, map its shared memory block and return the original result
+    structure with NumPy array views into the shared memory block. Otherwise return `res` as-is.
+
+    The block is unlinked right away, so that its memory is released by the operating system as soon as it is not
+    mapped by any process any more. The block handle is appended to `shm_blocks`; it must be kept until the views are
+    not used any more and can then be released with :func:`release_shared_blocks`.
+
+    :param res: worker result, possibly a :class:`SharedArraysResult` descriptor
+    :param shm_blocks: list of block handles to which the mapped block is appended
+    :return: result with NumPy arrays
+    """
+    if not isinstance(res, SharedArraysResult):
+        return res
+
+    shm = shared_memory.SharedMemory(name=res.shm_name)
+    shm.unlink()
+    shm_blocks.append(shm)
+
+    return _restore_arrays(res.structure, shm.buf)
+
+
+def discard_result(res):
+    """
+    If `res` is a :class:`SharedArraysResult` descriptor, unlink its shared memory block without mapping its arrays.
+    This must be done for all results that are not passed to :func:`unpack_result`, e.g. discarded results of aborted
+    tasks, because the receiving process owns the shared memory block.
+
+    :param res: worker result, possibly a :class:`SharedArraysResult` descriptor
+    """
+    if not isinstance(res, SharedArraysResult):
+        return
+
+    try:
+        shm = shared_memory.SharedMemory(name=res.shm_name)
+    except FileNotFoundError:   # already unlinked
+        return
+
+    shm.unlink()
+    shm.close()
+
+
+def release_shared_blocks(shm_blocks):
+    """
+    Try to close all shared memory block handles in `shm_blocks`. Blocks that still have array views pointing into them
+    cannot be closed yet.
+
+    :param shm_blocks: list of block handles as filled by :func:`unpack_result`
+    :return: list of block handles that could not be closed yet
+    """
+    in_use = []
+    for shm in shm_blocks:
+        try:
+            shm.close()
+        except BufferError:   # there are still views into this block
+            in_use.append(shm)
+
+    if in_use:
+        logger.debug('%d shared memory blocks are still in use and cannot be released yet' % len(in_use))
+
+    return in_use
+
+
+def _untrack_shared_block(name):
+    """
+    Unregister the shared memory block `name` from the resource tracker of this process. On POSIX systems, blocks are
+    registered under their name with a leading slash; on other systems, blocks are not tracked.
+    """
+    if os.name == 'posix':
+        resource_tracker.unregister('/' + name, 'shared_memory')
+
+
+def _replace_arrays(x, arrays, offset):
+    """
+    Recursively replace NumPy arrays and COO sparse matrices in `x` by references into a shared memory block, starting
+    at byte offset `offset`. Append the replaced arrays along with their reference to `arrays`. Return a tuple with
+    the replaced structure and the next free byte offset.
+    """
+    if isinstance(x, np.ndarray) and not x.dtype.hasobject:
+        ref = _SharedArrayRef(offset, x.dtype.str, x.shape)
+        arrays.append((ref, x))
+        return ref, offset + -(-x.nbytes // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+    elif isspmatrix_coo(x):
+        data, offset = _replace_arrays(x.data, arrays, offset)
+        row, offset = _replace_arrays(x.row, arrays, offset)
+        col, offset = _replace_arrays(x.col, arrays, offset)
+        return _SharedCOORef(data, row, col, x.shape), offset
+    elif type(x) is dict:
+        res = {}
+        for k, v in x.items():
+            res[k], offset = _replace_arrays(v, arrays, offset)
+        return res, offset
+    elif type(x) in (list, tuple):
+        res = []
+        for v in x:
+            v, offset = _replace_arrays(v, arrays, offset)
+            res.append(v)
+        return type(x)(res), offset
+    else:
+        return x, offset
+
+
+def _restore_arrays(x, buf):
+    """
+    Recursively replace references in `x` by NumPy array views into the shared memory buffer `buf`. Inverse of
+    :func:`_replace_arrays`.
+    """
+    if isinstance(x, _SharedArrayRef):
+        return np.ndarray(x.shape, dtype=x.dtype, buffer=buf, offset=x.offset)
+    elif isinstance(x, _SharedCOORef):
+        return coo_matrix((_restore_arrays(x.data, buf), (_restore_arrays(x.row, buf), _restore_arrays(x.col, buf))),
+                          shape=x.shape, copy=False)
+    elif type(x) is dict:
+        return {k: _restore_arrays(v, buf) for k, v in x.items()}
+    elif type(x) in (list, tuple):
+        return type(x)(_restore_arrays(v, buf) for v in x)
+    else:
+        return x
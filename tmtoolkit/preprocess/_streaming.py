@@ -0,0 +1,190 @@
+"""
+Out-of-core storage for documents processed in chunks via :meth:`~tmtoolkit.preprocess.TMPreproc.process_stream`.
+
+Each processed chunk of documents is "spilled" to disk as NumPy ``.npz`` file in a columnar format: all tokens of all
+documents in a chunk are stored as one flat array per column (``token``, ``lemma``, ``pos``, ``whitespace`` and
+``meta_...`` columns) together with the document labels and the offsets of the documents in these flat arrays.
+"""
+
+import os
+import logging
+
+import numpy as np
+from scipy.sparse import vstack, csr_matrix
+
+from ._docfuncs import sparse_dtm
+
+
+logger = logging.getLogger('tmtoolkit')
+logger.addHandler(logging.NullHandler())
+
+#: prefix for the token data columns stored in a chunk file
+CHUNK_COLUMN_PREFIX = 'col_'
+
+
+class SpilledCorpus:
+    """
+    Processed documents that were spilled to disk in chunks by
+    :meth:`~tmtoolkit.preprocess.TMPreproc.process_stream`. Only a single chunk is loaded into memory at a time.
+    """
+
+    def __init__(self, chunk_files):
+        """
+        Create a spilled corpus from a sequence of chunk files.
+
+        :param chunk_files: sequence of paths to chunk files as written by :func:`spill_chunk`
+        """
+        self.chunk_files = list(chunk_files)
+        self._cur_doc_labels = None
+        self._cur_vocab = None
+
+    def __len__(self):
+        return self.n_docs
+
+    def __repr__(self):
+        return '<SpilledCorpus [%d chunks]>' % len(self.chunk_files)
+
+    @property
+    def n_docs(self):
+        """Number of documents."""
+        return len(self.doc_labels)
+
+    @property
+    def doc_labels(self):
+        """Document labels as list in the order in which the documents were processed."""
+        if self._cur_doc_labels is None:
+            self._cur_doc_labels = []
+            for chunk_file in self.chunk_files:
+                with np.load(chunk_file) as chunk:
+                    self._cur_doc_labels.extend(chunk['doc_labels'].tolist())
+
+        return self._cur_doc_labels
+
+    @property
+    def vocabulary(self):
+        """Sorted list of unique tokens across all documents."""
+        if self._cur_vocab is None:
+            vocab = set()
+            for chunk_file in self.chunk_files:
+                with np.load(chunk_file) as chunk:
+                    vocab.update(np.unique(chunk[CHUNK_COLUMN_PREFIX + 'token']).tolist())
+            self._cur_vocab = sorted(vocab)
+
+        return self._cur_vocab
+
+    def iter_chunks(self, with_metadata=True):
+        """
+        Iterate through the chunks. Each chunk is a dict with mapping document label to document tokens. If
+        `with_metadata` is True, the document tokens are dicts with mapping column name (e.g. ``"token"``, ``"pos"``,
+        etc.) to NumPy array, otherwise they are only NumPy arrays of the tokens.
+
+        :param with_metadata: add meta data to results (e.g. POS tags)
+        :return: generator of chunks
+        """
+        for chunk_file in self.chunk_files:
+            yield _load_chunk(chunk_file, with_metadata=with_metadata)
+
+    def iter_tokens(self, with_metadata=False):
+        """
+        Iterate through all documents as tuples ``(document label, document tokens)``.
+
+        .. seealso:: :meth:`~SpilledCorpus.iter_chunks` for the format of the document tokens
+
+        :param with_metadata: add meta data to results (e.g. POS tags)
+        :return: generator of ``(document label, document tokens)`` tuples
+        """
+        for chunk in self.iter_chunks(with_metadata=with_metadata):
+            yield from chunk.items()
+
+    def get_dtm(self, dtype=None):
+        """
+        Generate a sparse document-term-matrix (DTM) with rows representing documents according to
+        :attr:`~SpilledCorpus.doc_labels` and columns representing tokens according to
+        :attr:`~SpilledCorpus.vocabulary`. The DTM is built incrementally from each chunk.
+
+        :param dtype: optionally specify a DTM data type; by default it is 32bit integer
+        :return: sparse document-term-matrix in CSR format
+        """
+        vocab = self.vocabulary
+        if not vocab:
+            return csr_matrix((self.n_docs, 0), dtype=dtype)
+
+        vocab = np.array(vocab)
+        chunk_dtms = []
+        for chunk in self.iter_chunks(with_metadata=False):
+            if chunk:
+                chunk_dtms.append(sparse_dtm(list(chunk.values()), vocab=vocab).tocsr())
+
+        dtm = vstack(chunk_dtms, format='csr')
+
+        if dtype is not None:
+            dtm = dtm.astype(dtype)
+
+        return dtm
+
+    def remove_files(self):
+        """
+        Remove all chunk files from disk.
+
+        :return: this instance
+        """
+        for chunk_file in self.chunk_files:
+            if os.path.exists(chunk_file):
+                os.remove(chunk_file)
+
+        self.chunk_files = []
+        self._cur_doc_labels = None
+        self._cur_vocab = None
+
+        return self
+
+
+def spill_chunk(tokens, chunk_file):
+    """
+    Write the tokens `tokens` of a chunk of documents to `chunk_file` in columnar format.
+
+    :param tokens: dict with mapping document label to dict of columns as returned by
+                   :meth:`~tmtoolkit.preprocess.TMPreproc.get_tokens` with ``arrays_to_lists=False``
+    :param chunk_file: path to target ``.npz`` file
+    :return: `chunk_file`
+    """
+    doc_labels = list(tokens.keys())
+    docs = list(tokens.values())
+
+    columns = {}
+    if docs:
+        for col in docs[0].keys():
+            columns[CHUNK_COLUMN_PREFIX + col] = np.concatenate([np.asarray(doc[col]) for doc in docs])
+    else:
+        columns[CHUNK_COLUMN_PREFIX + 'token'] = np.array([], dtype=str)
+
+    logger.debug('spilling chunk with %d documents to `%s`' % (len(doc_labels), chunk_file))
+
+    np.savez(chunk_file,
+             doc_labels=np.array(doc_labels, dtype=str),
+             doc_offsets=np.cumsum([0] + [len(doc['token']) for doc in docs]),
+             **columns)
+
+    return chunk_file
+
+
+def _load_chunk(chunk_file, with_metadata):
+    with np.load(chunk_file, allow_pickle=True) as chunk:
+        doc_labels = chunk['doc_labels'].tolist()
+        offsets = chunk['doc_offsets']
+
+        if with_metadata:
+            columns = {k[len(CHUNK_COLUMN_PREFIX):]: chunk[k] for k in chunk.files
+                       if k.startswith(CHUNK_COLUMN_PREFIX)}
+        else:
+            columns = {'token': chunk[CHUNK_COLUMN_PREFIX + 'token']}
+
+    res = {}
+    for i, dl in enumerate(doc_labels):
+        begin, end = offsets[i], offsets[i+1]
+        if with_metadata:
+            res[dl] = {col: arr[begin:end] for col, arr in columns.items()}
+        else:
+            res[dl] = columns['token'][begin:end]
+
+    return res
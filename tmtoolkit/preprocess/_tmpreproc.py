@@ -9,8 +9,16 @@ sequential processing with the functional API.
 import os
 import string
 import multiprocessing as mp
+import threading
 import atexit
+import pickle
+import queue
+import shutil
+import tempfile
+import time
 from collections import Counter, defaultdict, OrderedDict
+from itertools import islice, count
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 import logging
 
@@ -19,16 +27,23 @@ import spacy
 from scipy.sparse import csr_matrix
 
 from .._pd_dt_compat import USE_DT, FRAME_TYPE, pd_dt_frame, pd_dt_concat, pd_dt_sort, pd_dt_colnames,\
-    pd_dt_frame_to_list
+    pd_dt_frame_to_arrays
 from ..bow.dtm import dtm_to_datatable, dtm_to_dataframe
 from ..utils import require_listlike, require_listlike_or_set, require_dictlike, pickle_data, unpickle_file,\
-    greedy_partitioning, flatten_list, combine_sparse_matrices_columnwise
-from ._preprocworker import PreprocWorker
+    greedy_partitioning, flatten_list
+from ._preprocworker import PreprocWorker, SerializedResult, BINARY_STATE_FORMAT_VERSION, READ_ONLY_TASKS
+from ._pipeline import PreprocPipeline, REPLAYABLE_TASKS, TASKS_WITH_RESULTS, FUSABLE_TASKS,\
+    FUSABLE_TASKS_METADATA_KEYS
+from ._streaming import SpilledCorpus, spill_chunk
+from ._workerpool import PreprocWorkerPool
+from ._distributed import DistributedWorkerPool
+from ._sharedmem import SHARED_MEMORY_AVAILABLE, unpack_result, discard_result, release_shared_blocks
 from ._common import DEFAULT_LANGUAGE_MODELS, LANGUAGE_LABELS, load_stopwords
 from ._docfuncs import (
     doc_lengths, remove_tokens_by_doc_frequency,
     _finalize_kwic_results, _datatable_from_kwic_results,
 )
+from ._tokenfuncs import _phrase_trie
 
 logger = logging.getLogger('tmtoolkit')
 logger.addHandler(logging.NullHandler())
@@ -38,12 +53,50 @@ DATAPATH = os.path.join(MODULE_PATH, '..', 'data')
 
 exiting = False
 
+_task_ids = count()   # generates IDs for the tasks sent to the workers; results are tagged with these IDs
+
+#: columns of :meth:`TMPreproc.profile_report` with ``per_worker=True``
+PROFILE_COLUMNS = ('task_id', 'task', 'worker', 'n_docs', 'n_tokens', 'compute_time', 'serialize_time',
+                   'result_bytes', 'deserialize_time', 'wall_time', 'wait_time')
+
+#: interval in seconds in which the worker processes are checked for being alive while waiting for them to finish a
+#: task when checkpointing is enabled
+WORKER_POLL_INTERVAL = 1.0
+
+#: time in seconds that a worker process that is about to be restored is given to exit by itself before it is terminated
+WORKER_EXIT_TIMEOUT = 10.0
+
+
 
 def _set_exiting():
     global exiting
     exiting = True
 
 
+class WorkerTaskError(RuntimeError):
+    """
+    Raised when a task failed on at least one worker process of a :class:`TMPreproc` instance with checkpointing
+    enabled. The worker processes were restored to their state before the task, so the instance can still be used.
+    """
+
+    def __init__(self, task, failures):
+        """
+        :param task: name of the failed task
+        :param failures: dict with mapping worker ID to dict with error message ``"error"`` and the label of the
+                         document that caused the error ``"doc_label"`` (None if it could not be determined)
+        """
+        self.task = task
+        self.failures = failures
+        self.doc_labels = sorted(f['doc_label'] for f in failures.values() if f['doc_label'] is not None)
+
+        msgs = []
+        for i_worker, f in sorted(failures.items(), key=lambda x: x[0]):
+            doc_info = ' at document `%s`' % f['doc_label'] if f['doc_label'] is not None else ''
+            msgs.append('worker #%d%s: %s' % (i_worker, doc_info, f['error']))
+
+        super().__init__('task `%s` failed on %d worker(s): %s' % (task, len(failures), '; '.join(msgs)))
+
+
 class TMPreproc:
     """
     TMPreproc implements a class for parallel text processing. The API implements a state machine, i.e. you create a
@@ -51,7 +104,10 @@ class TMPreproc:
     """
 
     def __init__(self, docs, language=None, language_model=None, n_max_processes=None,
-                 stopwords=None, special_chars=None, enable_vectors=False, spacy_opts=None, loading_from_state=False):
+                 stopwords=None, special_chars=None, enable_vectors=False, spacy_opts=None, use_shared_memory=False,
+                 use_token_ids=False, lazy=False, rebalance_threshold=None, pool=None, profile=False,
+                 batch_size=None, threads_per_worker=1, compact_threshold=None, checkpoint_interval=None,
+                 checkpoint_dir=None, use_token_index=False, loading_from_state=False):
         """
         Create a parallel text processing instance by passing a dictionary of raw texts `docs` with document label
         to document text mapping. You can pass a :class:`~tmtoolkit.corpus.Corpus` instance because it implements the
@@ -70,7 +126,56 @@ class TMPreproc:
                                this will be more computationally expensive; note that you will have to install the
                                respective medium or large spaCy language models beforehand
         :param spacy_opts: keyword arguments passed to spaCy's ``spacy.load()`` function
-        """
+        :param use_shared_memory: if True, workers pass the NumPy arrays of large results (tokens, DTM, vectors) to
+                                  this process via shared memory blocks instead of pickling them through the results
+                                  queue; requires Python 3.8 or newer
+        :param use_token_ids: if True, workers store the documents' tokens as integer IDs into a per-worker table of
+                              unique token strings; this reduces memory usage and makes token transformations like
+                              :meth:`~TMPreproc.tokens_to_lowercase` and vocabulary-related computations much faster
+                              for large corpora
+        :param lazy: if True, token-wise processing steps like :meth:`~TMPreproc.tokens_to_lowercase` or
+                     :meth:`~TMPreproc.clean_tokens` are only recorded; they're sent to the workers at once when the
+                     results are requested (e.g. via :attr:`~TMPreproc.tokens` or :attr:`~TMPreproc.dtm`) as a
+                     single task, which each worker runs step by step on all of its documents
+        :param rebalance_threshold: if not None, automatically call :meth:`~TMPreproc.rebalance_workers` with this
+                                    threshold before computationally expensive steps such as
+                                    :meth:`~TMPreproc.pos_tag` or :meth:`~TMPreproc.lemmatize`
+        :param pool: optional :class:`~tmtoolkit.preprocess.PreprocWorkerPool` instance; if given, no new worker
+                     processes are started, but the documents are distributed on the pool's already running worker
+                     processes that use the pool's preloaded language model; `language` and `language_model` default
+                     to the pool's language model and `n_max_processes` is ignored; the documents are removed from the
+                     pool's workers on :meth:`~TMPreproc.shutdown_workers`
+        :param profile: if True, record timings and result sizes for each task run on the workers; see
+                        :meth:`~TMPreproc.profile_report` and :meth:`~TMPreproc.set_profiling`
+        :param batch_size: number of documents that the workers pass at once to spaCy's language model or POS tagger
+                           when tokenizing documents or POS tagging; if None, use spaCy's default batch sizes
+        :param threads_per_worker: number of threads each worker uses for tokenizing documents or POS tagging; only
+                                   use values greater than 1 for language models whose operations release the GIL
+        :param compact_threshold: if not None, workers automatically compact their documents (see
+                                  :meth:`~TMPreproc.compact_documents`) after filtering tokens when the fraction of
+                                  filtered tokens in their documents exceeds this threshold; must be in range [0, 1]
+        :param checkpoint_interval: if not None, enable fault-tolerant workers: each worker process saves a checkpoint
+                                    of its documents after every `checkpoint_interval` tasks that modify the
+                                    documents; a worker process that fails or dies is restarted from its last
+                                    checkpoint and the tasks since then are replayed; if a task fails because of an
+                                    error in a document, all workers are restored to their state before the task and a
+                                    :class:`~tmtoolkit.preprocess.WorkerTaskError` is raised that reports the document
+                                    label; not supported when attached to a worker pool
+        :param checkpoint_dir: directory in which a temporary directory for the checkpoint files is created; if None,
+                               use the system's default location for temporary files
+        :param use_token_index: if True, each worker maintains a positional inverted index of its documents' tokens
+                                which is built on the first search; token patterns are then matched only once against
+                                the unique tokens instead of against every token of every document, which makes
+                                repeated searches via :meth:`~TMPreproc.get_kwic`, :meth:`~TMPreproc.filter_tokens`,
+                                :meth:`~TMPreproc.filter_tokens_with_kwic`, :meth:`~TMPreproc.filter_documents` and
+                                :meth:`~TMPreproc.glue_tokens` much faster for large corpora; the index stays valid
+                                when tokens or documents are filtered or tokens are transformed
+        """
+
+        # attributes used by shutdown_workers(), which is also called via __del__() if this method raises an exception
+        self._executor = None         # thread executor for methods run via submit()
+        self.pool = None
+        self.shutdown_event = None
 
         if docs is not None:
             require_dictlike(docs)
@@ -80,22 +185,79 @@ class TMPreproc:
             if not isinstance(language, str) or len(language) != 2:
                 raise ValueError('`language` must be a two-letter ISO 639-1 language code')
 
-        self.n_max_workers = n_max_processes or mp.cpu_count()
-        if self.n_max_workers < 1:
-            raise ValueError('`n_max_processes` must be at least 1')
+        if pool is not None:
+            if not isinstance(pool, PreprocWorkerPool):
+                raise ValueError('`pool` must be a PreprocWorkerPool instance')
+
+            if language is None and language_model is None:
+                language_model = pool.language_model
+
+            self.n_max_workers = pool.n_workers
+
+            if checkpoint_interval is not None:
+                raise ValueError('checkpointing is not supported when attached to a worker pool')
+        else:
+            self.n_max_workers = n_max_processes or mp.cpu_count()
+            if self.n_max_workers < 1:
+                raise ValueError('`n_max_processes` must be at least 1')
 
         logger.info('init with max. %d workers' % self.n_max_workers)
 
+        if use_shared_memory and not SHARED_MEMORY_AVAILABLE:
+            raise RuntimeError('`use_shared_memory` requires Python 3.8 or newer')
+
+        if batch_size is not None and batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1')
+
+        if threads_per_worker < 1:
+            raise ValueError('`threads_per_worker` must be at least 1')
+
+        if compact_threshold is not None and not 0 <= compact_threshold <= 1:
+            raise ValueError('`compact_threshold` must be in range [0, 1]')
+
+        if checkpoint_interval is not None and checkpoint_interval < 1:
+            raise ValueError('`checkpoint_interval` must be at least 1')
+
         self.vectors_enabled = enable_vectors
+        self.use_shared_memory = use_shared_memory
+        self.use_token_ids = use_token_ids
+        self.use_token_index = use_token_index
+        self.lazy = lazy
+        self.rebalance_threshold = rebalance_threshold
+        self.batch_size = batch_size
+        self.threads_per_worker = threads_per_worker
+        self.compact_threshold = compact_threshold
+        self.checkpoint_interval = checkpoint_interval
+
+        self.pool = pool
+        self._pool_session = None     # session ID on the pool's workers when attached to a worker pool
+        # lock that is held while sending tasks and collecting their results; shared by all instances attached to
+        # the same worker pool as they share the same queues
+        self._lock = pool.lock if pool is not None else threading.RLock()
+        self._profile = profile
+        self._profile_records = []    # per-worker profiles of finished tasks
+        self._profile_pending = {}    # task ID -> profile data of a task that is not finished yet
+        self._profile_callbacks = []
+        self._checkpoint_base_dir = checkpoint_dir
+        self._checkpoint_dir = None   # directory with the workers' checkpoint files when checkpointing is enabled
+        self._task_logs = []          # for each worker: tasks sent since its last checkpoint
+        self._n_tasks_since_checkpoint = 0
+        self._stale_task_ids = set()  # IDs of tasks whose results are discarded (e.g. replayed tasks)
 
         self.print_summary_default_max_documents = 10
         self.print_summary_default_max_tokens_string_length = 50
         self.tasks_queues = None
-        self.results_queue = None
+        self.results_queues = None
+        self.profile_queues = None
+        self.status_queues = None
         self.shutdown_event = None
         self.worker_error_event = None
         self.workers = []
         self.docs2workers = {}
+        self.docs_weights = {}        # document label -> weight used for distributing documents across workers
+        self.pipeline = PreprocPipeline()   # recorded steps of tasks in REPLAYABLE_TASKS
+        self._pending_tasks = []      # tasks in FUSABLE_TASKS that are not yet sent to the workers in lazy mode
+        self._rebalance_pending = False   # rebalance the workers before running the pending tasks in lazy mode
         self.n_workers = 0
         self._cur_doc_labels = None
         self._cur_metadata_keys = None
@@ -108,6 +270,7 @@ class TMPreproc:
         self._cur_workers_ngrams = None
         self._cur_vocab_counts = None
         self._cur_dtm = None
+        self._shm_blocks = []         # mapped shared memory blocks that hold arrays of cached worker results
 
         self.language = language
         self.ngrams_as_tokens = False
@@ -397,6 +560,20 @@ class TMPreproc:
         meta_keys = self.get_available_metadata_keys()
         return 'pos' in meta_keys
 
+    @property
+    def compaction_stats(self):
+        """
+        Statistics about the compaction of documents on the workers (see :meth:`~TMPreproc.compact_documents`) as dict
+        with the number of compactions ``n_compactions``, the number of removed tokens ``n_tokens_removed`` and the
+        number of reclaimed bytes ``bytes_reclaimed`` summed over all workers.
+        """
+        stats = dict(n_compactions=0, n_tokens_removed=0, bytes_reclaimed=0)
+        for worker_stats in self._get_results_seq_from_workers('get_compaction_stats'):
+            for k, v in worker_stats.items():
+                stats[k] += v
+
+        return stats
+
     @property
     def dtm(self):
         """
@@ -449,8 +626,19 @@ class TMPreproc:
         Normally you don't need to call this manually as the worker processes are killed automatically when the
         TMPreproc instance is removed. However, if you need to free resources immediately, you can use this method
         as it is also used in the tests.
+
+        If this instance is attached to a worker pool, the worker processes are not shut down. Only this instance's
+        documents are removed from the pool's workers.
         """
 
+        if self._executor is not None:
+            self._executor.shutdown(wait=not force)
+            self._executor = None
+
+        if self.pool is not None:
+            self._detach_from_pool(force=force)
+            return
+
         if self.shutdown_event is None or self.shutdown_event.is_set():
             return
 
@@ -462,6 +650,135 @@ class TMPreproc:
 
         self._send_task_to_workers(None, force=force)
 
+    def submit(self, method, *args, **kwargs):
+        """
+        Run the method `method` of this instance with arguments `args` and `kwargs` in a background thread and return
+        a :class:`concurrent.futures.Future` for the method's return value. The calling thread is not blocked while
+        the workers process the tasks, so it can do I/O or work with other TMPreproc instances in the meantime. All
+        methods submitted to the same instance run one after another in the order of submission.
+
+        To await the result in :mod:`asyncio` code, wrap the future via ``asyncio.wrap_future()``.
+
+        .. note:: Don't call other methods of this instance directly while submitted methods are pending.
+
+        :param method: name of a method of this instance, e.g. ``"pos_tag"``
+        :param args: positional arguments passed to the method
+        :param kwargs: keyword arguments passed to the method
+        :return: :class:`concurrent.futures.Future` for the method's return value
+        """
+        fn = getattr(self, method, None)
+        if not callable(fn) or method.startswith('_'):
+            raise ValueError('`method` must be the name of a public TMPreproc method')
+
+        if not self.workers:
+            raise RuntimeError('the worker processes are shut down')
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='TMPreproc')
+
+        return self._executor.submit(fn, *args, **kwargs)
+
+    @property
+    def profiling(self):
+        """True if profiling of the tasks run on the workers is enabled."""
+        return self._profile
+
+    def set_profiling(self, enabled=True):
+        """
+        Enable or disable profiling of the tasks run on the workers. When profiling is enabled, each worker records
+        the compute time, the time for serializing the results, the size of the serialized results and the number of
+        documents and tokens for each task it runs. These profiles can be retrieved via
+        :meth:`~TMPreproc.profile_report` or passed to callback functions added via
+        :meth:`~TMPreproc.add_profile_callback`.
+
+        .. note:: When profiling is enabled, the workers serialize their results themselves in order to measure the
+                  serialization time and the result size. This adds a small overhead.
+
+        :param enabled: enable profiling if True, disable it if False
+        :return: this instance
+        """
+        if enabled != self._profile:
+            self._send_task_to_workers('set_profiling', enabled=enabled)
+            self._profile = enabled
+
+        return self
+
+    def add_profile_callback(self, callback):
+        """
+        Add a callback function that is called each time a task was finished while profiling is enabled. The function
+        is passed a list with a profile for each worker that ran the task. Each profile is a dict with the same keys as
+        the columns of :meth:`~TMPreproc.profile_report` with ``per_worker=True``.
+
+        :param callback: function that accepts a list of dicts
+        :return: this instance
+        """
+        if not callable(callback):
+            raise ValueError('`callback` must be callable')
+
+        self._profile_callbacks.append(callback)
+        return self
+
+    def profile_report(self, per_worker=True, reset=False):
+        """
+        Return the profiles of all tasks that were run on the workers while profiling was enabled as pandas DataFrame.
+        All times are given in seconds.
+
+        If `per_worker` is True, the result contains a row for each task and worker with the columns:
+
+        - ``task_id``: ID of the task
+        - ``task``: name of the task
+        - ``worker``: worker ID
+        - ``n_docs``: number of documents on the worker when the task started
+        - ``n_tokens``: number of (unfiltered) tokens on the worker when the task started
+        - ``compute_time``: time for running the task on the worker
+        - ``serialize_time``: time for serializing the task's results on the worker
+        - ``result_bytes``: size of the serialized results of the task
+        - ``deserialize_time``: time for deserializing the results in the main process
+        - ``wall_time``: time from sending the task until all workers finished (and all results were collected)
+        - ``wait_time``: remaining time, i.e. time spent waiting for other workers or for transferring tasks and
+          results through the queues
+
+        If `per_worker` is False, the result contains a row for each task with the columns ``task_id``, ``task``,
+        ``n_workers``, ``n_docs``, ``n_tokens``, ``result_bytes`` (sums across workers), ``wall_time``,
+        ``compute_time_max``, ``compute_time_mean`` (maximum and mean compute time across workers),
+        ``serialize_time`` and ``deserialize_time`` (sums across workers).
+
+        :param per_worker: if True, report profiles per task and worker, otherwise per task
+        :param reset: if True, remove the recorded profiles afterwards
+        :return: pandas DataFrame
+        """
+        import pandas as pd
+
+        records = self._profile_records
+
+        if per_worker:
+            colnames = list(PROFILE_COLUMNS)
+            rows = [[rec[c] for c in colnames] for rec in records]
+        else:
+            colnames = ['task_id', 'task', 'n_workers', 'n_docs', 'n_tokens', 'result_bytes', 'wall_time',
+                        'compute_time_max', 'compute_time_mean', 'serialize_time', 'deserialize_time']
+            task_records = OrderedDict()
+            for rec in records:
+                task_records.setdefault(rec['task_id'], []).append(rec)
+
+            rows = []
+            for task_id, recs in task_records.items():
+                compute_times = [rec['compute_time'] for rec in recs]
+                rows.append([task_id, recs[0]['task'], len(recs),
+                             sum(rec['n_docs'] for rec in recs),
+                             sum(rec['n_tokens'] for rec in recs),
+                             sum(rec['result_bytes'] for rec in recs),
+                             recs[0]['wall_time'],
+                             max(compute_times),
+                             sum(compute_times) / len(recs),
+                             sum(rec['serialize_time'] for rec in recs),
+                             sum(rec['deserialize_time'] for rec in recs)])
+
+        if reset:
+            self._profile_records = []
+
+        return pd.DataFrame(rows, columns=colnames)
+
     def save_state(self, picklefile):
         """
         Save the current state of this TMPreproc instance to disk, i.e. to the pickle file `picklefile`.
@@ -498,6 +815,10 @@ class TMPreproc:
         if set(state_data.keys()) != {'manager_state', 'worker_states'}:
             raise ValueError('invalid data in state object')
 
+        if self.pool is not None:
+            raise ValueError('loading a pickled state is not supported when attached to a worker pool; use '
+                             '`load_binary_state()` instead')
+
         # load saved state attributes for this instance ("manager instance")
         for attr, val in state_data['manager_state'].items():
             setattr(self, attr, val)
@@ -512,11 +833,87 @@ class TMPreproc:
 
         return self
 
+    def save_binary_state(self, state_dir):
+        """
+        Save the current state of this TMPreproc instance to the directory `state_dir` in a binary format. In
+        contrast to :meth:`~TMPreproc.save_state`, each worker process writes the data of its documents (tokens,
+        masks, metadata, spaCy token attributes and tensors) in parallel as contiguous arrays to a separate NumPy
+        ``.npz`` file and the spaCy language model is not stored, but only its name. Hence saving and loading the
+        state is much faster. The state can be restored using :meth:`~TMPreproc.load_binary_state` or class method
+        :meth:`~TMPreproc.from_binary_state`.
+
+        .. note:: The state must be loaded with the same spaCy language model version as it was saved with.
+
+        :param state_dir: directory to store the state to; will be created if it does not exist
+        :return: this instance
+        """
+        logger.info('saving binary state to directory `%s`' % state_dir)
+
+        if not self.workers:
+            raise RuntimeError('there are no running worker processes for this TMPreproc instance')
+
+        if not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+
+        self._run_pending_tasks()
+
+        # each worker writes its own state file
+        worker_files = [os.path.join(state_dir, 'worker_%03d.npz' % i_worker) for i_worker in range(self.n_workers)]
+        self._run_task_on_workers('save_binary_state', {i_worker: {'state_file': worker_file}
+                                                        for i_worker, worker_file in enumerate(worker_files)})
+
+        # attributes for this instance ("manager instance")
+        manager_state = self._create_state_object(deepcopy_attrs=False, with_worker_states=False)['manager_state']
+        pickle_data({
+            'format_version': BINARY_STATE_FORMAT_VERSION,
+            'manager_state': manager_state,
+            'worker_files': [os.path.basename(f) for f in worker_files],
+        }, os.path.join(state_dir, 'manager.pickle'))
+
+        return self
+
+    def load_binary_state(self, state_dir):
+        """
+        Restore a state from the directory `state_dir` as saved with :meth:`~TMPreproc.save_binary_state`. Each
+        worker process loads the data of its documents from its own file.
+
+        :param state_dir: directory as passed to :meth:`~TMPreproc.save_binary_state`
+        :return: this instance as restored from the passed directory
+        """
+        logger.info('loading binary state from directory `%s`' % state_dir)
+
+        state_data = unpickle_file(os.path.join(state_dir, 'manager.pickle'))
+
+        if set(state_data.keys()) != {'format_version', 'manager_state', 'worker_files'}:
+            raise ValueError('invalid data in state directory')
+
+        if state_data['format_version'] != BINARY_STATE_FORMAT_VERSION:
+            raise ValueError('unsupported binary state format version %d' % state_data['format_version'])
+
+        # load saved state attributes for this instance ("manager instance")
+        for attr, val in state_data['manager_state'].items():
+            setattr(self, attr, val)
+
+        # recreate worker processes
+        self.shutdown_workers()
+        self._setup_workers(state_files=[os.path.join(state_dir, f) for f in state_data['worker_files']])
+
+        self._invalidate_docs_info()
+        self._invalidate_workers_tokens()
+        self._invalidate_workers_ngrams()
+
+        return self
+
     def load_tokens(self, tokens):
         """
         Load tokens `tokens` into :class:`TMPreproc` in the same format as they are returned by
         :attr:`~TMPreproc.tokens` or :attr:`~TMPreproc.tokens_with_metadata`, i.e. as dict with mapping:
-        document label -> document tokens array or document data frame.
+        document label -> document tokens array or document data frame. Documents may also be given as dicts that
+        map column names (``"token"``, ``"lemma"``, ``"pos"``, ``"meta_..."``, etc.) to lists or NumPy arrays as
+        returned by :meth:`~TMPreproc.get_tokens` with ``as_datatables=False`` and ``arrays_to_lists=False``.
+
+        .. note:: The documents are not processed by the spaCy language model, i.e. the token arrays are used as they
+                  are and token attributes like lemmata or POS tags are only set if they are given.
 
         :param tokens: dict of tokens as returned by :attr:`~TMPreproc.tokens` or
                        :attr:`~TMPreproc.tokens_with_metadata`
@@ -534,10 +931,13 @@ class TMPreproc:
         if tokens:
             for dl, doc in tokens.items():
                 if isinstance(doc, FRAME_TYPE):
-                    tokens_dicts[dl] = {col: coldata for col, coldata in zip(pd_dt_colnames(doc),
-                                                                              pd_dt_frame_to_list(doc))}
-                elif isinstance(doc, list):
+                    tokens_dicts[dl] = pd_dt_frame_to_arrays(doc)
+                elif isinstance(doc, (list, np.ndarray)):
                     tokens_dicts[dl] = {'token': doc}
+                elif isinstance(doc, dict):
+                    if 'token' not in doc:
+                        raise ValueError('document `%s` does not contain a "token" column' % dl)
+                    tokens_dicts[dl] = doc
                 else:
                     raise ValueError('document `%s` is of unknown type `%s`' % (dl, type(doc)))
 
@@ -569,14 +969,18 @@ class TMPreproc:
         if {'doc', 'position', 'token'} & set(pd_dt_colnames(tokendf)) != {'doc', 'position', 'token'}:
             raise ValueError('`tokendf` must contain a columns "doc", "position" and "token"')
 
-        # convert big dataframe to dict of document token dicts to be used in load_tokens
+        # convert big dataframe to dict of document token dicts to be used in load_tokens; sort it once by document
+        # and position and then split the column arrays at the document boundaries
+        columns = pd_dt_frame_to_arrays(tokendf[:, :, dt.sort('doc', 'position')])
+        doc_col = columns.pop('doc')
+        del columns['position']
+
         tokens = {}
-        for dl in dt.unique(tokendf[:, dt.f.doc]).to_list()[0]:
-            doc_df = tokendf[dt.f.doc == dl, :]
-            colnames = pd_dt_colnames(doc_df)
-            colnames.pop(colnames.index('doc'))
-            colnames.pop(colnames.index('position'))
-            tokens[dl] = doc_df[:, colnames]
+        if len(doc_col) > 0:
+            doc_starts = np.flatnonzero(np.concatenate(([True], doc_col[1:] != doc_col[:-1])))
+            doc_ends = np.append(doc_starts[1:], len(doc_col))
+            for begin, end in zip(doc_starts, doc_ends):
+                tokens[doc_col[begin]] = {col: coldata[begin:end] for col, coldata in columns.items()}
 
         return self.load_tokens(tokens)
 
@@ -603,9 +1007,46 @@ class TMPreproc:
         Copy a TMPreproc instance including all its present state (tokens, meta data, etc.).
         Performs a deep copy.
 
+        The workers' documents are not routed through this process. Instead, each worker copies the data of its
+        documents in the binary state format (see :meth:`~TMPreproc.save_binary_state`) to a shared memory block from
+        which the respective worker of the copy loads them in parallel; only the name of the block is passed via this
+        process. If shared memory is not available (Python < 3.8 or a
+        :class:`~tmtoolkit.preprocess.DistributedWorkerPool`), the arrays are passed via the results queue. The workers
+        of the copy load the spaCy language model themselves or use the model of the worker pool.
+
         :return: deep copy of the current TMPreproc instance
         """
-        return TMPreproc.from_state(self._create_state_object(deepcopy_attrs=True))
+        logger.info('copying TMPreproc instance')
+
+        # an instance without worker processes, e.g. with an empty corpus, is copied without worker processes, too
+        n_workers = self.n_workers if self.workers else 0
+
+        shared_memory = SHARED_MEMORY_AVAILABLE and not isinstance(self.pool, DistributedWorkerPool)
+        worker_states = self._get_results_from_workers('get_binary_state',
+                                                       {i_worker: {'shared_memory': shared_memory}
+                                                        for i_worker in range(n_workers)},
+                                                       unpack=False)
+
+        workers_doc_labels = [[] for _ in range(n_workers)]
+        for dl, i_worker in self.docs2workers.items():
+            workers_doc_labels[i_worker].append(dl)
+
+        new_instance = TMPreproc(docs=None, pool=self.pool, loading_from_state=True)
+
+        # copy attributes of this instance ("manager instance")
+        manager_state = self._create_state_object(deepcopy_attrs=True, with_worker_states=False)['manager_state']
+        for attr, val in manager_state.items():
+            setattr(new_instance, attr, val)
+
+        try:
+            new_instance._setup_workers(binary_states=list(zip(workers_doc_labels, worker_states)))
+        except Exception:
+            # release the shared memory blocks of the states that were not loaded
+            for state in worker_states:
+                discard_result(state)
+            raise
+
+        return new_instance
 
     @classmethod
     def from_state(cls, file_or_stateobj, **init_kwargs):
@@ -629,6 +1070,27 @@ class TMPreproc:
 
         return cls(**init_kwargs).load_state(file_or_stateobj)
 
+    @classmethod
+    def from_binary_state(cls, state_dir, **init_kwargs):
+        """
+        Create a new TMPreproc instance by loading a state from the directory `state_dir` as saved with
+        :meth:`~TMPreproc.save_binary_state`.
+
+        :param state_dir: directory as passed to :meth:`~TMPreproc.save_binary_state`
+        :param init_kwargs: arguments passed to :meth:`~TMPreproc.__init__`
+        :return: new instance as restored from the passed directory
+        """
+        if 'docs' in init_kwargs.keys():
+            raise ValueError('`docs` cannot be passed as argument when loading state')
+        init_kwargs['docs'] = None
+
+        if 'language' in init_kwargs.keys() or 'language_model' in init_kwargs.keys():
+            raise ValueError('`language` and `language_model` cannot be passed as argument when loading state')
+
+        init_kwargs['loading_from_state'] = True
+
+        return cls(**init_kwargs).load_binary_state(state_dir)
+
     @classmethod
     def from_tokens(cls, tokens, **init_kwargs):
         """
@@ -674,6 +1136,325 @@ class TMPreproc:
 
         return cls(**init_kwargs).load_tokens_datatable(tokensdf)
 
+    def add_documents(self, docs):
+        """
+        Add new documents `docs` to this instance without restarting the worker processes. The documents are passed
+        as dictionary with document label to document text mapping like for :meth:`~TMPreproc.__init__`.
+
+        The new documents are distributed to the least loaded workers. All token-wise processing steps that were
+        applied to the existing documents so far (e.g. :meth:`~TMPreproc.tokens_to_lowercase`,
+        :meth:`~TMPreproc.clean_tokens` or :meth:`~TMPreproc.pos_tag`) are replayed on the new documents only.
+
+        .. note:: Steps that depend on specific documents or on the whole corpus are *not* replayed. These are
+                  :meth:`~TMPreproc.add_metadata_per_doc`, :meth:`~TMPreproc.filter_tokens_by_mask`,
+                  :meth:`~TMPreproc.filter_documents_by_name`, :meth:`~TMPreproc.remove_tokens_by_doc_frequency`
+                  and :meth:`~TMPreproc.apply_custom_filter`.
+
+        :param docs: documents dictionary ("corpus") with document label to document text mapping
+        :return: this instance
+        """
+        require_dictlike(docs)
+
+        if not self.workers:
+            raise RuntimeError('there are no running worker processes for this TMPreproc instance')
+
+        existing_docs = set(docs.keys()) & set(self.doc_labels)
+        if existing_docs:
+            raise ValueError('documents with the following labels already exist: %s' % str(sorted(existing_docs)))
+
+        if not self.pipeline.replayable:
+            raise ValueError('the recorded processing steps cannot be replayed on new documents because a function '
+                             'passed to `transform_tokens` cannot be pickled')
+
+        self._run_pending_tasks()
+
+        logger.info('adding %d documents' % len(docs))
+
+        workers_kwargs = {}
+        for i_worker, doc_labels in enumerate(self._distribute_new_docs(docs)):
+            if not doc_labels: continue
+            workers_kwargs[i_worker] = dict(docs={dl: docs[dl] for dl in doc_labels},
+                                            enable_vectors=self.vectors_enabled,
+                                            replay_tasks=self.pipeline.steps)
+            for dl in doc_labels:
+                self.docs2workers[dl] = i_worker
+
+        self._run_task_on_workers('add_docs', workers_kwargs)
+
+        self._invalidate_docs_info()
+        self._invalidate_workers_tokens()
+        self._invalidate_workers_ngrams()
+
+        return self
+
+    def remove_documents_by_label(self, doc_labels):
+        """
+        Remove the documents with labels `doc_labels` from this instance.
+
+        .. seealso:: :meth:`~TMPreproc.remove_documents_by_name` for removing documents by name patterns
+
+        :param doc_labels: list, tuple or set of document labels
+        :return: this instance
+        """
+        require_listlike_or_set(doc_labels)
+
+        unknown_docs = set(doc_labels) - set(self.doc_labels)
+        if unknown_docs:
+            raise ValueError('documents with the following labels do not exist: %s' % str(sorted(unknown_docs)))
+
+        logger.info('removing %d documents' % len(doc_labels))
+
+        self._invalidate_docs_info()
+        self._invalidate_workers_tokens()
+        self._invalidate_workers_ngrams()
+
+        self._send_task_to_workers('remove_documents_by_label', doc_labels=list(doc_labels))
+
+        for dl in doc_labels:
+            self.docs2workers.pop(dl, None)
+            self.docs_weights.pop(dl, None)
+
+        return self
+
+    def update_documents(self, docs):
+        """
+        Replace existing documents by new document texts in `docs` given as dictionary with document label to
+        document text mapping. This is the same as removing these documents via
+        :meth:`~TMPreproc.remove_documents_by_label` and adding them again via :meth:`~TMPreproc.add_documents`,
+        i.e. all recorded token-wise processing steps are replayed on the new document texts.
+
+        :param docs: documents dictionary with document label to new document text mapping
+        :return: this instance
+        """
+        require_dictlike(docs)
+
+        return self.remove_documents_by_label(list(docs.keys())).add_documents(docs)
+
+    def rebalance_workers(self, threshold=0.1):
+        """
+        Migrate documents between the worker processes so that the load on all workers is similar. The load of a
+        worker is the number of tokens (including filtered tokens) of all its documents. The initial distribution of
+        the documents across the workers is based on the raw document lengths and the load may get heavily imbalanced
+        by steps like :meth:`~TMPreproc.filter_documents`. Since each step is run in parallel and finishes only when
+        the slowest worker has finished, this may result in long idle times for the other workers.
+
+        Documents are moved from the highest loaded worker to the lowest loaded worker as long as the difference
+        between both loads is bigger than `threshold` times the mean load.
+
+        :param threshold: max. accepted load difference between workers relative to the mean load
+        :return: this instance
+        """
+        if threshold < 0:
+            raise ValueError('`threshold` must not be negative')
+
+        if self.n_workers < 2:
+            return self
+
+        # fetch document loads and sum them up per worker
+        docs_loads = {}
+        for w_res in self._get_results_seq_from_workers('get_doc_loads'):
+            docs_loads.update(w_res)
+
+        workers_docs = [{} for _ in range(self.n_workers)]
+        for dl, load in docs_loads.items():
+            workers_docs[self.docs2workers[dl]][dl] = load
+
+        # determine the document migrations
+        workers_load = [sum(w_docs.values()) for w_docs in workers_docs]
+        max_diff = threshold * sum(workers_load) / self.n_workers
+        migrations = defaultdict(list)   # (from worker, to worker) -> document labels
+
+        while True:
+            i_max = int(np.argmax(workers_load))
+            i_min = int(np.argmin(workers_load))
+            diff = workers_load[i_max] - workers_load[i_min]
+            if diff <= max_diff:
+                break
+
+            # move the biggest document that reduces the load difference
+            candidates = [(dl, load) for dl, load in workers_docs[i_max].items() if 0 < load < diff]
+            if not candidates:
+                break
+            dl, load = max(candidates, key=lambda x: x[1])
+
+            del workers_docs[i_max][dl]
+            workers_docs[i_min][dl] = load
+            workers_load[i_max] -= load
+            workers_load[i_min] += load
+            migrations[(i_max, i_min)].append(dl)
+
+        if not migrations:
+            return self
+
+        logger.info('migrating %d documents between workers' % sum(map(len, migrations.values())))
+
+        self._invalidate_workers_tokens()
+
+        # pop the documents from their workers
+        docs_from_workers = defaultdict(list)
+        for (i_from, _), doc_labels in migrations.items():
+            docs_from_workers[i_from].extend(doc_labels)
+
+        popped_docs = {}
+        workers_kwargs = {i_from: {'doc_labels': doc_labels} for i_from, doc_labels in docs_from_workers.items()}
+        for worker_docs in self._get_results_from_workers('pop_docs', workers_kwargs):
+            for doc_data in worker_docs:
+                popped_docs[doc_data[0]] = doc_data
+
+        # insert them in their new workers
+        docs_to_workers = defaultdict(list)
+        for (_, i_to), doc_labels in migrations.items():
+            docs_to_workers[i_to].extend(doc_labels)
+            for dl in doc_labels:
+                self.docs2workers[dl] = i_to
+
+        self._run_task_on_workers('insert_docs', {i_to: {'docs_data': [popped_docs[dl] for dl in doc_labels]}
+                                                  for i_to, doc_labels in docs_to_workers.items()})
+
+        return self
+
+    def apply_pipeline(self, pipeline):
+        """
+        Apply all steps of the recorded processing pipeline `pipeline` to the documents of this instance. A pipeline
+        is recorded by each TMPreproc instance in :attr:`~TMPreproc.pipeline` and can be saved to disk via
+        :meth:`PreprocPipeline.save`. This allows to apply the same processing steps to different corpora.
+
+        :param pipeline: :class:`~tmtoolkit.preprocess.PreprocPipeline` instance
+        :return: this instance
+        """
+        if not isinstance(pipeline, PreprocPipeline):
+            raise ValueError('`pipeline` must be a PreprocPipeline instance')
+
+        if not pipeline.replayable:
+            raise ValueError('the pipeline cannot be applied because a function passed to `transform_tokens` cannot '
+                             'be pickled')
+
+        logger.info('applying pipeline with %d steps' % len(pipeline))
+
+        self._invalidate_docs_info()
+        self._invalidate_workers_tokens()
+        self._invalidate_workers_ngrams()
+
+        for task, kwargs in pipeline:
+            if task in TASKS_WITH_RESULTS:
+                self._get_results_seq_from_workers(task, **kwargs)
+            else:
+                self._send_task_to_workers(task, **kwargs)
+
+            if task == 'use_joined_ngrams_as_tokens':
+                self.ngrams_as_tokens = True
+
+        return self
+
+    @classmethod
+    def process_stream(cls, docs, pipeline=None, chunk_size=1000, spill_dir=None, **init_kwargs):
+        """
+        Process a possibly very large stream of documents `docs` in chunks of `chunk_size` documents, so that only a
+        single chunk needs to be held in memory. Each processed chunk is "spilled" to disk in a compact columnar format
+        to `spill_dir`. The result is a :class:`~tmtoolkit.preprocess.SpilledCorpus` object that allows to iterate
+        through the processed documents and to generate a document-term-matrix incrementally from the chunks.
+
+        The processing steps are either given as a :class:`~tmtoolkit.preprocess.PreprocPipeline` object or as a
+        function that accepts a TMPreproc instance and applies the processing steps to it, e.g.::
+
+            spilled = TMPreproc.process_stream(read_docs(), lambda p: p.tokens_to_lowercase().clean_tokens(),
+                                               language='en')
+            dtm = spilled.get_dtm()
+
+        Only a single TMPreproc instance is created for processing the stream. After each chunk, the processed
+        documents are removed from it and the next chunk is added via :meth:`~TMPreproc.add_documents`, which
+        replays the processing steps on the new documents.
+
+        .. note:: Only steps that depend on each individual document's tokens are supported. Steps that depend on
+                  specific documents or the whole corpus such as :meth:`~TMPreproc.add_metadata_per_doc` or
+                  :meth:`~TMPreproc.remove_tokens_by_doc_frequency` would only be applied to the first chunk.
+
+        :param docs: iterable or generator of ``(document label, document text)`` tuples or a dict with document
+                     label to document text mapping
+        :param pipeline: a :class:`~tmtoolkit.preprocess.PreprocPipeline` object or a function that accepts a
+                         TMPreproc instance and applies the processing steps to it; if None, only tokenize the
+                         documents
+        :param chunk_size: number of documents per chunk
+        :param spill_dir: directory to which the processed chunks are written; if None, a temporary directory is
+                          created; if an error occurs, the chunks written so far are removed
+        :param init_kwargs: arguments passed to :meth:`~TMPreproc.__init__`
+        :return: :class:`~tmtoolkit.preprocess.SpilledCorpus` object
+        """
+        if chunk_size < 1:
+            raise ValueError('`chunk_size` must be at least 1')
+
+        if pipeline is not None and not isinstance(pipeline, PreprocPipeline) and not callable(pipeline):
+            raise ValueError('`pipeline` must be a PreprocPipeline instance or a function')
+
+        if 'docs' in init_kwargs.keys():
+            raise ValueError('`docs` cannot be passed as argument when processing a stream')
+
+        if isinstance(docs, dict):
+            docs = docs.items()
+
+        created_spill_dir = None
+        if spill_dir is None:
+            spill_dir = created_spill_dir = tempfile.mkdtemp(prefix='tmtoolkit_stream_')
+        elif not os.path.exists(spill_dir):
+            os.makedirs(spill_dir)
+            created_spill_dir = spill_dir
+
+        logger.info('processing stream in chunks of %d documents; spilling to `%s`' % (chunk_size, spill_dir))
+
+        preproc = None
+        chunk_file = None
+        chunk_files = []
+        seen_doc_labels = set()
+        docs_iter = iter(docs)
+
+        try:
+            while True:
+                chunk_items = list(islice(docs_iter, chunk_size))
+                if not chunk_items:
+                    break
+
+                # check for duplicates within the chunk, too, because they would be silently collapsed in the dict
+                chunk_label_counts = Counter(dl for dl, _ in chunk_items)
+                duplicates = {dl for dl, n in chunk_label_counts.items() if n > 1 or dl in seen_doc_labels}
+                if duplicates:
+                    raise ValueError('duplicate document labels in stream: %s' % str(sorted(duplicates)))
+
+                chunk = dict(chunk_items)
+                seen_doc_labels.update(chunk.keys())
+
+                logger.info('processing chunk #%d' % len(chunk_files))
+
+                if preproc is None:
+                    preproc = cls(chunk, **init_kwargs)
+                    if isinstance(pipeline, PreprocPipeline):
+                        preproc.apply_pipeline(pipeline)
+                    elif pipeline is not None:
+                        pipeline(preproc)
+                else:
+                    preproc.add_documents(chunk)
+
+                # spill the documents that were not filtered out in the order of the stream
+                tokens = preproc.get_tokens(with_metadata=True, arrays_to_lists=False)
+                chunk_file = os.path.join(spill_dir, 'chunk_%06d.npz' % len(chunk_files))
+                chunk_files.append(spill_chunk({dl: tokens[dl] for dl in chunk.keys() if dl in tokens}, chunk_file))
+
+                # free the memory of the processed documents
+                preproc.remove_documents_by_label(preproc.doc_labels)
+        except:
+            # remove the chunk files written so far (including a partially written one) and the spill directory if
+            # it was created here
+            for f in set(chunk_files + ([chunk_file] if chunk_file else [])):
+                if os.path.exists(f):
+                    os.remove(f)
+            if created_spill_dir is not None:
+                shutil.rmtree(created_spill_dir, ignore_errors=True)
+            raise
+        finally:
+            if preproc is not None:
+                preproc.shutdown_workers()
+
+        return SpilledCorpus(chunk_files)
+
     def get_tokens(self, non_empty=False, with_metadata=True, as_datatables=False, arrays_to_lists=True):
         """
         Return document tokens as dict with mapping document labels to document tokens. The format of the tokens
@@ -736,6 +1517,82 @@ class TMPreproc:
         else:
             return tokens
 
+    def iter_tokens_batches(self, batch_size=1000, with_metadata=True, as_datatables=False):
+        """
+        Iterate through the tokens of all documents in batches of `batch_size` documents. Each batch is in columnar
+        format, i.e. a dict mapping column name to a NumPy array with the values for all tokens of the documents in
+        the batch. The columns are "doc" (document label), "position" (token position in the document), "token" and
+        optional metadata columns like "lemma", "pos" and "meta_..." if `with_metadata` is True. The tokens are sorted
+        by document label and position.
+
+        In contrast to :meth:`~TMPreproc.get_tokens` or :attr:`~TMPreproc.tokens_datatable`, only the tokens of a
+        single batch are held in this process at a time. The workers assemble their part of each batch in parallel.
+
+        .. seealso:: :meth:`~TMPreproc.write_tokens_batches` to write the batches directly to disk
+
+        :param batch_size: number of documents per batch
+        :param with_metadata: add meta data to results (e.g. POS tags)
+        :param as_datatables: yield batches as datatables (if package datatable is installed) or pandas DataFrames
+        :return: generator of batches
+        """
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1')
+
+        doc_labels = self.doc_labels
+        workers_offsets = [0] * self.n_workers   # index of the next document in each worker's sorted documents
+
+        for start in range(0, len(doc_labels), batch_size):
+            # the documents of each worker in this batch are a contiguous range in the worker's sorted documents
+            workers_n_docs = Counter(self.docs2workers[dl] for dl in doc_labels[start:start+batch_size])
+            workers_kwargs = {}
+            for i_worker, n_docs in workers_n_docs.items():
+                offset = workers_offsets[i_worker]
+                workers_kwargs[i_worker] = dict(start=offset, stop=offset + n_docs, with_metadata=with_metadata)
+                workers_offsets[i_worker] += n_docs
+
+            shm_blocks = []
+            workers_batches = self._get_results_from_workers('get_tokens_batch', workers_kwargs, shm_blocks)
+
+            # merge the workers' batches and sort by document label; the sort is stable so the token positions
+            # remain ordered
+            batch = {col: np.concatenate([w_batch[col] for w_batch in workers_batches])
+                     for col in workers_batches[0].keys()}
+            order = np.argsort(batch['doc'], kind='stable')
+            batch = OrderedDict((col, arr[order]) for col, arr in batch.items())
+
+            del workers_batches
+            self._shm_blocks.extend(release_shared_blocks(shm_blocks))
+
+            if as_datatables:
+                yield pd_dt_frame(batch)
+            else:
+                yield batch
+
+    def write_tokens_batches(self, out_dir, batch_size=1000):
+        """
+        Write the tokens and metadata of all documents to the directory `out_dir` in batches of `batch_size`
+        documents. Each worker writes the batches of its documents in parallel to separate NumPy ``.npz`` files in
+        the columnar format that is also used by :meth:`~TMPreproc.process_stream`, so the tokens are not routed
+        through this process.
+
+        :param out_dir: target directory; will be created if it does not exist
+        :param batch_size: max. number of documents per file
+        :return: :class:`~tmtoolkit.preprocess.SpilledCorpus` for the written files
+        """
+        if batch_size < 1:
+            raise ValueError('`batch_size` must be at least 1')
+
+        logger.info('writing tokens in batches of %d documents to directory `%s`' % (batch_size, out_dir))
+
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+
+        workers_kwargs = {i_worker: dict(file_prefix=os.path.join(out_dir, 'tokens_worker%03d' % i_worker),
+                                         batch_size=batch_size)
+                          for i_worker in range(self.n_workers)}
+
+        return SpilledCorpus(flatten_list(self._get_results_from_workers('write_tokens_batches', workers_kwargs)))
+
     def get_kwic(self, search_tokens, context_size=2, match_type='exact', ignore_case=False, glob_method='match',
                  inverse=False, with_metadata=False, as_datatable=False, non_empty=False, glue=None,
                  highlight_keyword=None):
@@ -801,6 +1658,14 @@ class TMPreproc:
         return _finalize_kwic_results(kwic, non_empty=non_empty, glue=glue,
                                       as_datatable=as_datatable, with_metadata=with_metadata)
 
+    def get_kwic_async(self, *args, **kwargs):
+        """
+        Same as :meth:`~TMPreproc.get_kwic`, but run in a background thread (see :meth:`~TMPreproc.submit`).
+
+        :return: :class:`concurrent.futures.Future` for the KWIC results
+        """
+        return self.submit('get_kwic', *args, **kwargs)
+
     def get_kwic_table(self, search_tokens, context_size=2, match_type='exact', ignore_case=False, glob_method='match',
                        inverse=False, glue=' ', highlight_keyword='*'):
         """
@@ -876,6 +1741,41 @@ class TMPreproc:
 
         return glued_tokens
 
+    def glue_phrases(self, phrases, glue='_', ignore_case=False):
+        """
+        Glue all occurrences of the phrases in `phrases` (e.g. a list of multi-word expressions like
+        ``["European Union", "New York"]``), i.e. join the subsequent tokens of each occurrence by glue string `glue`
+        and replace these tokens in the documents. All phrases are glued in a single pass over each document. If
+        phrases overlap, the longest phrase is glued. Returns a set of all joint tokens.
+
+        .. warning:: This will remove all information about POS tags and other token metadata.
+
+        :param phrases: sequence of phrases, each given either as string with whitespace-separated tokens or as
+                        sequence of at least two tokens
+        :param glue: string for joining the tokens of each phrase
+        :param ignore_case: if True, ignore case for matching
+        :return: set of all joint tokens
+        """
+
+        # validates the phrases before any worker is involved: raises a ValueError if `phrases` is empty or if a phrase
+        # consists of less than two tokens
+        _phrase_trie(phrases, ignore_case)
+
+        if not isinstance(glue, str):
+            raise ValueError('`glue` must be a string')
+
+        self._invalidate_workers_tokens()
+
+        # list of results from all workers
+        glued_tokens_per_workers = self._get_results_seq_from_workers('glue_phrases', phrases=list(phrases),
+                                                                      glue=glue, ignore_case=ignore_case)
+
+        glued_tokens = set()
+        for tok_set in glued_tokens_per_workers:
+            glued_tokens.update(tok_set)
+
+        return glued_tokens
+
     def get_vocabulary(self, sort=True):
         """
         Return the vocabulary, i.e. the list of unique words across all documents, as (sorted) list.
@@ -914,9 +1814,20 @@ class TMPreproc:
         """
 
         if self._cur_metadata_keys is None:
-            self._cur_metadata_keys = set(flatten_list(
-                self._get_results_seq_from_workers('get_available_metadata_keys')
-            ))
+            with self._lock:
+                # in lazy mode, the metadata keys added by the deferred tasks are known without running these tasks
+                pending_tasks = self._pending_tasks
+                self._pending_tasks = []
+                try:
+                    metadata_keys = set(flatten_list(
+                        self._get_results_seq_from_workers('get_available_metadata_keys')
+                    ))
+                finally:
+                    self._pending_tasks = pending_tasks
+
+            metadata_keys.update(FUSABLE_TASKS_METADATA_KEYS[task] for task, _ in pending_tasks
+                                 if task in FUSABLE_TASKS_METADATA_KEYS)
+            self._cur_metadata_keys = metadata_keys
 
         return self._cur_metadata_keys
 
@@ -1085,7 +1996,8 @@ class TMPreproc:
         However, there's no guarantee that this will work and you may get an `AttributeError` exception in
         "_ForkingPickler".
 
-        By default the function is applied to the documents sequentially, which may be very slow.
+        By default the function is applied on the main process. In both cases, the function is applied only once to
+        each unique token; on the main process, the results are shared across all worker processes.
 
         :param transform_fn: a function to apply to all documents' tokens; it must accept a single token string and
                              vice-versa return single token string
@@ -1101,21 +2013,27 @@ class TMPreproc:
             logger.info('transforming tokens on worker processes')
             self._send_task_to_workers('transform_tokens', transform_fn=transform_fn)
         else:
-            tokens = self._workers_tokens
+            workers_vocab = self._get_results_seq_from_workers('get_vocab')
 
             self._invalidate_workers_tokens()
 
-            logger.debug('transforming tokens on main process')
-
-            new_tokens = defaultdict(dict)
-            for dl, doc in tokens.items():
-                new_tokens[self.docs2workers[dl]][dl] = list(map(transform_fn, doc['token']))
+            # apply the function only once to each unique token across all workers
+            transformed = {}
+            for w_vocab in workers_vocab:
+                for t in w_vocab:
+                    if t not in transformed:
+                        transformed[t] = transform_fn(t)
 
-            for worker_id, worker_tokens in new_tokens.items():
-                self.tasks_queues[worker_id].put(('replace_tokens', {'tokens': worker_tokens}))
+            logger.debug('transformed %d unique tokens on main process' % len(transformed))
 
             if self.tasks_queues:
-                [q.join() for q in self.tasks_queues]
+                self._run_task_on_workers('map_tokens', {i_worker: {'mapping': {t: transformed[t] for t in w_vocab}}
+                                                         for i_worker, w_vocab in enumerate(workers_vocab)})
+
+            # for documents that are added later, the transformation is applied on the worker processes; this is
+            # impossible if `transform_fn` cannot be pickled
+            self.pipeline.add_step('transform_tokens',
+                                   {'transform_fn': transform_fn if _is_pickable(transform_fn) else None})
 
         return self
 
@@ -1145,6 +2063,7 @@ class TMPreproc:
         :return: this instance
         """
         self._require_no_ngrams_as_tokens()
+        self._auto_rebalance_workers()
 
         self._invalidate_workers_tokens()
         logger.info('POS tagging tokens')
@@ -1152,6 +2071,14 @@ class TMPreproc:
 
         return self
 
+    def pos_tag_async(self):
+        """
+        Same as :meth:`~TMPreproc.pos_tag`, but run in a background thread (see :meth:`~TMPreproc.submit`).
+
+        :return: :class:`concurrent.futures.Future` for this instance
+        """
+        return self.submit('pos_tag')
+
     def lemmatize(self):
         """
         Lemmatize tokens, i.e. set the lemmata as tokens so that all further processing will happen
@@ -1161,6 +2088,7 @@ class TMPreproc:
         """
 
         self._require_no_ngrams_as_tokens()
+        self._auto_rebalance_workers()
 
         self._invalidate_workers_tokens()
 
@@ -1169,6 +2097,14 @@ class TMPreproc:
 
         return self
 
+    def lemmatize_async(self):
+        """
+        Same as :meth:`~TMPreproc.lemmatize`, but run in a background thread (see :meth:`~TMPreproc.submit`).
+
+        :return: :class:`concurrent.futures.Future` for this instance
+        """
+        return self.submit('lemmatize')
+
     def expand_compound_tokens(self, split_chars=('-',), split_on_len=2, split_on_casechange=False):
         """
         Expand compound tokens like "US-Student" to "US" and "Student". Use `split_chars` to determine possible
@@ -1254,7 +2190,22 @@ class TMPreproc:
 
         return self
 
+    def clean_tokens_async(self, *args, **kwargs):
+        """
+        Same as :meth:`~TMPreproc.clean_tokens`, but run in a background thread (see :meth:`~TMPreproc.submit`).
+
+        :return: :class:`concurrent.futures.Future` for this instance
+        """
+        return self.submit('clean_tokens', *args, **kwargs)
+
     def compact_documents(self):
+        """
+        Remove the tokens that were filtered out from the documents on the workers in order to reclaim memory. When
+        `compact_threshold` was set on initialization, this is done automatically after filtering tokens. The memory
+        reclaimed so far can be retrieved via :attr:`~TMPreproc.compaction_stats`.
+
+        :return: this instance
+        """
         self._invalidate_workers_tokens()
 
         logger.info('compacting documents')
@@ -1426,12 +2377,11 @@ class TMPreproc:
         """
         self._check_filter_args(match_type=match_type, glob_method=glob_method)
 
-        n_docs_orig = self.n_docs
-
         self._invalidate_docs_info()
         self._invalidate_workers_tokens()
 
-        logger.info('filtering %d documents' % n_docs_orig)
+        # the number of documents is not logged as this would require running the deferred tasks in lazy mode
+        logger.info('filtering documents')
         self._send_task_to_workers('filter_documents',
                                    search_tokens=search_tokens,
                                    by_meta=by_meta,
@@ -1666,18 +2616,16 @@ class TMPreproc:
             logger.info('generating DTM')
 
             if self.n_docs > 0:
-                # get partial DTMs for each worker's set of documents
-                workers_dtm_vocab = self._get_results_seq_from_workers('get_dtm')
-                w_dtms, w_doc_labels, w_vocab = zip(*workers_dtm_vocab)
-
-                # combine these to form a DTM of all documents
-                dtm, dtm_vocab, dtm_doc_labels = combine_sparse_matrices_columnwise(w_dtms, w_vocab, w_doc_labels,
-                                                                                    dtype=dtype)
-
-                # sort according to document labels
-                # dtm_vocab == self.vocabulary (both sorted) but dtm_doc_labels is not sorted
-                self._cur_dtm = dtm[np.argsort(dtm_doc_labels), :]
-                vocab = dtm_vocab.tolist()
+                # two-phase protocol: send the global sorted vocabulary to all workers, which then return the rows
+                # of the DTM for their documents in CSR format with column indices into the global vocabulary
+                vocab = self.get_vocabulary()
+                workers_rows = self._get_results_seq_from_workers('get_dtm', vocab=vocab)
+                w_doc_labels, w_row_nnz, w_indices, w_data = zip(*workers_rows)
+
+                # concatenate the rows of all workers in the order of the document labels
+                self._cur_dtm = _merge_csr_rows(flatten_list(w_doc_labels), np.concatenate(w_row_nnz),
+                                                np.concatenate(w_indices), np.concatenate(w_data),
+                                                n_cols=len(vocab), dtype=dtype or np.intc)
             else:
                 self._cur_dtm = csr_matrix((0, 0), dtype=dtype)  # empty sparse matrix
                 vocab = list()
@@ -1691,6 +2639,14 @@ class TMPreproc:
         else:
             return self._cur_dtm
 
+    def get_dtm_async(self, *args, **kwargs):
+        """
+        Same as :meth:`~TMPreproc.get_dtm`, but run in a background thread (see :meth:`~TMPreproc.submit`).
+
+        :return: :class:`concurrent.futures.Future` for the DTM
+        """
+        return self.submit('get_dtm', *args, **kwargs)
+
     @property
     def _workers_tokens(self):
         """
@@ -1770,14 +2726,14 @@ class TMPreproc:
         self._send_task_to_workers(task, key=key, data=data, default=default)
         self._cur_metadata_keys = None
 
-    def _create_state_object(self, deepcopy_attrs):
+    def _create_state_object(self, deepcopy_attrs, with_worker_states=True):
         """
         Create a state object as dict for the current instance by (deep) copying this instance' attributes and fetching
-        each workers' state.
+        each workers' state if `with_worker_states` is True.
         """
         state_attrs = {}
-        attr_blacklist = ('tasks_queues', 'results_queue', 'shutdown_event', 'worker_error_event',
-                          'workers', 'n_workers')
+        attr_blacklist = ('tasks_queues', 'results_queues', 'profile_queues', 'status_queues', 'shutdown_event',
+                          'worker_error_event', 'workers', 'n_workers', 'pool')
         for attr in dir(self):
             if attr.startswith('_') or attr in attr_blacklist:
                 continue
@@ -1791,96 +2747,133 @@ class TMPreproc:
             state_attrs[attr] = attr_obj
 
         # worker states
-        worker_states = self._get_results_seq_from_workers('get_state')
+        worker_states = self._get_results_seq_from_workers('get_state') if with_worker_states else None
 
         return {
             'manager_state': state_attrs,
             'worker_states': worker_states
         }
 
-    def _setup_workers(self, docs=None, initial_states=None, docs_are_tokenized=False):
+    def _setup_workers(self, docs=None, initial_states=None, docs_are_tokenized=False, state_files=None,
+                       binary_states=None):
         """
         Create worker processes and queues. Distribute the work evenly across worker processes. Optionally
-        send initial states defined in list `initial_states` to each worker process.
+        send initial states defined in list `initial_states` to each worker process or let each worker process load
+        its binary state from the respective file in `state_files` or from the respective
+        ``(document labels, binary state)`` tuple in `binary_states` (see :meth:`~TMPreproc.copy`).
         """
         if initial_states is not None:
             require_listlike_or_set(initial_states)
 
-        self.tasks_queues = []
-        self.results_queue = mp.Queue()
-        self.shutdown_event = mp.Event()
-        self.worker_error_event = mp.Event()
-        self.workers = []
+        if state_files is not None:
+            require_listlike(state_files)
+            binary_states = []
+            for state_file in state_files:
+                with np.load(state_file) as data:    # only loads the document labels
+                    binary_states.append((data['doc_labels'].tolist(), {'state_file': state_file}))
+        elif binary_states is not None:
+            require_listlike(binary_states)
+            binary_states = [(doc_labels, {'state': state}) for doc_labels, state in binary_states]
+
         self.docs2workers = {}
 
-        if initial_states is not None:
-            if docs is not None:
-                raise ValueError('`docs` must be None when loading from initial states')
-            logger.info('setting up %d worker processes with initial states' % len(initial_states))
+        if self.pool is None:
+            self.tasks_queues = []
+            self.results_queues = []
+            self.profile_queues = []
+            self.status_queues = []
+            self.shutdown_event = mp.Event()
+            self.worker_error_event = mp.Event()
+            self.workers = []
 
-            for i_worker, w_state in enumerate(initial_states):
-                task_q = mp.JoinableQueue()
+            if self.checkpoint_interval is not None:
+                self._checkpoint_dir = tempfile.mkdtemp(prefix='tmtoolkit_checkpoints_',
+                                                        dir=self._checkpoint_base_dir)
+        else:
+            if initial_states is not None:
+                raise ValueError('loading from initial states is not supported when attached to a worker pool')
+            if binary_states is not None and len(binary_states) > self.pool.n_workers:
+                raise ValueError('the state was saved with %d workers, but the worker pool only has %d workers'
+                                 % (len(binary_states), self.pool.n_workers))
 
-                w = PreprocWorker(i_worker, tasks_queue=task_q, results_queue=self.results_queue,
-                                  shutdown_event=self.shutdown_event,
-                                  worker_error_event=self.worker_error_event,
-                                  name='_PreprocWorker#%d' % i_worker,
-                                  nlp=None, language=self.language)
-                w.start()
+            self._attach_to_pool()
 
-                task_q.put(('set_state', w_state))
+        task_id = next(_task_ids)   # same task ID for the initial task of all workers
 
-                self.workers.append(w)
-                for dl in w_state['doc_labels']:
-                    self.docs2workers[dl] = i_worker
-                self.tasks_queues.append(task_q)
+        if initial_states is not None:
+            if docs is not None or binary_states is not None:
+                raise ValueError('`docs`, `state_files` and `binary_states` must be None when loading from initial '
+                                 'states')
+            logger.info('setting up %d worker processes with initial states' % len(initial_states))
+
+            self._start_task_profile(task_id)
+            n_init_tasks = len(initial_states)
+            init_task = 'set_state'
+
+            for i_worker, w_state in enumerate(initial_states):
+                self._start_worker(i_worker, nlp=None, doc_labels=w_state['doc_labels'])
+                self.tasks_queues[i_worker].put(self._task_item('set_state', w_state, task_id))
+        elif binary_states is not None:
+            if docs is not None:
+                raise ValueError('`docs` must be None when loading from binary states')
+            logger.info('setting up %d worker processes with binary states' % len(binary_states))
+
+            self._start_task_profile(task_id)
+            n_init_tasks = len(binary_states)
+            init_task = 'load_binary_state'
+
+            # the worker processes load the spaCy language model themselves
+            for i_worker, (doc_labels, task_kwargs) in enumerate(binary_states):
+                task_kwargs.update(language_model=self.language_model, spacy_opts=self._spacy_load_opts())
+                self._start_worker(i_worker, nlp=None, doc_labels=doc_labels)
+                self.tasks_queues[i_worker].put(self._task_item('load_binary_state', task_kwargs, task_id))
         else:
             if docs is None:
                 raise ValueError('`docs` must not be None when not loading from initial states')
-            if initial_states is not None:
-                raise ValueError('`initial_states` must be None when not loading from initial states')
 
-            spacy_opts = dict(disable=['parser', 'ner'])
-            spacy_opts.update(self.spacy_opts)
-            logger.debug('loading spaCy language model %s with options: %s'
-                         % (self.language_model, str(spacy_opts)))
-            nlp_instance = spacy.load(self.language_model, **spacy_opts)
+            nlp_instance = self._load_spacy_model()
 
             # distribute work evenly across the worker processes
             # we assume that the longer a document is, the longer the processing time for it is
             # hence we distribute the work evenly by document length
             logger.info('distributing work via greedy partitioning')
 
-            docs_and_lengths = {dl: len(doc) for dl, doc in docs.items()}
-            docs_per_worker = greedy_partitioning(docs_and_lengths, k=self.n_max_workers)
+            docs_and_lengths = {dl: _doc_weight(doc, docs_are_tokenized) for dl, doc in docs.items()}
+            if self.n_max_workers == 1:   # greedy_partitioning returns the input dict itself for a single partition
+                partitions = [docs_and_lengths]
+            else:
+                partitions = greedy_partitioning(docs_and_lengths, k=self.n_max_workers)
+            docs_per_worker = [dls for dls in partitions if dls]
+            self.docs_weights = docs_and_lengths
 
             logger.info('setting up %d worker processes' % len(docs_per_worker))
 
             # create worker processes
             for i_worker, doc_labels in enumerate(docs_per_worker):
                 if not doc_labels: continue
-                task_q = mp.JoinableQueue()
-
-                w = PreprocWorker(i_worker, tasks_queue=task_q, results_queue=self.results_queue,
-                                  shutdown_event=self.shutdown_event,
-                                  worker_error_event=self.worker_error_event,
-                                  name='_PreprocWorker#%d' % i_worker,
-                                  nlp=nlp_instance, language=self.language)
-                w.start()
-
-                self.workers.append(w)
-                for dl in doc_labels:
-                    self.docs2workers[dl] = i_worker
-                self.tasks_queues.append(task_q)
+                self._start_worker(i_worker, nlp=nlp_instance, doc_labels=doc_labels)
 
             # send init task
+            self._start_task_profile(task_id)
+            n_init_tasks = len(docs_per_worker)
+            init_task = 'init'
             for i_worker, doc_labels in enumerate(docs_per_worker):
-                self.tasks_queues[i_worker].put(('init', dict(docs={dl: docs[dl] for dl in doc_labels},
-                                                              docs_are_tokenized=docs_are_tokenized,
-                                                              enable_vectors=self.vectors_enabled)))
+                task_kwargs = dict(docs={dl: docs[dl] for dl in doc_labels},
+                                   docs_are_tokenized=docs_are_tokenized,
+                                   enable_vectors=self.vectors_enabled)
+                self.tasks_queues[i_worker].put(self._task_item('init', task_kwargs, task_id))
 
         # process the initial task
-        [q.join() for q in self.tasks_queues]
+        if self.checkpoint_interval is None:
+            [q.join() for q in self.tasks_queues]
+        else:
+            failures = self._collect_worker_status(task_id, range(len(self.tasks_queues)))
+            if failures:   # there's no checkpoint to restore the workers from yet
+                self._profile_pending.pop(task_id, None)
+                self.shutdown_workers(force=True)
+                raise WorkerTaskError(init_task, failures)
+
+        self._collect_task_profile(task_id, range(n_init_tasks))
 
         # a worker may set the shutdown signal (when an exception occurs during init or set_state)
         if self.shutdown_event.is_set():
@@ -1888,10 +2881,174 @@ class TMPreproc:
 
         self.n_workers = len(self.workers)
 
+        if self.checkpoint_interval is not None:
+            self._task_logs = [[] for _ in range(self.n_workers)]
+            self._checkpoint_workers()
+
+    def _load_spacy_model(self):
+        """Load the spaCy language model for this instance or return the model of the worker pool."""
+        if self.pool is not None:
+            return self.pool.nlp
+
+        spacy_opts = self._spacy_load_opts()
+        logger.debug('loading spaCy language model %s with options: %s' % (self.language_model, str(spacy_opts)))
+
+        return spacy.load(self.language_model, **spacy_opts)
+
+    def _spacy_load_opts(self):
+        """Return the options passed to ``spacy.load()`` for this instance's spaCy language model."""
+        spacy_opts = dict(disable=['parser', 'ner'])
+        spacy_opts.update(self.spacy_opts)
+        return spacy_opts
+
+    def _start_worker(self, i_worker, nlp, doc_labels):
+        """
+        Create and start a worker process with ID `i_worker` and spaCy language model instance `nlp` that will
+        process the documents `doc_labels`. When attached to a worker pool, the pool's worker process with ID
+        `i_worker` is already running and is only assigned the documents.
+        """
+        if self.pool is not None:
+            for dl in doc_labels:
+                self.docs2workers[dl] = i_worker
+            return
+
+        w, task_q, results_q, profile_q, status_q = self._create_worker(i_worker, nlp)
+
+        self.workers.append(w)
+        for dl in doc_labels:
+            self.docs2workers[dl] = i_worker
+        self.tasks_queues.append(task_q)
+        self.results_queues.append(results_q)
+        self.profile_queues.append(profile_q)
+        self.status_queues.append(status_q)
+
+    def _create_worker(self, i_worker, nlp):
+        """
+        Create and start a worker process with ID `i_worker` and spaCy language model instance `nlp`. Return the
+        worker process and its tasks, results, profile and status queues (the latter is None if checkpointing is
+        disabled). Each worker has its own queues, because a worker process that dies while sending to a queue leaves
+        the queue's lock acquired, which would block all other workers sending to the same queue.
+        """
+        task_q = mp.JoinableQueue()
+        results_q = mp.Queue()
+        profile_q = mp.Queue()
+        status_q = mp.Queue() if self.checkpoint_interval is not None else None
+
+        w = PreprocWorker(i_worker, tasks_queue=task_q, results_queue=results_q,
+                          shutdown_event=self.shutdown_event,
+                          worker_error_event=self.worker_error_event,
+                          name='_PreprocWorker#%d' % i_worker,
+                          nlp=nlp, language=self.language,
+                          use_shared_memory=self.use_shared_memory,
+                          use_token_ids=self.use_token_ids,
+                          profile_queue=profile_q,
+                          profile=self._profile,
+                          batch_size=self.batch_size,
+                          threads_per_worker=self.threads_per_worker,
+                          compact_threshold=self.compact_threshold,
+                          status_queue=status_q,
+                          use_token_index=self.use_token_index)
+        w.start()
+
+        return w, task_q, results_q, profile_q, status_q
+
+    def _attach_to_pool(self):
+        """Open a new session on the worker pool and use the pool's worker processes and queues."""
+        if not self.pool.alive:
+            raise RuntimeError('the worker pool is shut down')
+
+        if self.language_model != self.pool.language_model:
+            raise ValueError('language model `%s` does not match the worker pool\'s language model `%s`'
+                             % (self.language_model, self.pool.language_model))
+
+        logger.info('attaching to worker pool `%s` with %d workers' % (self.pool.name, self.pool.n_workers))
+
+        self._pool_session = self.pool.attach(use_shared_memory=self.use_shared_memory,
+                                              use_token_ids=self.use_token_ids,
+                                              profile=self._profile,
+                                              batch_size=self.batch_size,
+                                              threads_per_worker=self.threads_per_worker,
+                                              compact_threshold=self.compact_threshold,
+                                              use_token_index=self.use_token_index)
+        self.tasks_queues = self.pool.tasks_queues
+        # the pool's workers share a results and a profile queue
+        self.results_queues = [self.pool.results_queue] * len(self.tasks_queues)
+        self.profile_queues = [self.pool.profile_queue] * len(self.tasks_queues)
+        self.shutdown_event = self.pool.shutdown_event
+        self.worker_error_event = self.pool.worker_error_event
+        self.workers = list(self.pool.workers)
+
+    def _detach_from_pool(self, force=False):
+        """
+        Close this instance's session on the worker pool, which removes this instance's documents from the pool's
+        workers, and stop using the pool's worker processes and queues.
+        """
+        if self._pool_session is None:
+            return
+
+        session_id = self._pool_session
+        self._pool_session = None
+        self._pending_tasks = []
+        self._rebalance_pending = False
+
+        self.workers = []
+        self.tasks_queues = None
+        self.results_queues = None
+        self.profile_queues = None
+        self.shutdown_event = None
+        self.worker_error_event = None
+        self.docs2workers = {}
+        self.n_workers = 0
+        self._profile_pending = {}
+
+        self._shm_blocks = release_shared_blocks(self._shm_blocks)
+
+        if not force:
+            try:   # may cause exception when the logger is actually already destroyed
+                logger.info('detaching from worker pool `%s`' % self.pool.name)
+            except: pass
+
+            self.pool.release(session_id)
+
+    def _task_item(self, task, kwargs, task_id=None):
+        """
+        Create the item for task `task` with parameters `kwargs` that is put into a worker's task queue. Besides the
+        task name and its parameters, a task item contains the session ID when attached to a worker pool (otherwise
+        None) and the task ID `task_id` with which the worker tags the results of this task. If `task_id` is None, a
+        new task ID is generated.
+        """
+        if task_id is None:
+            task_id = next(_task_ids)
+
+        return task, kwargs, self._pool_session, task_id
+
+    def _distribute_new_docs(self, docs):
+        """
+        Distribute new documents `docs` across the existing workers by continuing the greedy partitioning of the
+        current documents' weights, i.e. each new document is assigned to the currently least loaded worker.
+        Returns a list with the new documents' labels for each worker.
+        """
+        workers_load = [0] * self.n_workers
+        for dl, i_worker in self.docs2workers.items():
+            workers_load[i_worker] += self.docs_weights.get(dl, 0)
+
+        docs_and_lengths = {dl: _doc_weight(doc, docs_are_tokenized=False) for dl, doc in docs.items()}
+        docs_per_worker = [[] for _ in range(self.n_workers)]
+
+        for dl, weight in sorted(docs_and_lengths.items(), key=lambda x: x[1], reverse=True):
+            i_worker = int(np.argmin(workers_load))
+            docs_per_worker[i_worker].append(dl)
+            workers_load[i_worker] += weight
+
+        self.docs_weights.update(docs_and_lengths)
+
+        return docs_per_worker
+
     def _send_task_to_workers(self, task, **kwargs):
         """
         Send the task identified by string `task` to all workers passing additional task parameters via `kwargs`.
-        Run these tasks and parallel and wait until all are finished.
+        Run these tasks and parallel and wait until all are finished. Return the task ID with which the workers tag
+        the results of this task or None if the task was not sent.
         """
         if not (self.tasks_queues and self.workers) and not kwargs.get('force', False):
             return
@@ -1901,25 +3058,55 @@ class TMPreproc:
 
         if shutdown:
             force_shutdown = kwargs.get('force', False)
+            self._pending_tasks = []
+            self._rebalance_pending = False
         else:
             if self.shutdown_event.is_set():   # already during shutdown
                 return
             force_shutdown = False
 
+            if self.lazy and task in FUSABLE_TASKS:
+                logger.debug('deferring task `%s`' % task)
+                self._pending_tasks.append(task_item)
+                self.pipeline.add_step(*task_item)
+                return
+
+            # all deferred tasks must be run before this task
+            self._run_pending_tasks()
+
+        task_id = None
         if not force_shutdown:
             logger.debug('sending task `%s` to all workers' % task)
 
-            # put the task in each worker's task queue
-            [q.put(task_item) for q in self.tasks_queues]
+            with self._lock:
+                # put the task in each worker's task queue
+                if shutdown:
+                    [q.put(None) for q in self.tasks_queues]
 
-            logger.debug('waiting for join()')
+                    # run join() on each worker's task queue in order to wait for the workers to shut down; with
+                    # checkpointing enabled, a dead worker would block join(), hence the workers are joined below
+                    if self.checkpoint_interval is None:
+                        [q.join() for q in self.tasks_queues]
+                else:
+                    task_id = next(_task_ids)
+                    self._start_task_profile(task_id)
+                    [q.put(self._task_item(*task_item, task_id=task_id)) for q in self.tasks_queues]
 
-            # run join() on each worker's task queue in order to wait for the tasks to finish
-            [q.join() for q in self.tasks_queues]
+                    logger.debug('waiting for workers')
+                    self._wait_for_workers(task_id, task, dict.fromkeys(range(len(self.tasks_queues)), kwargs))
+                    self._collect_task_profile(task_id, range(len(self.tasks_queues)))
 
             # a worker may set the shutdown signal (when an exception occurs)
             shutdown = self.shutdown_event.is_set()
 
+            if not shutdown and task in REPLAYABLE_TASKS:
+                self.pipeline.add_step(*task_item)
+
+        if shutdown and self.pool is not None:
+            # a worker process of the pool failed, hence all of the pool's worker processes shut down
+            self._detach_from_pool(force=True)
+            raise RuntimeError('an error occurred in at least one of the worker processes')
+
         if shutdown:
             logger.debug('shutting down worker processes')
 
@@ -1950,15 +3137,26 @@ class TMPreproc:
                     _drain_queue(q)
                 self.tasks_queues = None
 
-            if self.results_queue:
-                _drain_queue(self.results_queue)
-                self.results_queue = None
+            for attr in ('results_queues', 'profile_queues', 'status_queues'):
+                for q in getattr(self, attr) or []:
+                    if q is not None:
+                        _drain_queue(q)
+                setattr(self, attr, None)
+            self._profile_pending = {}
+
+            if self._checkpoint_dir is not None:
+                shutil.rmtree(self._checkpoint_dir, ignore_errors=True)
+                self._checkpoint_dir = None
+            self._task_logs = []
+            self._n_tasks_since_checkpoint = 0
 
             self.docs2workers = {}
             self.n_workers = 0
 
             self.shutdown_event = None
 
+            self._shm_blocks = release_shared_blocks(self._shm_blocks)
+
             if self.worker_error_event.is_set():
                 raise RuntimeError('an error occurred in at least one of the worker processes')
 
@@ -1966,15 +3164,394 @@ class TMPreproc:
 
             logger.debug('worker processes shut down finished')
 
+        return task_id
+
+    def _check_worker_error(self):
+        """
+        Check whether a worker process signaled an error. If so, shut down all worker processes and raise a
+        RuntimeError.
+        """
+        if self.shutdown_event is not None and self.shutdown_event.is_set() and self.worker_error_event.is_set():
+            self._send_task_to_workers(None, force=True)
+            raise RuntimeError('an error occurred in at least one of the worker processes')
+
+    def _auto_rebalance_workers(self):
+        """
+        Rebalance the workers' load if automatic rebalancing is enabled via `rebalance_threshold`. In lazy mode, the
+        rebalancing is deferred until the pending tasks are run, because fetching the workers' load would run the
+        pending tasks and split up the fused pipeline.
+        """
+        if self.rebalance_threshold is None:
+            return
+
+        if self.lazy:
+            self._rebalance_pending = True
+        else:
+            self.rebalance_workers(self.rebalance_threshold)
+
+    def _run_pending_tasks(self):
+        """
+        Send all tasks that were deferred in lazy mode to the workers as a single task. If automatic rebalancing was
+        deferred, the workers are rebalanced before.
+        """
+        if not self._pending_tasks:
+            return
+
+        pending_tasks = self._pending_tasks
+        self._pending_tasks = []
+
+        if self._rebalance_pending:
+            self._rebalance_pending = False
+            self.rebalance_workers(self.rebalance_threshold)
+
+        logger.info('running %d deferred tasks' % len(pending_tasks))
+        self._send_task_to_workers('run_pipeline', steps=pending_tasks)
+
     def _get_results_seq_from_workers(self, task, **kwargs):
         """
         Send the task identified by string `task` to all workers passing additional task parameters via `kwargs`. After
         the tasks are finished, collect the results in a list with individual results for each worker and return it.
         """
         logger.debug('getting results sequence for task `%s` from all workers' % task)
-        self._send_task_to_workers(task, **kwargs)
 
-        return [self.results_queue.get() for _ in range(self.n_workers)]
+        with self._lock:
+            task_id = self._send_task_to_workers(task, **kwargs)
+            self._check_worker_error()   # the task is not sent when the workers are shutting down after an error
+            results = self._collect_results(task_id, range(self.n_workers))
+
+        if self.use_shared_memory:
+            # map the shared memory blocks of the results; the block handles are kept until the cached results
+            # are invalidated
+            results = [unpack_result(res, self._shm_blocks) for res in results]
+
+        return results
+
+    def _get_results_from_workers(self, task, workers_kwargs, shm_blocks=None, unpack=True):
+        """
+        Send the task identified by string `task` only to the workers whose IDs are the keys in dict `workers_kwargs`
+        passing the respective dict values as task parameters. Collect the results in a list ordered by worker ID and
+        return it. When shared memory is used, the mapped shared memory blocks are appended to the list `shm_blocks`
+        if given; otherwise they're kept until the cached results are invalidated. If `unpack` is False, shared memory
+        descriptors are returned without mapping their blocks.
+        """
+        logger.debug('getting results for task `%s` from %d workers' % (task, len(workers_kwargs)))
+
+        # all deferred tasks must be run before this task
+        self._run_pending_tasks()
+
+        task_id = next(_task_ids)
+        with self._lock:
+            self._check_worker_error()
+            self._start_task_profile(task_id)
+            for i_worker, kwargs in workers_kwargs.items():
+                self.tasks_queues[i_worker].put(self._task_item(task, kwargs, task_id))
+
+            if self.checkpoint_interval is not None:
+                self._wait_for_workers(task_id, task, workers_kwargs)
+
+            results = self._collect_results(task_id, workers_kwargs.keys())
+            self._collect_task_profile(task_id, workers_kwargs.keys())
+
+        if self.use_shared_memory and unpack:
+            results = [unpack_result(res, self._shm_blocks if shm_blocks is None else shm_blocks) for res in results]
+
+        return results
+
+    def _collect_results(self, task_id, worker_ids):
+        """
+        Collect the results for the task `task_id` from the results queues of the workers in `worker_ids`. Results of
+        other tasks (e.g. of an aborted task) are discarded. Return the results as list ordered by worker ID. If a
+        worker process fails while waiting for the results, all worker processes are shut down and a RuntimeError is
+        raised.
+        """
+        pending = set(worker_ids)
+        results = {}
+        try:
+            while pending:
+                try:
+                    res_task_id, worker_id, res = \
+                        self.results_queues[min(pending)].get(timeout=WORKER_POLL_INTERVAL)
+                except queue.Empty:
+                    self._check_worker_error()
+                    continue
+
+                if res_task_id != task_id:
+                    if res_task_id not in self._stale_task_ids:
+                        logger.warning('discarding result of task %s from worker #%d while waiting for results of '
+                                       'task %s' % (res_task_id, worker_id, task_id))
+                    self._discard_result(res)
+                    continue
+
+                if isinstance(res, SerializedResult):   # profiling is enabled
+                    t_start = time.perf_counter()
+                    res = res.load()
+                    profile = self._profile_pending.get(task_id)
+                    if profile is not None:
+                        profile['deserialize_times'][worker_id] = time.perf_counter() - t_start
+
+                results[worker_id] = res
+                pending.discard(worker_id)
+        except Exception:
+            # release the shared memory blocks of the results collected so far
+            for res in results.values():
+                self._discard_result(res)
+            raise
+
+        profile = self._profile_pending.get(task_id)
+        if profile is not None:
+            profile['results_collected'] = True
+            self._finish_task_profile(task_id)
+
+        return [res for _, res in sorted(results.items(), key=lambda x: x[0])]
+
+    @staticmethod
+    def _discard_result(res):
+        """Discard the result `res` that was received from a worker, releasing its shared memory block if it has one."""
+        if isinstance(res, SerializedResult):
+            res = res.load()
+        discard_result(res)
+
+    def _run_task_on_workers(self, task, workers_kwargs):
+        """
+        Send the task identified by string `task` only to the workers whose IDs are the keys in dict `workers_kwargs`
+        passing the respective dict values as task parameters and wait until all workers are finished. In contrast to
+        :meth:`~TMPreproc._get_results_from_workers`, no results are collected. If a worker process fails, all worker
+        processes are shut down and a RuntimeError is raised.
+        """
+        task_id = next(_task_ids)
+        with self._lock:
+            self._check_worker_error()
+            self._start_task_profile(task_id)
+            for i_worker, kwargs in workers_kwargs.items():
+                self.tasks_queues[i_worker].put(self._task_item(task, kwargs, task_id))
+
+            self._wait_for_workers(task_id, task, workers_kwargs)
+            self._check_worker_error()
+            self._collect_task_profile(task_id, workers_kwargs.keys())
+
+    def _wait_for_workers(self, task_id, task, workers_kwargs):
+        """
+        Wait until the workers whose IDs are the keys in dict `workers_kwargs` finished the task `task` with ID
+        `task_id` that was sent to them with the respective dict values as task parameters. When checkpointing is
+        enabled, failed workers are restored (see :meth:`~TMPreproc._recover_workers`), tasks that modify the documents
+        are logged so that they can be replayed on restored workers and the workers save a checkpoint after every
+        `checkpoint_interval` of these tasks.
+        """
+        if self.checkpoint_interval is None:
+            [self.tasks_queues[i_worker].join() for i_worker in workers_kwargs]
+            return
+
+        failures = self._collect_worker_status(task_id, workers_kwargs.keys())
+        if failures:
+            self._recover_workers(task_id, task, workers_kwargs, failures)
+
+        if task not in READ_ONLY_TASKS:
+            for i_worker, kwargs in workers_kwargs.items():
+                self._task_logs[i_worker].append((task, kwargs))
+
+            self._n_tasks_since_checkpoint += 1
+            if self._n_tasks_since_checkpoint >= self.checkpoint_interval:
+                self._checkpoint_workers()
+
+    def _collect_worker_status(self, task_id, worker_ids):
+        """
+        Wait for the status of the task `task_id` from each worker in `worker_ids` when checkpointing is enabled.
+        Workers that die without reporting a status (e.g. because they were killed by the operating system when running
+        out of memory) are detected by regularly checking whether they're still alive. Return a dict that maps the IDs
+        of failed workers to a dict with the error message ``"error"``, the label of the document that caused the error
+        ``"doc_label"`` (None if unknown) and ``"exception"`` which is True if the task raised an exception.
+        """
+        pending = set(worker_ids)
+        failures = {}
+
+        while pending:
+            try:
+                res_task_id, worker_id, failure = self.status_queues[min(pending)].get(timeout=WORKER_POLL_INTERVAL)
+            except queue.Empty:
+                for i_worker in list(pending):
+                    w = self.workers[i_worker]
+                    if not w.is_alive():
+                        failures[i_worker] = {
+                            'error': 'worker process died with exit code %s' % str(w.exitcode),
+                            'doc_label': None,
+                            'exception': False
+                        }
+                        pending.remove(i_worker)
+                continue
+
+            if res_task_id != task_id or worker_id not in pending:   # status of an already handled task
+                continue
+
+            pending.remove(worker_id)
+            if failure is not None:
+                failures[worker_id] = dict(failure, exception=True)
+
+        return failures
+
+    def _recover_workers(self, task_id, task, workers_kwargs, failures):
+        """
+        Recover from the `failures` (as returned from :meth:`~TMPreproc._collect_worker_status`) of the task `task` with
+        ID `task_id` that was sent to the workers in `workers_kwargs`. The failed workers are restored from their last
+        checkpoint. If none of them failed because of an exception (e.g. they ran out of memory), the task is run once
+        more on the restored workers. If the task fails again or if it raised an exception, the workers that finished
+        the task are restored, too, so that all workers are in their state before the task, and a
+        :class:`WorkerTaskError` is raised.
+        """
+        logger.warning('task `%s` failed on %d worker(s)' % (task, len(failures)))
+
+        for i_worker in failures:
+            self._restore_worker(i_worker)
+
+        if not any(f['exception'] for f in failures.values()):
+            logger.info('running task `%s` again on %d restored worker(s)' % (task, len(failures)))
+
+            for i_worker in failures:
+                self.tasks_queues[i_worker].put(self._task_item(task, workers_kwargs[i_worker], task_id))
+
+            failures = self._collect_worker_status(task_id, failures.keys())
+            if not failures:
+                return
+
+            for i_worker in failures:
+                self._restore_worker(i_worker)
+
+        if task not in READ_ONLY_TASKS:
+            for i_worker in workers_kwargs:
+                if i_worker not in failures:
+                    self._restore_worker(i_worker)
+
+        self._stale_task_ids.add(task_id)
+        self._profile_pending.pop(task_id, None)
+
+        raise WorkerTaskError(task, failures)
+
+    def _restore_worker(self, i_worker):
+        """
+        Replace the worker process `i_worker` by a new worker process that loads the last checkpoint of this worker and
+        replays the tasks that were sent to this worker since then.
+        """
+        w = self.workers[i_worker]
+        if w.is_alive():
+            # let the worker process exit by itself and terminate it only if it doesn't
+            self.tasks_queues[i_worker].put(None)
+            w.join(WORKER_EXIT_TIMEOUT)
+            if w.is_alive():
+                w.terminate()
+        w.join()
+        for q in (self.tasks_queues[i_worker], self.results_queues[i_worker], self.profile_queues[i_worker],
+                  self.status_queues[i_worker]):
+            _drain_queue(q)
+
+        task_log = self._task_logs[i_worker]
+        logger.warning('restarting worker #%d from its last checkpoint and replaying %d task(s)'
+                       % (i_worker, len(task_log)))
+
+        (self.workers[i_worker], self.tasks_queues[i_worker], self.results_queues[i_worker],
+         self.profile_queues[i_worker], self.status_queues[i_worker]) = self._create_worker(i_worker, nlp=None)
+
+        # the new worker process loads the spaCy language model itself
+        load_kwargs = dict(checkpoint_file=self._checkpoint_file(i_worker), language_model=self.language_model,
+                           spacy_opts=self._spacy_load_opts())
+        for task, kwargs in [('load_checkpoint', load_kwargs)] + task_log:
+            task_id = next(_task_ids)
+            self._stale_task_ids.add(task_id)    # results of replayed tasks are discarded
+            self.tasks_queues[i_worker].put(self._task_item(task, kwargs, task_id))
+
+            if self._collect_worker_status(task_id, [i_worker]):
+                self.shutdown_workers(force=True)
+                raise RuntimeError('worker #%d could not be restored from its last checkpoint' % i_worker)
+
+    def _checkpoint_workers(self):
+        """
+        Let each worker save a checkpoint of its state. The task log of a worker is cleared after its checkpoint was
+        saved. A worker that fails while saving its checkpoint is restored from its previous checkpoint.
+        """
+        logger.debug('saving checkpoints of %d workers' % len(self.tasks_queues))
+
+        task_id = next(_task_ids)
+        for i_worker, q in enumerate(self.tasks_queues):
+            q.put(self._task_item('save_checkpoint', {'checkpoint_file': self._checkpoint_file(i_worker)}, task_id))
+
+        failures = self._collect_worker_status(task_id, range(len(self.tasks_queues)))
+
+        for i_worker in range(len(self.tasks_queues)):
+            if i_worker in failures:
+                self._restore_worker(i_worker)
+            else:
+                self._task_logs[i_worker] = []
+
+        self._n_tasks_since_checkpoint = 0
+
+    def _checkpoint_file(self, i_worker):
+        """Path to the checkpoint file of worker `i_worker`."""
+        return os.path.join(self._checkpoint_dir, 'worker_%03d.npz' % i_worker)
+
+    def _start_task_profile(self, task_id):
+        """Start profiling the task `task_id` if profiling is enabled."""
+        if self._profile:
+            self._profile_pending[task_id] = {
+                't_start': time.perf_counter(),
+                'records': None,
+                'results_collected': False,
+                'deserialize_times': {},
+            }
+
+    def _collect_task_profile(self, task_id, worker_ids):
+        """
+        Collect the profiles of task `task_id` from the workers in `worker_ids` after the task was finished by all of
+        these workers. The task profile is finished if the task doesn't produce any results or if its results were already
+        collected; otherwise it is finished after collecting the results in :meth:`~TMPreproc._collect_results`.
+        """
+        profile = self._profile_pending.get(task_id)
+        if profile is None:
+            return
+
+        if self.shutdown_event.is_set():   # failed task; workers don't send a profile
+            del self._profile_pending[task_id]
+            return
+
+        pending = set(worker_ids)
+        records = {}
+        while pending:
+            rec = self.profile_queues[min(pending)].get()
+
+            if rec['task_id'] != task_id:
+                logger.debug('discarding profile of task %s from worker #%d while waiting for profile of task %s'
+                             % (rec['task_id'], rec['worker'], task_id))
+                continue
+
+            records[rec['worker']] = rec
+            pending.discard(rec['worker'])
+
+        profile['records'] = records
+
+        if profile['results_collected'] or not any(rec['n_results'] > 0 for rec in records.values()):
+            self._finish_task_profile(task_id)
+
+    def _finish_task_profile(self, task_id):
+        """Store the finished profile of task `task_id` and pass it to the profile callbacks."""
+        profile = self._profile_pending[task_id]
+        if profile['records'] is None:   # profiles not collected yet
+            return
+
+        del self._profile_pending[task_id]
+        wall_time = time.perf_counter() - profile['t_start']
+
+        records = []
+        for worker_id, rec in sorted(profile['records'].items(), key=lambda x: x[0]):
+            rec = dict(rec)
+            del rec['n_results']
+            rec['deserialize_time'] = profile['deserialize_times'].get(worker_id, 0.0)
+            rec['wall_time'] = wall_time
+            # time this worker spent waiting for other workers or for transferring data
+            rec['wait_time'] = max(wall_time - rec['compute_time'] - rec['serialize_time'] - rec['deserialize_time'],
+                                   0.0)
+            records.append(rec)
+
+        self._profile_records.extend(records)
+
+        for callback in self._profile_callbacks:
+            callback(records)
 
     def _invalidate_docs_info(self):
         """Invalidate cached data related to document information (such as document labels)."""
@@ -1991,6 +3568,7 @@ class TMPreproc:
         self._cur_workers_vocab_doc_freqs = None
         self._cur_vocab_counts = None
         self._cur_dtm = None
+        self._shm_blocks = release_shared_blocks(self._shm_blocks)
 
     def _invalidate_workers_ngrams(self):
         """Invalidate cached data related to worker ngrams."""
@@ -2025,6 +3603,43 @@ class TMPreproc:
 
 
 
+def _doc_weight(doc, docs_are_tokenized):
+    """
+    Weight of a document used for distributing the documents across worker processes. We assume that the longer a
+    document is, the longer the processing time for it is, hence the weight is the number of characters.
+    """
+    if docs_are_tokenized:
+        return sum(map(len, doc['token']))
+    else:
+        return len(doc)
+
+
+def _merge_csr_rows(row_labels, row_nnz, indices, data, n_cols, dtype):
+    """
+    Create a sparse matrix in CSR format with `n_cols` columns from rows in arbitrary order given as number of non-zero
+    entries per row `row_nnz` and column indices `indices` and values `data` of the non-zero entries of all rows. The
+    rows of the resulting matrix are sorted by their labels `row_labels`.
+    """
+    order = np.argsort(np.array(row_labels))
+    src_indptr = np.concatenate(([0], np.cumsum(row_nnz)))    # row offsets in `indices` and `data`
+
+    nnz = row_nnz[order]
+    indptr = np.concatenate(([0], np.cumsum(nnz)))
+
+    # positions of the non-zero entries of the sorted rows in `indices` and `data`
+    src_pos = np.repeat(src_indptr[:-1][order] - indptr[:-1], nnz) + np.arange(indptr[-1])
+
+    return csr_matrix((data[src_pos].astype(dtype), indices[src_pos], indptr), shape=(len(row_labels), n_cols))
+
+
+def _is_pickable(obj):
+    try:
+        pickle.dumps(obj)
+        return True
+    except Exception:
+        return False
+
+
 def _drain_queue(q):
     try:
         while not q.empty():
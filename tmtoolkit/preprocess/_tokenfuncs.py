@@ -39,28 +39,60 @@ def token_match(pattern, tokens, match_type='exact', ignore_case=False, glob_met
     if not isinstance(tokens, np.ndarray):
         tokens = np.array(tokens)
 
-    ignore_case_flag = dict(flags=re.IGNORECASE) if ignore_case else {}
+    if match_type == 'exact' and not ignore_case:
+        return tokens == pattern
 
-    if match_type == 'exact':
-        return np.char.lower(tokens) == pattern.lower() if ignore_case else tokens == pattern
-    elif match_type == 'regex':
-        if isinstance(pattern, str):
-            pattern = re.compile(pattern, **ignore_case_flag)
-        vecmatch = np.vectorize(lambda x: bool(pattern.search(x)))
-        return vecmatch(tokens)
-    else:
-        if glob_method not in {'search', 'match'}:
-            raise ValueError("`glob_method` must be one of `'search', 'match'`")
+    # match the pattern only once against each unique token
+    vocab, token_ids = np.unique(tokens, return_inverse=True)
+
+    return vocab_match([pattern], vocab, match_type=match_type, ignore_case=ignore_case,
+                       glob_method=glob_method)[token_ids]
+
+
+def vocab_match(patterns, vocab, match_type='exact', ignore_case=False, glob_method='match'):
+    """
+    Return a boolean NumPy array signaling for each string in `vocab` whether it matches *any* of the patterns in
+    `patterns`. Uses the same matching options as :func:`~tmtoolkit.preprocess.token_match`, but each string is
+    matched only once against all patterns: patterns that are given as strings are combined into a single regular
+    expression (unless they contain groups or inline flags, which may conflict when combined). Hence `vocab` should
+    contain unique strings, e.g. the result of ``np.unique(tokens, return_inverse=True)``, whose inverse index can then
+    be used to get the matches for `tokens`.
+
+    :param patterns: sequence of strings or compiled RE patterns used for matching against `vocab`
+    :param vocab: list or NumPy array of (unique) strings
+    :param match_type: one of: 'exact', 'regex', 'glob'; if 'regex', `patterns` must be RE patterns; if `glob`,
+                       `patterns` must be "glob" patterns like "hello w*" (see https://github.com/metagriffin/globre)
+    :param ignore_case: if True, ignore case for matching
+    :param glob_method: if `match_type` is 'glob', use this glob method. Must be 'match' or 'search' (similar
+                        behavior as Python's `re.match` or `re.search`)
+    :return: 1D boolean NumPy array of length ``len(vocab)``
+    """
+    if match_type not in {'exact', 'regex', 'glob'}:
+        raise ValueError("`match_type` must be one of `'exact', 'regex', 'glob'`")
+
+    if match_type == 'glob' and glob_method not in {'search', 'match'}:
+        raise ValueError("`glob_method` must be one of `'search', 'match'`")
+
+    if len(vocab) == 0:
+        return np.array([], dtype=bool)
 
-        if isinstance(pattern, str):
-            pattern = globre.compile(pattern, **ignore_case_flag)
+    if not isinstance(vocab, np.ndarray):
+        vocab = np.array(vocab)
 
-        if glob_method == 'search':
-            vecmatch = np.vectorize(lambda x: bool(pattern.search(x)))
+    if match_type == 'exact':
+        if ignore_case:
+            return np.isin(np.char.lower(vocab), [pat.lower() for pat in patterns])
         else:
-            vecmatch = np.vectorize(lambda x: bool(pattern.match(x)))
+            return np.isin(vocab, list(patterns))
+
+    matches = np.repeat(False, len(vocab))
+    use_match = match_type == 'glob' and glob_method == 'match'
 
-        return vecmatch(tokens) if len(tokens) > 0 else np.array([], dtype=bool)
+    for pattern in _compile_patterns(patterns, match_type, flags=re.IGNORECASE if ignore_case else 0):
+        match_fn = pattern.match if use_match else pattern.search
+        matches |= np.fromiter((match_fn(t) is not None for t in vocab), dtype=bool, count=len(vocab))
+
+    return matches
 
 
 def token_match_subsequent(patterns, tokens, **kwargs):
@@ -134,6 +166,35 @@ def token_match_subsequent(patterns, tokens, **kwargs):
     return list(map(lambda i: np.arange(i - n_pat + 1, i + 1), match_indices))
 
 
+def token_match_phrases(phrases, tokens, ignore_case=False):
+    """
+    Find the occurrences of all phrases in `phrases` in `tokens` in a single pass over the tokens. Each phrase is
+    either a string whose whitespace-separated parts are the phrase's tokens (e.g. ``"European Union"``) or a sequence
+    of tokens; it must consist of at least two tokens. Tokens are compared by exact string equality. The phrases are
+    stored in a token-level trie, so that all phrases are matched at once. If several phrases start at the same
+    position, the longest phrase is matched. Matches don't overlap, i.e. after a match the search continues right
+    after the last matched token.
+
+    The results are returned in the same format as by :func:`~tmtoolkit.preprocess.token_match_subsequent`, so they
+    can be passed to :func:`~tmtoolkit.preprocess.token_glue_subsequent`.
+
+    Example::
+
+        tokens = ['the', 'European', 'Union', 'and', 'the', 'European', 'Central', 'Bank']
+
+        token_match_phrases(['European Union', 'European Central Bank', 'Central Bank'], tokens)
+        # [array([1, 2]), array([5, 6, 7])]
+
+    .. seealso:: :func:`~tmtoolkit.preprocess.token_match_subsequent`
+
+    :param phrases: sequence of phrases, each given as string or as sequence of tokens
+    :param tokens: a sequence of tokens to be matched
+    :param ignore_case: if True, ignore case for matching
+    :return: list of NumPy arrays with subsequent indices into `tokens` for each match
+    """
+    return _match_phrase_trie(_phrase_trie(phrases, ignore_case=ignore_case), tokens, ignore_case=ignore_case)
+
+
 def token_glue_subsequent(tokens, matches, glue='_', return_glued=False):
     """
     Select subsequent tokens as defined by list of indices `matches` (e.g. output of
@@ -427,6 +488,93 @@ def make_index_window_around_matches(matches, left, right, flatten=False, remove
         return [w[(w >= 0) & (w < len(matches))] for w in nested_ind]
 
 
+def _phrase_trie(phrases, ignore_case):
+    """
+    Build a token-level trie from `phrases` (see :func:`token_match_phrases`) as nested dicts that map a token to the
+    next node of the trie. A node that completes a phrase contains the key None.
+    """
+    require_listlike_or_set(phrases)
+
+    if not phrases:
+        raise ValueError('`phrases` must not be empty')
+
+    trie = {}
+    for phrase in phrases:
+        phrase_tokens = phrase.split() if isinstance(phrase, str) else list(phrase)
+
+        if len(phrase_tokens) < 2:
+            raise ValueError('each phrase must consist of at least two tokens')
+
+        node = trie
+        for t in phrase_tokens:
+            node = node.setdefault(t.lower() if ignore_case else t, {})
+        node[None] = True
+
+    return trie
+
+
+def _match_phrase_trie(trie, tokens, ignore_case):
+    """
+    Match the phrases in `trie` as built by :func:`_phrase_trie` against `tokens`. See :func:`token_match_phrases`.
+    """
+    if isinstance(tokens, np.ndarray):
+        tokens = tokens.tolist()
+
+    if ignore_case:
+        tokens = [t.lower() for t in tokens]
+
+    n_tok = len(tokens)
+    matches = []
+    i = 0
+    while i < n_tok:
+        # follow the trie as far as possible from position i and remember the end of the longest complete phrase
+        node = trie.get(tokens[i])
+        end = None
+        j = i
+        while node is not None:
+            if None in node:
+                end = j
+            j += 1
+            node = node.get(tokens[j]) if j < n_tok else None
+
+        if end is None:
+            i += 1
+        else:
+            matches.append(np.arange(i, end + 1))
+            i = end + 1
+
+    return matches
+
+
+def _compile_patterns(patterns, match_type, flags):
+    """
+    Compile the RE or glob patterns in `patterns` using flags `flags`. Patterns given as strings are combined into a
+    single alternation pattern if they don't contain groups or inline flags. Already compiled patterns are used as
+    they are. Returns a list of compiled RE patterns.
+    """
+    compile_fn = re.compile if match_type == 'regex' else globre.compile
+    default_flags = re.compile('', flags=flags).flags
+
+    compiled = []
+    combinable = []
+    for pat in patterns:
+        if isinstance(pat, str):
+            pat = compile_fn(pat, flags=flags)
+
+            if pat.groups == 0 and pat.flags == default_flags:
+                combinable.append(pat)
+                continue
+
+        compiled.append(pat)
+
+    if len(combinable) == 1:
+        compiled.append(combinable[0])
+    elif combinable:
+        compiled.append(re.compile('|'.join('(?:%s)' % pat.pattern for pat in combinable), flags=flags))
+
+    return compiled
+
+
 def require_tokendocs(docs, types=(list, np.ndarray),
                       error_msg='the argument must be a list of string token documents'):
     require_listlike(docs)
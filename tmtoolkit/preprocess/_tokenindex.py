@@ -0,0 +1,139 @@
+"""
+Positional inverted index of the tokens of a worker's documents, used by :class:`~tmtoolkit.preprocess.TMPreproc`
+workers when ``use_token_index=True`` is set.
+
+The index maps each unique token string to its "postings", i.e. the positions at which the token occurs in the
+documents. A position is an offset into the concatenation of all tokens (including filtered tokens) of the indexed
+documents, so it identifies both the document and the token position in that document. Token patterns are matched
+against the unique tokens of the index and the matching positions are looked up in the postings, instead of matching
+the patterns against every token of every document.
+
+Filtering tokens only changes the documents' masks and filtering documents only removes documents, so the index stays
+valid after these operations: the postings are intersected with the current masks of the current documents when the
+index is queried. Token transformations are applied to the index via :meth:`TokenIndex.transform`.
+"""
+
+import numpy as np
+
+from ._tokenfuncs import vocab_match
+
+
+class TokenIndex:
+    """
+    Positional inverted index for the filtered tokens of a list of spaCy documents.
+    """
+
+    def __init__(self, docs, docs_tokens):
+        """
+        Build the index for spaCy documents `docs` with filtered tokens `docs_tokens`.
+
+        :param docs: list of spaCy documents
+        :param docs_tokens: list with an array of filtered string tokens for each document in `docs`
+        """
+        doc_lengths = [len(doc) for doc in docs]
+
+        self._doc_indices = {doc._.label: i for i, doc in enumerate(docs)}    # document label -> index in `docs`
+        self._doc_offsets = np.concatenate([[0], np.cumsum(doc_lengths, dtype=np.int64)]).astype(np.int64)
+
+        if docs:
+            vocab, token_ids = np.unique(np.concatenate(docs_tokens), return_inverse=True)
+            positions = np.concatenate([offset + np.flatnonzero(doc.user_data['mask'])
+                                        for offset, doc in zip(self._doc_offsets, docs)])
+        else:
+            vocab, token_ids, positions = np.array([], dtype=str), np.array([], dtype=np.intp), np.array([], np.int64)
+
+        self._set_postings(vocab, token_ids, positions)
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def __repr__(self):
+        return '<TokenIndex [%d documents / %d unique tokens / %d postings]>' \
+               % (len(self._doc_indices), len(self.vocab), len(self._postings))
+
+    def matches(self, docs, search_tokens, match_type, ignore_case, glob_method):
+        """
+        Match `search_tokens` against the filtered tokens of the documents `docs` using the index. Uses the same
+        matching options as :func:`~tmtoolkit.preprocess.filter_tokens`.
+
+        :param docs: list of spaCy documents; must be a subset of the indexed documents
+        :param search_tokens: single string or list of strings that specify the search pattern(s)
+        :param match_type: one of: 'exact', 'regex', 'glob'
+        :param ignore_case: ignore character case
+        :param glob_method: if `match_type` is 'glob', use this glob method; must be 'match' or 'search'
+        :return: list with a boolean array for each document in `docs` that signals the matches in its filtered tokens
+                 or None if not all documents in `docs` are indexed
+        """
+        if not isinstance(search_tokens, (list, tuple, set)):
+            search_tokens = [search_tokens]
+        elif not search_tokens:
+            raise ValueError('`search_tokens` must not be empty')
+
+        doc_indices = [self._doc_indices.get(doc._.label) for doc in docs]
+        if any(i is None or self._doc_offsets[i + 1] - self._doc_offsets[i] != len(doc)
+               for i, doc in zip(doc_indices, docs)):
+            return None
+
+        # find the matching entries in the vocabulary
+        if match_type == 'exact':
+            selected = np.repeat(False, len(self.vocab))
+            for pat in search_tokens:
+                if not isinstance(pat, str):   # can't match any string token
+                    continue
+
+                if ignore_case:
+                    selected |= self._vocab_lower == pat.lower()
+                else:
+                    i = np.searchsorted(self.vocab, pat)
+                    if i < len(self.vocab) and self.vocab[i] == pat:
+                        selected[i] = True
+        else:
+            selected = vocab_match(search_tokens, self.vocab, match_type=match_type, ignore_case=ignore_case,
+                                   glob_method=glob_method)
+
+        # set the positions of the matching tokens
+        hits = np.repeat(False, self._doc_offsets[-1])
+        for begin, end in zip(self._offsets[:-1][selected], self._offsets[1:][selected]):
+            hits[self._postings[begin:end]] = True
+
+        return [hits[self._doc_offsets[i]:self._doc_offsets[i + 1]][doc.user_data['mask']]
+                for i, doc in zip(doc_indices, docs)]
+
+    def transform(self, vocab, new_vocab):
+        """
+        Apply a token transformation to the index. Tokens of the index that are not contained in `vocab` are not
+        changed.
+
+        :param vocab: sorted array of unique token strings
+        :param new_vocab: sequence with the transformed token string for each token in `vocab`
+        """
+        if len(vocab) == 0 or len(self.vocab) == 0:
+            return
+
+        new_vocab = np.asarray(new_vocab, dtype=str)
+        ind = np.minimum(np.searchsorted(vocab, self.vocab), len(vocab) - 1)
+        transformed = np.where(vocab[ind] == self.vocab, new_vocab[ind], self.vocab)
+
+        # different tokens may be transformed to the same string, so the postings are regrouped
+        vocab, id_map = np.unique(transformed, return_inverse=True)
+        token_ids = id_map[np.repeat(np.arange(len(self.vocab)), np.diff(self._offsets))]
+
+        self._set_postings(vocab, token_ids, self._postings)
+
+    @property
+    def _vocab_lower(self):
+        if self._cur_vocab_lower is None:
+            self._cur_vocab_lower = np.char.lower(self.vocab)
+        return self._cur_vocab_lower
+
+    def _set_postings(self, vocab, token_ids, positions):
+        """
+        Set the sorted array of unique token strings `vocab` and group the `positions` by the index of the respective
+        token in `vocab` given in `token_ids`.
+        """
+        order = np.argsort(token_ids, kind='stable')
+
+        self.vocab = vocab
+        self._postings = positions[order]
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(token_ids, minlength=len(vocab)))]).astype(np.int64)
+        self._cur_vocab_lower = None
@@ -0,0 +1,252 @@
+"""
+Persistent pool of worker processes that can be shared by several :class:`~tmtoolkit.preprocess.TMPreproc` instances.
+
+Creating a TMPreproc instance usually starts new worker processes and loads a spaCy language model. When many
+short-lived TMPreproc instances are created, e.g. in a long-running service, this dominates the processing time. A
+:class:`PreprocWorkerPool` starts its worker processes with a preloaded language model only once. TMPreproc instances
+that are created with ``pool=...`` attach to the pool as separate "sessions": each worker process holds the documents of
+each attached instance separately and activates the respective session's documents for each task it receives.
+
+A pool provides the transport between a TMPreproc instance and the worker processes: the task queues
+(:attr:`~PreprocWorkerPool.tasks_queues`), the results and profile queues, the shutdown and worker error events and the
+list of :attr:`~PreprocWorkerPool.workers`. Subclasses such as :class:`~tmtoolkit.preprocess.DistributedWorkerPool`
+provide these objects in a different way by overriding :meth:`~PreprocWorkerPool._start_workers`.
+"""
+
+import multiprocessing as mp
+import threading
+import atexit
+import logging
+
+import spacy
+
+from ._preprocworker import PreprocWorker
+from ._common import DEFAULT_LANGUAGE_MODELS
+
+
+logger = logging.getLogger('tmtoolkit')
+logger.addHandler(logging.NullHandler())
+
+exiting = False
+
+
+def _set_exiting():
+    global exiting
+    exiting = True
+
+
+class PreprocWorkerPool:
+    """
+    Pool of worker processes with a preloaded spaCy language model that can be shared by several
+    :class:`~tmtoolkit.preprocess.TMPreproc` instances by passing it as ``pool`` argument.
+
+    .. note:: All attached TMPreproc instances share the same task and results queues. When the instances are used
+              from several threads (e.g. via the ``..._async()`` methods of TMPreproc), their tasks are serialized
+              via the pool's :attr:`~PreprocWorkerPool.lock`.
+    """
+
+    def __init__(self, language=None, language_model=None, n_max_processes=None, enable_vectors=False,
+                 spacy_opts=None, name=None):
+        """
+        Start a pool of `n_max_processes` worker processes with a loaded spaCy language model for language `language`
+        or the explicitly given model name `language_model`.
+
+        :param language: language of the documents that will be processed by this pool
+        :param language_model: spaCy language model name; if None, use the default model for `language`
+        :param n_max_processes: number of worker processes; uses the number of CPUs on the current machine if None is
+                                passed
+        :param enable_vectors: if True, load the medium-sized language model that includes word vectors
+        :param spacy_opts: keyword arguments passed to spaCy's ``spacy.load()`` function
+        :param name: optional name of this pool; used in log messages and worker process names
+        """
+        if language is not None:
+            if not isinstance(language, str) or len(language) != 2:
+                raise ValueError('`language` must be a two-letter ISO 639-1 language code')
+
+        self.n_workers = n_max_processes or mp.cpu_count()
+        if self.n_workers < 1:
+            raise ValueError('`n_max_processes` must be at least 1')
+
+        if language_model is None:
+            if language is None:
+                raise ValueError('either `language` or `language_model` must be given')
+
+            if language not in DEFAULT_LANGUAGE_MODELS:
+                raise ValueError('language "%s" is not supported' % language)
+            language_model = DEFAULT_LANGUAGE_MODELS[language] + ('_md' if enable_vectors else '_sm')
+        else:
+            language = spacy.info(language_model, silent=True)['lang']
+
+        self.name = name or 'pool'
+        self.language = language
+        self.language_model = language_model
+        self.vectors_enabled = enable_vectors
+        self.spacy_opts = spacy_opts or {}
+
+        self.tasks_queues = []
+        self.results_queue = None
+        self.profile_queue = None
+        self.shutdown_event = None
+        self.worker_error_event = None
+        self.workers = []
+        self.lock = threading.RLock()   # held while sending a task to the workers and collecting its results
+        self.nlp = None
+
+        self._sessions = set()      # IDs of attached sessions
+        self._next_session_id = 0
+
+        self._start_workers()
+
+        atexit.register(_set_exiting)
+
+    def __del__(self):
+        """destructor. shutdown all workers"""
+        self.shutdown(force=exiting)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def __repr__(self):
+        if self.alive:
+            return '<PreprocWorkerPool `%s` [%d workers / %s / %d attached]>' \
+                   % (self.name, self.n_workers, self.language_model, self.n_attached)
+        else:
+            return '<PreprocWorkerPool `%s` [shutdown]>' % self.name
+
+    @property
+    def alive(self):
+        """True if the worker processes of this pool are running."""
+        return bool(self.workers) and not self.shutdown_event.is_set()
+
+    @property
+    def n_attached(self):
+        """Number of TMPreproc instances currently attached to this pool."""
+        return len(self._sessions)
+
+    def attach(self, use_shared_memory=False, use_token_ids=False, profile=False, batch_size=None,
+               threads_per_worker=1, compact_threshold=None, use_token_index=False):
+        """
+        Open a new session on all worker processes. This is called by :class:`~tmtoolkit.preprocess.TMPreproc`
+        when passing a pool on initialization.
+
+        :param use_shared_memory: if True, workers pass large results via shared memory in this session
+        :param use_token_ids: if True, workers store the documents' tokens as integer IDs in this session
+        :param profile: if True, workers put a profile of each task of this session in the pool's profile queue
+        :param batch_size: batch size for spaCy's ``pipe()`` methods in this session
+        :param threads_per_worker: number of threads per worker for spaCy's ``pipe()`` methods in this session
+        :param compact_threshold: fraction of filtered tokens at which workers compact the documents of this session
+        :param use_token_index: if True, workers maintain a positional inverted index of the tokens in this session
+        :return: new session ID which must be passed as third element of each task item sent to the workers
+        """
+        if not self.alive:
+            raise RuntimeError('pool `%s` is shut down' % self.name)
+
+        session_id = self._next_session_id
+        self._next_session_id += 1
+
+        logger.debug('pool `%s`: opening session %d' % (self.name, session_id))
+
+        self._put_and_join(('open_session', dict(use_shared_memory=use_shared_memory,
+                                                 use_token_ids=use_token_ids,
+                                                 profile=profile,
+                                                 batch_size=batch_size,
+                                                 threads_per_worker=threads_per_worker,
+                                                 compact_threshold=compact_threshold,
+                                                 use_token_index=use_token_index), session_id, None))
+        self._sessions.add(session_id)
+
+        return session_id
+
+    def release(self, session_id):
+        """
+        Close the session `session_id` on all worker processes, i.e. remove all documents of this session from the
+        workers. The worker processes keep running.
+
+        :param session_id: session ID as returned from :meth:`~PreprocWorkerPool.attach`
+        """
+        if session_id not in self._sessions:
+            return
+
+        self._sessions.remove(session_id)
+
+        if self.alive:
+            logger.debug('pool `%s`: closing session %d' % (self.name, session_id))
+            self._put_and_join(('close_session', {}, session_id, None))
+
+    def shutdown(self, force=False):
+        """
+        Shut down all worker processes of this pool. All TMPreproc instances that are still attached to this pool
+        cannot be used any more afterwards.
+
+        :param force: if True, don't wait for the worker processes to finish their current tasks
+        """
+        if not self.workers:
+            return
+
+        try:   # may cause exception when the logger is actually already destroyed
+            logger.info('pool `%s`: sending shutdown signal to workers (force=%s)' % (self.name, str(force)))
+        except: pass
+
+        self.shutdown_event.set()
+
+        if not force:
+            [q.put(None) for q in self.tasks_queues]
+
+        try:
+            [w.join(1) for w in self.workers]    # wait up to 1 sec. per worker
+        except: pass
+
+        for w in self.workers:
+            try:
+                alive = w.is_alive()
+            except:
+                alive = False
+
+            if alive:
+                w.terminate()
+
+        self.workers = []
+        self._sessions = set()
+
+    def _put_and_join(self, task_item):
+        with self.lock:
+            [q.put(task_item) for q in self.tasks_queues]
+            [q.join() for q in self.tasks_queues]
+
+        if self.shutdown_event.is_set():
+            self.shutdown(force=True)
+            raise RuntimeError('an error occurred in at least one of the worker processes of pool `%s`' % self.name)
+
+    def _start_workers(self):
+        """
+        Create the queues and events for communicating with the worker processes, load the spaCy language model and
+        start the worker processes on this machine.
+        """
+        self.results_queue = mp.Queue()
+        self.profile_queue = mp.Queue()
+        self.shutdown_event = mp.Event()
+        self.worker_error_event = mp.Event()
+
+        spacy_opts = dict(disable=['parser', 'ner'])
+        spacy_opts.update(self.spacy_opts)
+        logger.debug('pool `%s`: loading spaCy language model %s with options: %s'
+                     % (self.name, self.language_model, str(spacy_opts)))
+        self.nlp = spacy.load(self.language_model, **spacy_opts)
+
+        logger.info('pool `%s`: starting %d worker processes' % (self.name, self.n_workers))
+
+        for i_worker in range(self.n_workers):
+            task_q = mp.JoinableQueue()
+            w = PreprocWorker(i_worker, tasks_queue=task_q, results_queue=self.results_queue,
+                              profile_queue=self.profile_queue,
+                              shutdown_event=self.shutdown_event,
+                              worker_error_event=self.worker_error_event,
+                              name='_PreprocWorker#%d@%s' % (i_worker, self.name),
+                              nlp=self.nlp, language=self.language)
+            w.start()
+
+            self.workers.append(w)
+            self.tasks_queues.append(task_q)
@@ -399,7 +399,7 @@ def greedy_partitioning(elems_dict, k, return_only_labels=False):
         bin_sums[argmin] += pair[1]
 
     if return_only_labels:
-        return [[x[1] for x in b] for b in bins]
+        return [[x[0] for x in b] for b in bins]
     else:
         return [dict(b) for b in bins]
 